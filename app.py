@@ -1,25 +1,59 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
 from datetime import datetime
-from deployment.agent import rag_agent as agent_engine
-import json
 import os
-import re
 import ctypes
 
+import retrieval_prefetch
+import thread_store
+from rag.shared_libraries import bootstrap, profiling
+from deployment.events import Event, TextAccumulator, pretty_print_event
+
 class ChatApp:
-    def __init__(self, root):
+    def __init__(self, root, agent_engine=None, thread_dir="thread_history", store=None, build_ui=True):
+        """With build_ui=False no widgets are created and no threads loaded, e.g.
+        for benchmarks that provide their own thread list and chat view."""
         self.root = root
-        self.root.title("Password Reminder")
-        root.iconbitmap("images/app_icon_32.ico")
+        # The deployed agent is connected on the first query so the window opens immediately
+        self.agent_engine = agent_engine
+        # With CHAT_SERVER_URL set, the agent and the threads are hosted by deployment/server.py
+        self.server_url = os.getenv("CHAT_SERVER_URL")
         # Initialize threads and current thread
         self.threads = {}
+        # Archived threads by title (see thread_archive.py), loaded when selected
+        self.archived = {}
         self.current_thread = None
 
         # Define thread directory
-        self.thread_dir = "thread_history"
-        if not os.path.exists(self.thread_dir):
-            os.makedirs(self.thread_dir)
+        self.thread_dir = thread_dir
+        if store is None:
+            if self.server_url:
+                from deployment.client import RemoteThreadStore
+                store = RemoteThreadStore(self.server_url)
+            else:
+                store = thread_store.ThreadStore(self.thread_dir)
+        self.store = store
+        # Opt-in speculative retrieval of the draft in the input box (retrieval_prefetch.py); it retrieves
+        # with this machine's Vertex AI credentials, which a thin client of the chat server need not have
+        self.prefetcher = (
+            retrieval_prefetch.Prefetcher()
+            if retrieval_prefetch.prefetch_enabled() and not self.server_url else None
+        )
+        self.prefetch_debounce_ms = int(os.getenv("PREFETCH_DEBOUNCE_MS", retrieval_prefetch.DEFAULT_DEBOUNCE_MS))
+        # The send blocks the UI while it waits for a prefetch still in flight, so only about one retrieval
+        self.prefetch_wait = float(os.getenv("PREFETCH_WAIT_SECONDS", retrieval_prefetch.DEFAULT_WAIT_SECONDS))
+        self._prefetch_job = None
+
+        if build_ui:
+            self.build_ui()
+            # Load threads from local JSON files
+            self.load_threads()
+            self.update_thread_list()
+
+    def build_ui(self):
+        root = self.root
+        root.title("Password Reminder")
+        root.iconbitmap("images/app_icon_32.ico")
 
         # Adjust layout to move threads to the left
         thread_label = tk.Label(root, text="Threads", font=("Arial", 12, "bold"))
@@ -74,6 +108,8 @@ class ChatApp:
         self.user_input.configure(yscrollcommand=user_input_scrollbar.set)
         user_input_scrollbar.grid(row=3, column=2, sticky="ns")
         self.user_input.bind("<Return>", self.send_message)
+        if self.prefetcher is not None:
+            self.user_input.bind("<KeyRelease>", self.draft_changed)
 
         self.send_button = tk.Button(root, text="Send", command=self.send_message)
         self.send_button.grid(row=3, column=3, padx=10, pady=5, sticky="w")
@@ -82,24 +118,31 @@ class ChatApp:
         root.grid_columnconfigure(1, weight=3)
         root.grid_rowconfigure(1, weight=1)
 
-        # Load threads from local JSON files
-        self.load_threads()
-        self.update_thread_list()
-
     def load_threads(self):
-        for file_name in os.listdir(self.thread_dir):
-            if file_name.endswith(".json"):
-                with open(os.path.join(self.thread_dir, file_name), "r") as file:
-                    thread_data = json.load(file)
-                    self.threads[file_name[:-5]] = thread_data
+        threads, self.archived = self.store.load()
+        self.threads.update(threads)
 
     def sanitize_filename(self, title):
-        return re.sub(r'[\\/:*?"<>|]', '_', title)
+        return thread_store.sanitize_filename(title)
 
     def save_thread(self, thread_title):
-        sanitized_title = self.sanitize_filename(thread_title)
-        with open(os.path.join(self.thread_dir, f"{sanitized_title}.json"), "w") as file:
-            json.dump(self.threads[thread_title], file, indent=4)
+        if thread_title in self.archived:
+            # Threads opened from the archive stay there until a message is added
+            if len(self.threads[thread_title]) == self.archived[thread_title]["messages"]:
+                return
+            del self.archived[thread_title]
+            self.store.unarchive(thread_title)
+        self.store.save(thread_title, self.threads[thread_title])
+
+    def draft_changed(self, event=None):
+        # Prefetch once the user pauses typing
+        if self._prefetch_job is not None:
+            self.root.after_cancel(self._prefetch_job)
+        self._prefetch_job = self.root.after(self.prefetch_debounce_ms, self.prefetch_draft)
+
+    def prefetch_draft(self):
+        self._prefetch_job = None
+        self.prefetcher.draft_changed(self.user_input.get("1.0", tk.END).strip())
 
     def send_message(self, event=None):
         user_message = self.user_input.get("1.0", tk.END).strip()
@@ -117,13 +160,35 @@ class ChatApp:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to get response: {e}")
 
+    def get_agent_engine(self):
+        if self.agent_engine is None:
+            if self.server_url:
+                from deployment.client import RemoteRAGAgent
+                self.agent_engine = RemoteRAGAgent(self.server_url)
+            else:
+                from deployment.agent import rag_agent
+                self.agent_engine = rag_agent
+        return self.agent_engine
+
     def query_agent(self, message, session):
         # Simulate querying the agent engine
+        agent_engine = self.get_agent_engine()
+        # The chat server keeps one agent session per thread
+        thread = {"thread": self.current_thread} if self.server_url else {}
+        if self.prefetcher is not None:
+            contexts = self.prefetcher.take(message, timeout=self.prefetch_wait)
+            if contexts:
+                message = retrieval_prefetch.with_context(message, contexts)
+        answer = TextAccumulator()
         for event in agent_engine.stream_query(
             message=message,
+            **thread,
         ):
-            agent_engine.pretty_print_event(event)
-            return agent_engine.get_agent_text_from_event(event)
+            # Parsed once for both the console output and the answer
+            event = Event.from_dict(event)
+            pretty_print_event(event)
+            answer.add(event)
+        return answer.answer
 
     def display_message(self, author, message):
         self.chat_display.config(state="normal")
@@ -145,9 +210,13 @@ class ChatApp:
     def update_thread_list(self):
         self.thread_list.delete(0, tk.END)
         self.display_name_to_thread = {}  # Map display name to thread title
-        for thread, messages in sorted(self.threads.items()):
-            first_message = messages[0]['message'][:50] if messages else "No messages"
-            display_name = f"{thread} - {first_message}"
+        for thread in sorted(self.threads.keys() | self.archived.keys()):
+            if thread in self.archived:
+                display_name = f"{thread} - {self.archived[thread]['first_message']} (archived)"
+            else:
+                messages = self.threads[thread]
+                first_message = messages[0]['message'][:50] if messages else "No messages"
+                display_name = f"{thread} - {first_message}"
             self.thread_list.insert(tk.END, display_name)
             self.display_name_to_thread[display_name] = thread
 
@@ -162,6 +231,13 @@ class ChatApp:
 
         thread_display_name = self.thread_list.get(selected[0])
         thread_title = self.display_name_to_thread.get(thread_display_name)
+        if thread_title in self.archived and thread_title not in self.threads:
+            try:
+                self.threads[thread_title] = self.store.read(thread_title, self.archived)
+            except RuntimeError as e:
+                # A zstd bundle written where zstandard was installed
+                messagebox.showerror("Error", f"Failed to open archived thread: {e} (poetry install --extras archive)")
+                return
         if not thread_title or thread_title not in self.threads:
             messagebox.showerror("Error", "Thread not found.")
             return
@@ -194,11 +270,12 @@ class ChatApp:
 
         thread_display_name = self.thread_list.get(selected[0])
         thread_title = self.display_name_to_thread.get(thread_display_name)
-        if not thread_title or thread_title not in self.threads:
+        if not thread_title or thread_title not in self.threads.keys() | self.archived.keys():
             messagebox.showerror("Error", "Thread not found.")
             return
 
-        del self.threads[thread_title]
+        self.threads.pop(thread_title, None)
+        archived = self.archived.pop(thread_title, None) is not None
         self.current_thread = None
         self.chat_display.config(state="normal")
         self.chat_display.delete(1.0, tk.END)
@@ -211,13 +288,23 @@ class ChatApp:
             # Simulate a click on the first item to load its content
             self.select_thread(None)
 
-        # Delete the corresponding JSON file
-        sanitized_title = self.sanitize_filename(thread_title)
-        os.remove(os.path.join(self.thread_dir, f"{sanitized_title}.json"))
+        # Delete the corresponding JSON file (and archive entry)
+        self.store.delete(thread_title, archived)
 
-if __name__ == "__main__":
+def main():
+    # CHAT_SERVER_URL may be set in .env
+    bootstrap.load_env()
     # Set the AppUserModelID to change the taskbar icon
     ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID("com.example.chatapp")
     root = tk.Tk()
     app = ChatApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    if app.prefetcher is not None:
+        print(f"[prefetch]: {app.prefetcher.stats()}")
+        app.prefetcher.close()
+
+
+if __name__ == "__main__":
+    # PROFILE may be set in .env
+    bootstrap.load_env()
+    profiling.run("app", main)
\ No newline at end of file
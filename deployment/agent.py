@@ -1,74 +1,92 @@
 import os
-import vertexai
-from vertexai import agent_engines
-from dotenv import load_dotenv
-import json
 from pprint import pprint
 
+from deployment import intent_router
+from deployment.events import TextAccumulator, agent_text, pretty_print_event
+from rag.shared_libraries import bootstrap, quota
+
 class RAGAgent:
-    def __init__(self):
-        load_dotenv(override=True)
+    def __init__(self, agent_engine=None, user_id="123", priority=quota.INTERACTIVE, scheduler=None, router=None):
+        """Connects to the deployed agent engine, or wraps the given engine object.
+
+        Any object with the create_session/stream_query interface of a
+        deployed agent engine can be passed in, e.g. a local stub for tests.
+        Queries to the deployed engine go through the shared quota scheduler
+        at the given priority; a passed-in engine is only scheduled if a
+        scheduler is passed as well. The same holds for the IntentRouter
+        (deployment/intent_router.py) that answers small talk locally;
+        router=False or INTENT_ROUTER=0 disables it.
+        """
+        bootstrap.load_env(override=True)
 
-        vertexai.init(
-            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-            location=os.getenv("GOOGLE_CLOUD_LOCATION"),
-        )
-        self.user_id = "123"
+        self.user_id = user_id
+        self.priority = quota.priority_value(priority)
+        if scheduler is None and agent_engine is None:
+            scheduler = quota.get_scheduler()
+        self.scheduler = scheduler
+        if router is None and agent_engine is None and intent_router.router_enabled():
+            router = intent_router.IntentRouter.from_env()
+        self.router = router or None
         self.agent_engine_id = os.getenv("AGENT_ENGINE_ID")
-        self.agent_engine = agent_engines.get(self.agent_engine_id)
-        self.session = self.agent_engine.create_session(user_id=self.user_id)
+        if agent_engine is None:
+            agent_engine = bootstrap.get_agent_engine(self.agent_engine_id)
+        self.agent_engine = agent_engine
+        self.session = self.create_session()
+
+    def create_session(self, user_id=None):
+        """Creates a new session on the agent engine for the given (default) user."""
+        return self.agent_engine.create_session(user_id=user_id or self.user_id)
 
-    def stream_query(self, message):
-        return self.agent_engine.stream_query(
-            user_id=self.user_id,
-            session_id=self.session['id'],
-            message=message,
-        )
+    def stream_query(self, message, session_id=None, user_id=None):
+        """Streams the events for a message, by default in the agent's own session."""
+        kwargs = {
+            "user_id": user_id or self.user_id,
+            "session_id": session_id or self.session['id'],
+            "message": message,
+        }
+        session = (kwargs["user_id"], kwargs["session_id"])
+        if self.router is not None:
+            event = self.router.route(message, session)
+            if event is not None:
+                return iter([event])
+        if self.scheduler is None:
+            events = self.agent_engine.stream_query(**kwargs)
+        else:
+            with quota.priority(self.priority):
+                events = self.scheduler.stream("gemini", self.agent_engine.stream_query, **kwargs)
+        if self.router is None:
+            return events
+        return self._remember_answer(message, session, events)
+
+    def _remember_answer(self, message, session, events):
+        answer = TextAccumulator()
+        for event in events:
+            answer.add(event)
+            yield event
+        self.router.remember(message, answer.answer, session)
     
     def pretty_print_event(self, event):
-        """Pretty prints an event with truncation for long content."""
-        if "content" not in event:
-            print(f"[{event.get('author', 'unknown')}]: {event}")
-            return
-            
-        author = event.get("author", "unknown")
-        parts = event["content"].get("parts", [])
-        
-        for part in parts:
-            if "text" in part:
-                text = part["text"]
-                # Truncate long text to 200 characters
-                if len(text) > 200:
-                    text = text[:197] + "..."
-                print(f"[{author}]: {text}")
-            elif "functionCall" in part:
-                func_call = part["functionCall"]
-                print(f"[{author}]: Function call: {func_call.get('name', 'unknown')}")
-                # Truncate args if too long
-                args = json.dumps(func_call.get("args", {}))
-                if len(args) > 100:
-                    args = args[:97] + "..."
-                print(f"  Args: {args}")
-            elif "functionResponse" in part:
-                func_response = part["functionResponse"]
-                print(f"[{author}]: Function response: {func_response.get('name', 'unknown')}")
-                # Truncate response if too long
-                response = json.dumps(func_response.get("response", {}))
-                if len(response) > 100:
-                    response = response[:97] + "..."
-                print(f"  Response: {response}")
-    
+        """Pretty prints an event (dict or parsed Event) with truncation for long content."""
+        pretty_print_event(event)
+
     def get_agent_text_from_event(self, event):
         """Extracts text from the event."""
-        author = event.get("author", "unknown")
-        if author == 'ask_rag_agent' and "content" in event:
-            parts = event["content"].get("parts", [])
-            for part in parts:
-                if "text" in part:
-                    return part["text"]
-        return None
-    
-rag_agent = RAGAgent()
+        return agent_text(event)
+
+
+_rag_agent = None
+
+
+def __getattr__(name):
+    # The shared agent connects to Vertex AI, so it is only created when first
+    # used; importing RAGAgent alone (e.g. for a stub engine) stays offline.
+    global _rag_agent
+    if name == "rag_agent":
+        if _rag_agent is None:
+            _rag_agent = RAGAgent()
+        return _rag_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # query = "Hi, how are you?"
 # for event in rag_agent.stream_query(
 #         user_id="123",
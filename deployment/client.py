@@ -0,0 +1,104 @@
+"""Thin clients of the chat server (deployment/server.py).
+
+ChatApp uses these instead of RAGAgent and ThreadStore when CHAT_SERVER_URL
+is set. Both share one requests.Session, so consecutive queries reuse the
+same keep-alive connection to the server.
+"""
+import json
+import os
+from urllib.parse import quote
+
+import requests
+
+from deployment.events import agent_text, pretty_print_event
+
+# Connect and read timeouts; the read timeout applies between streamed records
+DEFAULT_TIMEOUT = (5, 300)
+
+_sessions = {}
+
+
+def _http_session(url, token):
+    session = _sessions.get((url, token))
+    if session is None:
+        session = requests.Session()
+        if token:
+            session.headers["Authorization"] = f"Bearer {token}"
+        _sessions[(url, token)] = session
+    return session
+
+
+class ChatServerError(RuntimeError):
+    pass
+
+
+class RemoteRAGAgent:
+    """The RAGAgent interface served by a chat server."""
+
+    def __init__(self, url, token=None, timeout=DEFAULT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.http = _http_session(self.url, token or os.getenv("CHAT_SERVER_TOKEN"))
+
+    def stream_query(self, message, session_id=None, user_id=None, thread=None):
+        """Streams the events for a message; the server picks the session of the thread."""
+        response = self.http.post(
+            f"{self.url}/query", json={"message": message, "thread": thread}, stream=True, timeout=self.timeout
+        )
+        response.raise_for_status()
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "event" in record:
+                    yield record["event"]
+                elif "error" in record:
+                    raise ChatServerError(record["error"])
+
+    def health(self):
+        response = self.http.get(f"{self.url}/health", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def pretty_print_event(self, event):
+        pretty_print_event(event)
+
+    def get_agent_text_from_event(self, event):
+        return agent_text(event)
+
+
+class RemoteThreadStore:
+    """The ThreadStore interface (thread_store.py) served by a chat server."""
+
+    def __init__(self, url, token=None, timeout=DEFAULT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.http = _http_session(self.url, token or os.getenv("CHAT_SERVER_TOKEN"))
+
+    def _thread_url(self, title):
+        return f"{self.url}/threads/{quote(title, safe='')}"
+
+    def load(self):
+        response = self.http.get(f"{self.url}/threads", timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return data["threads"], data["archived"]
+
+    def read(self, title, archived=None):
+        response = self.http.get(self._thread_url(title), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["messages"]
+
+    def save(self, title, messages):
+        response = self.http.put(self._thread_url(title), json={"messages": messages}, timeout=self.timeout)
+        response.raise_for_status()
+
+    def unarchive(self, title):
+        # The server takes a thread out of its archive when the thread is saved
+        pass
+
+    def delete(self, title, archived=False):
+        response = self.http.delete(self._thread_url(title), timeout=self.timeout)
+        if response.status_code != 404:
+            response.raise_for_status()
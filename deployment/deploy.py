@@ -12,38 +12,178 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from google.auth import default
-import vertexai
-from vertexai import agent_engines
-from vertexai.preview.reasoning_engines import AdkApp
-from rag.agent import root_agent
+"""Deploys the RAG agent to Vertex AI Agent Engine.
+
+A fingerprint of the `rag` package sources, the requirements and the agent
+configuration is stored in the description of the deployed engine. When
+AGENT_ENGINE_ID points at an engine with the same fingerprint the deployment
+is skipped; when the fingerprint differs the engine is updated in place
+instead of creating a new one. Pass --force to redeploy anyway or --new to
+always create a new engine.
+"""
+
+import argparse
+import hashlib
+import json
 import logging
 import os
-from dotenv import set_key, load_dotenv
+import re
+import time
+from contextlib import contextmanager
+
+from dotenv import set_key
+
+from rag.shared_libraries import bootstrap, profiling
 
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-load_dotenv(override=True)
-# print("All environment variables:", os.environ)
-
-GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
-GOOGLE_CLOUD_LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION")
-STAGING_BUCKET = os.getenv("STAGING_BUCKET")
-print(f"GOOGLE_CLOUD_PROJECT: {GOOGLE_CLOUD_PROJECT}")
-print(f"GOOGLE_CLOUD_LOCATION: {GOOGLE_CLOUD_LOCATION}")
-print(f"STAGING_BUCKET: {STAGING_BUCKET}")
 # Define the path to the .env file relative to this script
 ENV_FILE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".env"))
+RAG_PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "rag"))
+
+REQUIREMENTS = [
+    "google-cloud-aiplatform[adk,agent-engines]==1.88.0",
+    "google-adk",
+    "python-dotenv",
+    "google-auth",
+    "tqdm",
+    "requests",
+    "llama_index",
+]
+EXTRA_PACKAGES = [
+    "./rag",
+]
+AGENT_CONFIG = {
+    "enable_tracing": True,
+}
+# Environment variables baked into the deployed agent when rag.agent is imported
+AGENT_ENV_VARS = ["RAG_CORPUS", "RAG_CORPUS_SHARDS", "RAG_SHARD_TIMEOUT_SECONDS"]
+
+FINGERPRINT_PATTERN = re.compile(r"fingerprint=([0-9a-f]{64})")
+
+
+def fingerprint_config():
+    """The agent configuration covered by the fingerprint besides the sources."""
+    return {
+        "app": AGENT_CONFIG,
+        "env": {name: os.getenv(name) for name in AGENT_ENV_VARS},
+    }
+
+
+def compute_fingerprint(package_dir=RAG_PACKAGE_DIR, requirements=REQUIREMENTS, config=None):
+    """Returns a SHA-256 over the package sources, the requirements and the agent config."""
+    if config is None:
+        config = fingerprint_config()
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(package_dir):
+        dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+        for filename in sorted(filenames):
+            if filename.endswith((".pyc", ".pyo")):
+                continue
+            path = os.path.join(dirpath, filename)
+            # Relative, '/'-separated paths keep the fingerprint identical across machines
+            relative_path = os.path.relpath(path, package_dir).replace(os.sep, "/")
+            digest.update(relative_path.encode("utf-8") + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+            digest.update(b"\0")
+    digest.update(json.dumps(sorted(requirements)).encode("utf-8"))
+    digest.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def describe(fingerprint):
+    return f"RAG document assistant (fingerprint={fingerprint})"
+
+
+def read_fingerprint(remote_app):
+    """Returns the fingerprint stored in a deployed engine's description, or None."""
+    gca_resource = getattr(remote_app, "gca_resource", None)
+    description = getattr(gca_resource, "description", None) or getattr(remote_app, "description", "") or ""
+    match = FINGERPRINT_PATTERN.search(description)
+    return match.group(1) if match else None
+
+
+@contextmanager
+def phase(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - started
+        logger.info(f"Phase '{name}' took {timings[name]:.2f}s")
+
+
+def build_app(config=AGENT_CONFIG):
+    """Builds the AdkApp; only needed when something is actually deployed."""
+    from vertexai.preview.reasoning_engines import AdkApp
+    from rag.agent import root_agent
+
+    return AdkApp(agent=root_agent, **config)
+
+
+def deploy(agent_engines, agent_engine_id=None, force=False, create_new=False,
+           app_factory=build_app, fingerprint=None):
+    """Creates, updates or skips the deployment of the agent.
+
+    Args:
+        agent_engines: the vertexai.agent_engines module, or a stand-in with the
+            same get/create/update functions.
+        agent_engine_id: resource name of the currently deployed engine, if any.
+        force: redeploy even if the fingerprint is unchanged.
+        create_new: create a new engine instead of updating agent_engine_id.
+        app_factory: builds the app to deploy.
+        fingerprint: precomputed fingerprint (computed from the sources if None).
+
+    Returns:
+        (action, resource_name, timings) with action one of "skipped",
+        "updated" or "created".
+    """
+    timings = {}
+    with phase(timings, "fingerprint"):
+        if fingerprint is None:
+            fingerprint = compute_fingerprint()
+    logger.info(f"Agent fingerprint: {fingerprint}")
+
+    existing = None
+    if agent_engine_id and not create_new:
+        with phase(timings, "lookup"):
+            try:
+                existing = agent_engines.get(agent_engine_id)
+            except Exception as e:
+                logger.warning(f"Could not get agent engine {agent_engine_id}, a new one will be created: {e}")
+
+    if existing is not None and not force and read_fingerprint(existing) == fingerprint:
+        logger.info(f"Agent engine {existing.resource_name} is up to date; skipping deployment.")
+        return "skipped", existing.resource_name, timings
+
+    with phase(timings, "build"):
+        app = app_factory()
+
+    with phase(timings, "deploy"):
+        if existing is not None:
+            logger.info(f"Updating agent engine {existing.resource_name} in place...")
+            remote_app = agent_engines.update(
+                resource_name=existing.resource_name,
+                agent_engine=app,
+                requirements=REQUIREMENTS,
+                extra_packages=EXTRA_PACKAGES,
+                description=describe(fingerprint),
+            )
+            action = "updated"
+        else:
+            logger.info("Creating a new agent engine...")
+            remote_app = agent_engines.create(
+                app,
+                requirements=REQUIREMENTS,
+                extra_packages=EXTRA_PACKAGES,
+                description=describe(fingerprint),
+            )
+            action = "created"
+    return action, remote_app.resource_name, timings
 
-credentials, project = default()
-vertexai.init(
-    project=GOOGLE_CLOUD_PROJECT,
-    location=GOOGLE_CLOUD_LOCATION,
-    staging_bucket=STAGING_BUCKET,
-    credentials=credentials,
-)
 
 # Function to update the .env file
 def update_env_file(agent_engine_id, env_file_path):
@@ -54,34 +194,49 @@ def update_env_file(agent_engine_id, env_file_path):
     except Exception as e:
         print(f"Error updating .env file: {e}")
 
-logger.info("Deploying app...")
-app = AdkApp(
-    agent=root_agent,
-    enable_tracing=True,
-)
-
-logging.debug("Deploying agent to agent engine:")
-
-remote_app = agent_engines.create(
-    app,
-    requirements=[
-        "google-cloud-aiplatform[adk,agent-engines]==1.88.0",
-        "google-adk",
-        "python-dotenv",
-        "google-auth",
-        "tqdm",
-        "requests",
-        "llama_index"
-    ],
-    extra_packages=[
-        "./rag",
-    ],
-)
-
-
-
-# log remote_app
-logging.info(f"Deployed agent to Vertex AI Agent Engine successfully, resource name: {remote_app.resource_name}")
-
-# Update the .env file with the new Agent Engine ID
-update_env_file(remote_app.resource_name, ENV_FILE_PATH)
\ No newline at end of file
+
+def main():
+    parser = argparse.ArgumentParser(description="Deploy the RAG agent to Vertex AI Agent Engine.")
+    parser.add_argument("--force", action="store_true", help="Redeploy even if nothing changed")
+    parser.add_argument("--new", action="store_true", help="Create a new engine instead of updating AGENT_ENGINE_ID")
+    args = parser.parse_args()
+
+    bootstrap.load_env(override=True)
+    # print("All environment variables:", os.environ)
+
+    GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
+    GOOGLE_CLOUD_LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION")
+    STAGING_BUCKET = os.getenv("STAGING_BUCKET")
+    print(f"GOOGLE_CLOUD_PROJECT: {GOOGLE_CLOUD_PROJECT}")
+    print(f"GOOGLE_CLOUD_LOCATION: {GOOGLE_CLOUD_LOCATION}")
+    print(f"STAGING_BUCKET: {STAGING_BUCKET}")
+
+    timings = {}
+    with phase(timings, "init"):
+        from vertexai import agent_engines
+
+        bootstrap.init_vertexai(GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_LOCATION, staging_bucket=STAGING_BUCKET)
+
+    logger.info("Deploying app...")
+    action, resource_name, deploy_timings = deploy(
+        agent_engines,
+        agent_engine_id=os.getenv("AGENT_ENGINE_ID"),
+        force=args.force,
+        create_new=args.new,
+    )
+    timings.update(deploy_timings)
+
+    # log remote_app
+    logging.info(f"Deployment {action}, resource name: {resource_name}")
+    logging.info("Phase timings: " + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items()))
+
+    if action == "created":
+        logging.info(f"Deployed agent to Vertex AI Agent Engine successfully, resource name: {resource_name}")
+        # Update the .env file with the new Agent Engine ID
+        update_env_file(resource_name, ENV_FILE_PATH)
+
+
+if __name__ == "__main__":
+    # PROFILE may be set in .env
+    bootstrap.load_env(override=True)
+    profiling.run("deploy", main)
@@ -0,0 +1,224 @@
+"""Compact model of the events streamed by the deployed agent engine.
+
+Every event is parsed once into an Event with __slots__ Parts. Text, function
+call and function response parts keep a reference to their payload instead of
+copying it, and the truncated previews used for console output are encoded
+lazily: only as much JSON is produced as the preview needs, so a function
+response carrying ten retrieved chunks is no longer serialized completely
+just to print its first 100 characters.
+
+For the common case of only collecting the agent's answer, TextAccumulator
+reads the text parts straight from the event dicts without building Events.
+"""
+import json
+from json.encoder import encode_basestring_ascii
+
+AGENT_NAME = "ask_rag_agent"
+TEXT_PREVIEW_LIMIT = 200
+PAYLOAD_PREVIEW_LIMIT = 100
+
+TEXT = "text"
+FUNCTION_CALL = "functionCall"
+FUNCTION_RESPONSE = "functionResponse"
+
+
+def truncate(text, limit):
+    """Shortens text to limit characters, ending with '...' when cut."""
+    if len(text) > limit:
+        return text[:limit - 3] + "..."
+    return text
+
+
+def _iter_json(value, limit):
+    """Yields json.dumps(value) in pieces, with strings cut after limit characters."""
+    if isinstance(value, str):
+        if len(value) > limit:
+            # Escaping never shortens a string, so the cut string alone fills the preview
+            yield encode_basestring_ascii(value[:limit])[:-1]
+        else:
+            yield encode_basestring_ascii(value)
+    elif isinstance(value, dict):
+        yield "{"
+        separator = ""
+        for key, item in value.items():
+            if not isinstance(key, str):
+                key = json.dumps(key)
+            yield separator
+            yield from _iter_json(key, limit)
+            yield ": "
+            yield from _iter_json(item, limit)
+            separator = ", "
+        yield "}"
+    elif isinstance(value, (list, tuple)):
+        yield "["
+        separator = ""
+        for item in value:
+            yield separator
+            yield from _iter_json(item, limit)
+            separator = ", "
+        yield "]"
+    else:
+        yield json.dumps(value)
+
+
+def json_preview(value, limit=PAYLOAD_PREVIEW_LIMIT):
+    """Returns truncate(json.dumps(value), limit) without encoding all of value."""
+    chunks = []
+    size = 0
+    for chunk in _iter_json(value, limit):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return "".join(chunks)[:limit - 3] + "..."
+    return "".join(chunks)
+
+
+class Part:
+    __slots__ = ("kind", "name", "value", "_preview")
+
+    def __init__(self, kind, name, value):
+        self.kind = kind
+        self.name = name
+        # The text, the call args or the response payload, not copied
+        self.value = value
+        self._preview = None
+
+    @classmethod
+    def from_dict(cls, part):
+        if TEXT in part:
+            return cls(TEXT, None, part[TEXT])
+        if FUNCTION_CALL in part:
+            call = part[FUNCTION_CALL]
+            return cls(FUNCTION_CALL, call.get("name", "unknown"), call.get("args", {}))
+        if FUNCTION_RESPONSE in part:
+            response = part[FUNCTION_RESPONSE]
+            return cls(FUNCTION_RESPONSE, response.get("name", "unknown"), response.get("response", {}))
+        return None
+
+    def preview(self):
+        """Truncated text, or truncated JSON of the call args/response payload."""
+        if self._preview is None:
+            if self.kind == TEXT:
+                self._preview = truncate(self.value, TEXT_PREVIEW_LIMIT)
+            else:
+                self._preview = json_preview(self.value, PAYLOAD_PREVIEW_LIMIT)
+        return self._preview
+
+
+class Event:
+    __slots__ = ("author", "parts", "raw")
+
+    def __init__(self, author, parts, raw):
+        self.author = author
+        self.parts = parts
+        self.raw = raw
+
+    @classmethod
+    def from_dict(cls, event):
+        author = event.get("author", "unknown")
+        content = event.get("content")
+        if content is None:
+            return cls(author, None, event)
+        parts = []
+        for part in content.get("parts", ()):
+            parsed = Part.from_dict(part)
+            if parsed is not None:
+                parts.append(parsed)
+        return cls(author, tuple(parts), event)
+
+    @property
+    def has_content(self):
+        return self.parts is not None
+
+    def text(self, author=AGENT_NAME):
+        """The first text part if the event was written by author, else None."""
+        if self.author != author or not self.parts:
+            return None
+        for part in self.parts:
+            if part.kind == TEXT:
+                return part.value
+        return None
+
+    def lines(self):
+        """The console lines of the event, with long content truncated."""
+        if self.parts is None:
+            yield f"[{self.author}]: {self.raw}"
+            return
+        for part in self.parts:
+            if part.kind == TEXT:
+                yield f"[{self.author}]: {part.preview()}"
+            elif part.kind == FUNCTION_CALL:
+                yield f"[{self.author}]: Function call: {part.name}"
+                yield f"  Args: {part.preview()}"
+            else:
+                yield f"[{self.author}]: Function response: {part.name}"
+                yield f"  Response: {part.preview()}"
+
+    def pretty_print(self):
+        for line in self.lines():
+            print(line)
+
+
+def as_event(event):
+    """Returns event as an Event, parsing it if it is still a dict."""
+    if isinstance(event, Event):
+        return event
+    return Event.from_dict(event)
+
+
+def pretty_print_event(event):
+    """Pretty prints an event with truncation for long content."""
+    as_event(event).pretty_print()
+
+
+def agent_text(event, author=AGENT_NAME):
+    """Extracts the first text part of an event written by author, or None."""
+    if isinstance(event, Event):
+        return event.text(author)
+    if event.get("author", "unknown") != author:
+        return None
+    content = event.get("content")
+    if content is None:
+        return None
+    for part in content.get("parts", ()):
+        if TEXT in part:
+            return part[TEXT]
+    return None
+
+
+class TextAccumulator:
+    """Collects the text the agent writes over a stream of events."""
+
+    __slots__ = ("author", "texts")
+
+    def __init__(self, author=AGENT_NAME):
+        self.author = author
+        self.texts = []
+
+    def add(self, event):
+        """Adds the agent's text from event, if any, and returns it."""
+        if event.__class__ is Event:
+            text = event.text(self.author)
+        elif event.get("author") != self.author:
+            # Function responses of other agents and user echoes are rejected here
+            return None
+        else:
+            text = None
+            content = event.get("content")
+            if content is not None:
+                for part in content.get("parts", ()):
+                    if "text" in part:
+                        text = part["text"]
+                        break
+        if text:
+            self.texts.append(text)
+        return text
+
+    @property
+    def answer(self):
+        """The last text the agent wrote, i.e. its final answer, or None."""
+        return self.texts[-1] if self.texts else None
+
+    @property
+    def text(self):
+        return "\n".join(self.texts)
@@ -0,0 +1,275 @@
+"""Local intent pre-router in front of RAGAgent.stream_query.
+
+The agent instruction (rag/prompts.py) leaves it to Gemini to recognize
+casual chat, so "Hi, how are you?" or "Thanks, goodbye!" still cost a full
+Agent Engine round trip. IntentRouter classifies every message locally first:
+
+    greeting, thanks, goodbye  answered at once from TEMPLATES
+    chat                       other small talk, only recognized by the model
+    repeat                     the same question again in the same session,
+                               answered with the agent's previous answer (opt-in)
+    question                   forwarded to the agent
+
+Keyword rules decide first: a message is small talk when it contains a
+greeting, thanks or goodbye keyword and all its other words are small-talk
+words or phrases ("how are you"), so anything mentioning an account, a site
+or a document, or asking how, what or how many, is forwarded.
+With INTENT_MODEL=1 a small TF-IDF model (nearest centroid, trained on the
+turns of the eval datasets that expect no tool call plus SEED_EXAMPLES)
+also answers messages the rules forward when it is confident by at least
+INTENT_MODEL_MARGIN, unless they ask a question ("?", how, what, ...).
+
+Repeats are only answered locally with INTENT_REPEAT_TTL_SECONDS set: a
+remembered answer does not reflect a corpus sync since, and a user retrying
+a poor answer gets the same one again.
+
+Small talk answered locally is not part of the agent's session history.
+stats() reports the answered intents and the round trips avoided; the
+confusion matrix of the rules and the model is in eval/intent_benchmark.py.
+"""
+import json
+import math
+import os
+import pathlib
+import re
+import threading
+import time
+from collections import Counter
+
+from deployment.events import AGENT_NAME
+
+EVAL_DATA_DIR = pathlib.Path(__file__).resolve().parent.parent / "eval" / "data"
+DEFAULT_MODEL_MARGIN = 0.15
+DEFAULT_REPEAT_TTL_SECONDS = 0.0
+MAX_REMEMBERED = 256
+# Marks chunks appended by retrieval_prefetch.with_context(); they are not part of what the user typed
+CONTEXT_START = "<retrieved_context>"
+
+QUESTION = "question"
+SMALL_TALK = "small_talk"
+KEYWORDS = {
+    # Checked in this order: "Thanks, goodbye!" is a goodbye
+    "goodbye": {"bye", "goodbye", "farewell", "cya", "ciao"},
+    "thanks": {"thanks", "thank", "thx", "ty", "appreciate", "appreciated", "cheers", "grateful"},
+    "greeting": {"hi", "hello", "hey", "hiya", "howdy", "greetings", "morning", "afternoon", "evening"},
+}
+SMALL_TALK_WORDS = set("""
+a about again all alright am an and answer answers as at awesome be been but covers day doing done
+else enough everything fine for from going good got great have help helped helpful i im info
+information it just know later let lot m me more much my need needed nice night no nothing now of ok
+okay or perfect please question questions re s see so some soon that the there this to today too up
+very was we well you your
+""".split())
+# Small-talk questions; other interrogatives are not small-talk words, so "Hi, how many are there?" is forwarded
+SMALL_TALK_PHRASES = re.compile(
+    r"\b(how are you( doing)?|how are things|how is it going|how s it going|how have you been|how do you do|what s up)\b"
+)
+INTERROGATIVES = {"how", "what", "which", "who", "whom", "whose", "where", "when", "why"}
+TEMPLATES = {
+    "greeting": "Hello! What would you like to know about your documents?",
+    "thanks": "You're welcome! Let me know if you have any other questions.",
+    "goodbye": "You're welcome, goodbye! Come back any time you have more questions.",
+    "chat": "Let me know whenever you have a question about your documents.",
+}
+SEED_EXAMPLES = [
+    ("hello", SMALL_TALK),
+    ("hi there", SMALL_TALK),
+    ("good morning", SMALL_TALK),
+    ("how are you doing today", SMALL_TALK),
+    ("thank you so much", SMALL_TALK),
+    ("thanks for your help", SMALL_TALK),
+    ("that is all I needed", SMALL_TALK),
+    ("ok great, have a nice day", SMALL_TALK),
+    ("bye, see you later", SMALL_TALK),
+    ("what is the username of my email account", QUESTION),
+    ("which email do I use to log in to the bank", QUESTION),
+    ("where did I write down the wifi password", QUESTION),
+    ("what is the password hint for my streaming subscription", QUESTION),
+    ("how do I reset the pin of my card", QUESTION),
+    ("what security question did I set for my phone provider", QUESTION),
+]
+
+
+def router_enabled():
+    return os.getenv("INTENT_ROUTER", "1").lower() not in ("0", "false", "no")
+
+
+def model_enabled():
+    return os.getenv("INTENT_MODEL", "").lower() in ("1", "true", "yes")
+
+
+def user_text(message):
+    """The message as typed, without chunks appended by the retrieval prefetch."""
+    return (message or "").split(CONTEXT_START, 1)[0]
+
+
+def words(text):
+    return re.findall(r"[a-z0-9]+", user_text(text).lower())
+
+
+def keyword_intent(text_words):
+    for intent, keywords in KEYWORDS.items():
+        if keywords.intersection(text_words):
+            return intent
+    return None
+
+
+def rule_intent(message):
+    """The small-talk intent of a message by the keyword rules, or QUESTION."""
+    text_words = words(message)
+    intent = keyword_intent(text_words)
+    if intent is None:
+        return QUESTION
+    keywords = set().union(*KEYWORDS.values())
+    rest = SMALL_TALK_PHRASES.sub(" ", " ".join(text_words)).split()
+    if all(word in keywords or word in SMALL_TALK_WORDS for word in rest):
+        return intent
+    return QUESTION
+
+
+def asks_question(message):
+    """Whether the message asks something beyond the small-talk phrases."""
+    if "?" in user_text(message):
+        return True
+    rest = SMALL_TALK_PHRASES.sub(" ", " ".join(words(message))).split()
+    return any(word in INTERROGATIVES for word in rest)
+
+
+def load_examples(data_dir=EVAL_DATA_DIR):
+    """(query, label) pairs from the eval datasets: turns expecting no tool call are small talk."""
+    examples = []
+    for dataset in sorted(pathlib.Path(data_dir).glob("*.test.json")):
+        for turn in json.loads(dataset.read_text()):
+            examples.append((turn["query"], QUESTION if turn.get("expected_tool_use") else SMALL_TALK))
+    return examples
+
+
+class IntentModel:
+    """TF-IDF nearest-centroid classifier of small talk vs. questions."""
+
+    def __init__(self, examples):
+        counts = [(Counter(words(text)), label) for text, label in examples]
+        document_frequency = Counter(word for count, _ in counts for word in count)
+        self.idf = {
+            word: math.log((1 + len(counts)) / (1 + df)) + 1
+            for word, df in document_frequency.items()
+        }
+        sums = {}
+        for count, label in counts:
+            centroid = sums.setdefault(label, Counter())
+            for word, weight in self._vector(count).items():
+                centroid[word] += weight
+        self.centroids = {label: self._normalize(centroid) for label, centroid in sums.items()}
+
+    @classmethod
+    def from_eval_data(cls, data_dir=EVAL_DATA_DIR, exclude=()):
+        """Trains on the eval datasets and SEED_EXAMPLES, leaving out the queries in exclude."""
+        examples = load_examples(data_dir) if pathlib.Path(data_dir).is_dir() else []
+        return cls([(text, label) for text, label in examples + SEED_EXAMPLES if text not in exclude])
+
+    @staticmethod
+    def _normalize(vector):
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {word: v / norm for word, v in vector.items()}
+
+    def _vector(self, counts):
+        # Words never seen in training carry no evidence either way
+        return self._normalize({word: count * self.idf[word] for word, count in counts.items() if word in self.idf})
+
+    def scores(self, message):
+        vector = self._vector(Counter(words(message)))
+        return {
+            label: sum(weight * centroid.get(word, 0.0) for word, weight in vector.items())
+            for label, centroid in self.centroids.items()
+        }
+
+    def margin(self, message):
+        """Cosine similarity to the small-talk centroid minus that to the question centroid."""
+        scores = self.scores(message)
+        return scores.get(SMALL_TALK, 0.0) - scores.get(QUESTION, 0.0)
+
+
+class IntentRouter:
+    def __init__(self, model=None, templates=None, margin=None, repeat_ttl=None, max_remembered=MAX_REMEMBERED):
+        """
+        Args:
+            model: optional IntentModel consulted for messages the rules forward.
+            templates: answers by intent, defaults to TEMPLATES.
+            margin: score margin the model needs to answer (INTENT_MODEL_MARGIN).
+            repeat_ttl: seconds an answer is reused for the same question in the
+                same session (INTENT_REPEAT_TTL_SECONDS); 0, the default, disables it.
+        """
+        self.model = model
+        self.templates = dict(TEMPLATES, **(templates or {}))
+        self.margin = margin if margin is not None else float(os.getenv("INTENT_MODEL_MARGIN", DEFAULT_MODEL_MARGIN))
+        self.repeat_ttl = (
+            repeat_ttl if repeat_ttl is not None
+            else float(os.getenv("INTENT_REPEAT_TTL_SECONDS", DEFAULT_REPEAT_TTL_SECONDS))
+        )
+        self.max_remembered = max_remembered
+        self._answers = {}
+        self._lock = threading.Lock()
+        self.answered = Counter()
+        self.forwarded = 0
+
+    @classmethod
+    def from_env(cls):
+        """A router configured by INTENT_MODEL, INTENT_MODEL_MARGIN and INTENT_REPEAT_TTL_SECONDS."""
+        return cls(model=IntentModel.from_eval_data() if model_enabled() else None)
+
+    def classify(self, message):
+        """The intent of a message by the rules, then the model; repeats are not considered."""
+        intent = rule_intent(message)
+        # The model only answers statements; questions the rules forward always reach the agent
+        if (intent == QUESTION and self.model is not None and not asks_question(message)
+                and self.model.margin(message) >= self.margin):
+            intent = keyword_intent(words(message)) or "chat"
+        return intent
+
+    def _key(self, session, message):
+        return session, tuple(words(message))
+
+    def route(self, message, session=None):
+        """Returns a local answer event for the message, or None to forward it to the agent.
+
+        session identifies the conversation the repeats are looked up in.
+        """
+        intent = self.classify(message)
+        text = self.templates.get(intent)
+        if text is None and self.repeat_ttl > 0:
+            with self._lock:
+                remembered = self._answers.get(self._key(session, message))
+            if remembered is not None and time.monotonic() - remembered[0] < self.repeat_ttl:
+                intent, text = "repeat", remembered[1]
+        with self._lock:
+            if text is None:
+                self.forwarded += 1
+                return None
+            self.answered[intent] += 1
+        return {
+            "author": AGENT_NAME,
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "intent": intent,
+        }
+
+    def remember(self, message, answer, session=None):
+        """Keeps the agent's answer to a forwarded question for repeats of it."""
+        if not answer or self.repeat_ttl <= 0:
+            return
+        with self._lock:
+            self._answers.pop(self._key(session, message), None)
+            self._answers[self._key(session, message)] = (time.monotonic(), answer)
+            # Oldest first, as dicts keep insertion order
+            for key in list(self._answers)[:-self.max_remembered]:
+                del self._answers[key]
+
+    def stats(self):
+        with self._lock:
+            routed = self.forwarded + sum(self.answered.values())
+            avoided = sum(self.answered.values())
+            return {
+                "answered": dict(self.answered),
+                "forwarded": self.forwarded,
+                "round_trips_avoided": avoided,
+                "avoided_rate": avoided / routed if routed else None,
+            }
@@ -0,0 +1,214 @@
+"""Multi-user load test for the RAGAgent query path.
+
+Simulates concurrent users of the assistant. Every user has its own agent
+engine session, replays a question set in a random order and waits for an
+exponentially distributed think time between questions. Queries go through
+RAGAgent.stream_query/get_agent_text_from_event, the same path as
+ChatApp.query_agent.
+
+The test runs in stages with an increasing number of users and reports the
+throughput, latency percentiles and error rate of every stage. The first
+stage where adding users no longer raises the throughput noticeably while
+latency keeps growing is reported as the saturation point.
+
+Usage (from the project root):
+    python -m deployment.load_test --engine stub --users 1,2,4,8,16
+    python -m deployment.load_test --engine live --users 1,2,4 --stage-seconds 120 --output load.json
+"""
+import argparse
+import json
+import pathlib
+import random
+import statistics
+import threading
+import time
+
+from deployment.agent import RAGAgent
+from rag.shared_libraries import quota
+from deployment.stub_engine import StubAgentEngine
+
+DEFAULT_QUESTIONS_FILE = pathlib.Path(__file__).parent.parent / "eval" / "data" / "conversation-pwd.test.json"
+# A stage saturates when throughput grows less than this while p95 latency grows more than that
+SATURATION_THROUGHPUT_GAIN = 1.1
+SATURATION_LATENCY_GROWTH = 1.5
+
+
+def load_questions(path):
+    """Reads a JSON list of questions, or the queries of an eval dataset."""
+    data = json.loads(pathlib.Path(path).read_text())
+    return [item["query"] if isinstance(item, dict) else item for item in data]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    rank = (len(values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+class SimulatedUser(threading.Thread):
+    def __init__(self, agent, user_index, questions, think_time, deadline, seed):
+        super().__init__(daemon=True)
+        self.agent = agent
+        self.user_id = f"load-user-{user_index}"
+        self.questions = questions
+        self.think_time = think_time
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.results = []
+
+    def query(self, session, message):
+        """Sends one message the way ChatApp.query_agent does and times it."""
+        started = time.perf_counter()
+        first_event = None
+        answer = None
+        for event in self.agent.stream_query(message, session_id=session["id"], user_id=self.user_id):
+            if first_event is None:
+                first_event = time.perf_counter() - started
+            text = self.agent.get_agent_text_from_event(event)
+            if text:
+                answer = text
+        return {
+            "latency": time.perf_counter() - started,
+            "first_event": first_event,
+            "answered": answer is not None,
+        }
+
+    def run(self):
+        session = self.agent.create_session(user_id=self.user_id)
+        while time.monotonic() < self.deadline:
+            questions = self.questions[:]
+            self.random.shuffle(questions)
+            for message in questions:
+                if time.monotonic() >= self.deadline:
+                    return
+                result = {"user": self.user_id, "started": time.monotonic()}
+                try:
+                    result.update(self.query(session, message))
+                    result["error"] = None
+                except Exception as e:
+                    result.update({"latency": None, "first_event": None, "answered": False, "error": str(e)})
+                self.results.append(result)
+                if self.think_time > 0:
+                    time.sleep(min(self.random.expovariate(1 / self.think_time),
+                                   max(0.0, self.deadline - time.monotonic())))
+
+
+def run_stage(agent, users, questions, think_time, seconds, seed):
+    started = time.monotonic()
+    deadline = started + seconds
+    simulated = [
+        SimulatedUser(agent, i, questions, think_time, deadline, seed + i)
+        for i in range(users)
+    ]
+    for user in simulated:
+        user.start()
+    for user in simulated:
+        user.join()
+    elapsed = time.monotonic() - started
+    results = [result for user in simulated for result in user.results]
+    latencies = [r["latency"] for r in results if r["error"] is None]
+    first_events = [r["first_event"] for r in results if r["first_event"] is not None]
+    errors = sum(1 for r in results if r["error"])
+    return {
+        "users": users,
+        "seconds": elapsed,
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_mean": statistics.fmean(latencies) if latencies else None,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "first_event_p50": percentile(first_events, 50),
+        "unanswered": sum(1 for r in results if r["error"] is None and not r["answered"]),
+        "error_samples": sorted({r["error"] for r in results if r["error"]})[:5],
+    }
+
+
+def find_saturation(stages):
+    """Returns the user count of the first stage past the throughput knee, or None."""
+    for previous, stage in zip(stages, stages[1:]):
+        if not previous["throughput"] or not previous["latency_p95"] or not stage["latency_p95"]:
+            continue
+        throughput_gain = stage["throughput"] / previous["throughput"]
+        latency_growth = stage["latency_p95"] / previous["latency_p95"]
+        if throughput_gain < SATURATION_THROUGHPUT_GAIN and latency_growth > SATURATION_LATENCY_GROWTH:
+            return stage["users"]
+    return None
+
+
+def _fmt(value, digits=2):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def print_summary(report):
+    print(f"\nEngine: {report['engine']}, think time: {report['think_time']}s, "
+          f"{report['stage_seconds']}s per stage")
+    print(f"{'users':>5} {'reqs':>6} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'1st ev':>7} {'errors':>7}")
+    for stage in report["stages"]:
+        print(
+            f"{stage['users']:>5} {stage['requests']:>6} {_fmt(stage['throughput']):>7} "
+            f"{_fmt(stage['latency_p50']):>7} {_fmt(stage['latency_p95']):>7} "
+            f"{_fmt(stage['latency_p99']):>7} {_fmt(stage['first_event_p50']):>7} "
+            f"{stage['error_rate']:>7.1%}"
+        )
+        for error in stage["error_samples"]:
+            print(f"      error: {error}")
+    if report["saturation_users"]:
+        print(f"\nSaturation point: {report['saturation_users']} concurrent users")
+    else:
+        print("\nNo saturation point reached.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RAGAgent query path.")
+    parser.add_argument("--engine", choices=("stub", "live"), default="stub")
+    parser.add_argument("--users", default="1,2,4,8,16", help="Comma-separated concurrent user counts, one stage each")
+    parser.add_argument("--stage-seconds", type=float, default=30)
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean think time between questions in seconds")
+    parser.add_argument("--questions", default=str(DEFAULT_QUESTIONS_FILE),
+                        help="JSON list of questions or an eval dataset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-latency", type=float, default=1.0)
+    parser.add_argument("--stub-capacity", type=int, default=4)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.engine == "stub":
+        engine = StubAgentEngine(latency=args.stub_latency, capacity=args.stub_capacity,
+                                 error_rate=args.stub_error_rate, seed=args.seed)
+        agent = RAGAgent(agent_engine=engine)
+    else:
+        # Load tests share the Vertex AI quota at the lowest priority, and every
+        # replayed question must reach the agent, so nothing is answered locally
+        agent = RAGAgent(priority=quota.BATCH, router=False)
+
+    questions = load_questions(args.questions)
+    stages = []
+    for users in (int(u) for u in args.users.split(",")):
+        print(f"Running stage with {users} user(s) for {args.stage_seconds}s...")
+        stages.append(run_stage(agent, users, questions, args.think_time, args.stage_seconds, args.seed))
+
+    report = {
+        "engine": args.engine,
+        "think_time": args.think_time,
+        "stage_seconds": args.stage_seconds,
+        "stages": stages,
+        "saturation_users": find_saturation(stages),
+    }
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""Headless chat server sharing one warm RAGAgent between clients.
+
+Every desktop ChatApp pays for vertexai.init, agent_engines.get and a session
+round trip before its first answer. The server pays them once at startup,
+keeps a pool of pre-created agent sessions (one is bound to each chat thread
+on its first query) and serves the thread store of its thread directory:
+
+    GET    /health               readiness, pool, query and local intent statistics
+    GET    /threads              live threads and archive index entries
+    GET    /threads/{title}      messages of one thread (archived or not)
+    PUT    /threads/{title}      {"messages": [...]} replaces a thread
+    DELETE /threads/{title}
+    POST   /query                {"message": ..., "thread": ...} -> NDJSON stream
+    WS     /ws                   the same queries as JSON messages
+
+A query streams one {"event": {...}} record per agent event and ends with
+{"done": true, "answer": ..., "latency": ..., "first_event": ...}, or with
+{"error": ...}. Set CHAT_SERVER_TOKEN to require an
+"Authorization: Bearer <token>" header (or ?token= for browser WebSockets).
+
+Usage:
+    python -m deployment.server --port 8765
+    python -m deployment.server --stub        # local stub engine, no network access
+    CHAT_SERVER_URL=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import asyncio
+import collections
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, WebSocket, WebSocketDisconnect, WebSocketException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool
+from starlette.requests import HTTPConnection
+
+import thread_archive
+import thread_store
+from deployment.events import TextAccumulator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_POOL_SIZE = 4
+# Threads whose session binding is kept; older bindings get a fresh session
+MAX_BOUND_SESSIONS = 1000
+
+
+class SessionPool:
+    """Pre-created agent sessions, bound to a chat thread on its first query."""
+
+    def __init__(self, agent, size=DEFAULT_POOL_SIZE, max_bound=MAX_BOUND_SESSIONS):
+        self.agent = agent
+        self.size = size
+        self.max_bound = max_bound
+        self.hits = 0
+        self.misses = 0
+        self._warm = collections.deque()
+        self._bound = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._refill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-pool")
+
+    def fill(self):
+        """Creates sessions until the pool is full."""
+        while True:
+            with self._lock:
+                if len(self._warm) >= self.size:
+                    return
+            session = self.agent.create_session()
+            with self._lock:
+                self._warm.append(session)
+
+    def session_id(self, thread):
+        """Returns the session of a thread, binding a warm one on its first query.
+
+        Queries without a thread use the agent's own session.
+        """
+        if thread is None:
+            return None
+        with self._lock:
+            session = self._bound.get(thread)
+            if session is not None:
+                self._bound.move_to_end(thread)
+                return session["id"]
+            session = self._warm.popleft() if self._warm else None
+            if session is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if session is None:
+            session = self.agent.create_session()
+        with self._lock:
+            session = self._bound.setdefault(thread, session)
+            while len(self._bound) > self.max_bound:
+                self._bound.popitem(last=False)
+        self._refill_executor.submit(self.fill)
+        return session["id"]
+
+    def release(self, thread):
+        with self._lock:
+            self._bound.pop(thread, None)
+
+    def stats(self):
+        with self._lock:
+            return {"warm": len(self._warm), "bound": len(self._bound), "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self._refill_executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ThreadService:
+    """The thread store of the server, shared by all clients."""
+
+    def __init__(self, thread_dir=thread_archive.THREAD_DIR):
+        self.store = thread_store.ThreadStore(thread_dir)
+        self._lock = threading.Lock()
+        self.threads, self.archived = self.store.load()
+
+    def list(self):
+        with self._lock:
+            return {"threads": dict(self.threads), "archived": dict(self.archived)}
+
+    def get(self, title):
+        with self._lock:
+            if title in self.threads:
+                return self.threads[title]
+            if title in self.archived:
+                return self.store.read(title, self.archived)
+        return None
+
+    def put(self, title, messages):
+        with self._lock:
+            if self.archived.pop(title, None) is not None:
+                self.store.unarchive(title)
+            self.threads[title] = messages
+            self.store.save(title, messages)
+
+    def delete(self, title):
+        with self._lock:
+            if title not in self.threads and title not in self.archived:
+                return False
+            self.threads.pop(title, None)
+            archived = self.archived.pop(title, None) is not None
+            self.store.delete(title, archived)
+        return True
+
+
+class ChatServer:
+    def __init__(self, agent_factory=None, thread_dir=thread_archive.THREAD_DIR, pool_size=DEFAULT_POOL_SIZE):
+        """
+        Args:
+            agent_factory: returns the RAGAgent to share; defaults to one connected
+                to the deployed agent engine.
+            thread_dir: directory of the thread store.
+            pool_size: sessions kept ready for new threads.
+        """
+        self.agent_factory = agent_factory
+        self.thread_dir = thread_dir
+        self.pool_size = pool_size
+        self.agent = None
+        self.pool = None
+        self.threads = None
+        self.startup_seconds = None
+        self.queries = 0
+        self.errors = 0
+        self.active = 0
+        self._first_event_total = 0.0
+        self._latency_total = 0.0
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """Connects the agent and warms the session pool (blocking)."""
+        started = time.perf_counter()
+        if self.agent_factory is None:
+            from deployment.agent import RAGAgent
+            self.agent = RAGAgent()
+        else:
+            self.agent = self.agent_factory()
+        self.threads = ThreadService(self.thread_dir)
+        pool = SessionPool(self.agent, self.pool_size)
+        pool.fill()
+        self.pool = pool
+        self.startup_seconds = time.perf_counter() - started
+        logger.info("Chat server ready in %.2fs with %d warm sessions", self.startup_seconds, self.pool_size)
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.close()
+
+    @property
+    def ready(self):
+        return self.pool is not None
+
+    def query(self, message, thread=None):
+        """Yields the records streamed to a client for one query."""
+        started = time.perf_counter()
+        first_event = None
+        answer = TextAccumulator()
+        with self._stats_lock:
+            self.active += 1
+        try:
+            session_id = self.pool.session_id(thread)
+            for event in self.agent.stream_query(message, session_id=session_id):
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+                answer.add(event)
+                yield {"event": event}
+        except Exception as e:
+            logger.exception("Query failed")
+            with self._stats_lock:
+                self.errors += 1
+            yield {"error": str(e)}
+            return
+        finally:
+            with self._stats_lock:
+                self.active -= 1
+        latency = time.perf_counter() - started
+        with self._stats_lock:
+            self.queries += 1
+            self._latency_total += latency
+            self._first_event_total += first_event or 0.0
+        yield {"done": True, "answer": answer.answer, "latency": latency, "first_event": first_event}
+
+    def health(self):
+        with self._stats_lock:
+            queries = self.queries
+            stats = {
+                "ready": self.ready,
+                "startup_seconds": self.startup_seconds,
+                "queries": queries,
+                "errors": self.errors,
+                "active": self.active,
+                "latency_mean": self._latency_total / queries if queries else None,
+                "first_event_mean": self._first_event_total / queries if queries else None,
+            }
+        stats["sessions"] = self.pool.stats() if self.pool is not None else None
+        router = getattr(self.agent, "router", None)
+        stats["intents"] = router.stats() if router is not None else None
+        return stats
+
+
+class Query(BaseModel):
+    message: str
+    thread: str | None = None
+
+
+class Thread(BaseModel):
+    messages: list[dict]
+
+
+def _authorized(supplied, token):
+    return not token or (supplied is not None and hmac.compare_digest(supplied, token))
+
+
+def create_app(server=None, token=None):
+    """Returns the FastAPI application serving a ChatServer."""
+    server = server or ChatServer()
+    token = token if token is not None else os.getenv("CHAT_SERVER_TOKEN")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await asyncio.to_thread(server.start)
+        yield
+        server.stop()
+
+    def check_token(connection: HTTPConnection):
+        header = connection.headers.get("authorization", "")
+        # Browsers cannot set headers on WebSockets, so the token may come as ?token=
+        supplied = header[len("Bearer "):] if header.startswith("Bearer ") else connection.query_params.get("token")
+        if _authorized(supplied, token):
+            return
+        if connection.scope["type"] == "websocket":
+            raise WebSocketException(code=1008)
+        raise HTTPException(status_code=401, detail="Invalid or missing token")
+
+    app = FastAPI(title="RAG chat server", lifespan=lifespan, dependencies=[Depends(check_token)])
+    app.state.chat_server = server
+
+    @app.get("/health")
+    def health():
+        return server.health()
+
+    @app.get("/threads")
+    def list_threads():
+        return server.threads.list()
+
+    @app.get("/threads/{title}")
+    def get_thread(title: str):
+        messages = server.threads.get(title)
+        if messages is None:
+            raise HTTPException(status_code=404, detail="Thread not found")
+        return {"title": title, "messages": messages}
+
+    @app.put("/threads/{title}")
+    def put_thread(title: str, thread: Thread):
+        server.threads.put(title, thread.messages)
+        return {"title": title, "messages": len(thread.messages)}
+
+    @app.delete("/threads/{title}")
+    def delete_thread(title: str):
+        if not server.threads.delete(title):
+            raise HTTPException(status_code=404, detail="Thread not found")
+        server.pool.release(title)
+        return {"title": title, "deleted": True}
+
+    @app.post("/query")
+    async def query(body: Query):
+        async def records():
+            async for record in iterate_in_threadpool(server.query(body.message, body.thread)):
+                yield json.dumps(record) + "\n"
+
+        return StreamingResponse(records(), media_type="application/x-ndjson")
+
+    @app.websocket("/ws")
+    async def websocket_query(websocket: WebSocket):
+        await websocket.accept()
+        try:
+            while True:
+                try:
+                    request = await websocket.receive_json()
+                except (ValueError, KeyError):
+                    # Not JSON, or a binary frame
+                    await websocket.send_json({"error": "Messages must be JSON"})
+                    continue
+                message = request.get("message") if isinstance(request, dict) else None
+                if not message:
+                    await websocket.send_json({"error": "A message is required"})
+                    continue
+                async for record in iterate_in_threadpool(server.query(message, request.get("thread"))):
+                    await websocket.send_json(record)
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one warm RAG agent and the thread store over HTTP.")
+    parser.add_argument("--host", default=os.getenv("CHAT_SERVER_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(os.getenv("CHAT_SERVER_PORT", DEFAULT_PORT)))
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv("CHAT_SERVER_POOL_SIZE", DEFAULT_POOL_SIZE)),
+                        help="Agent sessions kept ready for new threads")
+    parser.add_argument("--thread-dir", default=thread_archive.THREAD_DIR)
+    parser.add_argument("--stub", action="store_true", help="Serve the local stub engine instead of the deployed agent")
+    parser.add_argument("--stub-latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    import uvicorn
+    from rag.shared_libraries import bootstrap
+
+    bootstrap.load_env()
+    logging.basicConfig(level=logging.INFO)
+    agent_factory = None
+    if args.stub:
+        from deployment.agent import RAGAgent
+        from deployment.stub_engine import StubAgentEngine
+
+        def agent_factory():
+            return RAGAgent(agent_engine=StubAgentEngine(latency=args.stub_latency))
+
+    server = ChatServer(agent_factory, args.thread_dir, args.pool_size)
+    uvicorn.run(create_app(server), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Local stand-in for a deployed agent engine.
+
+StubAgentEngine implements the create_session/stream_query interface used by
+RAGAgent and yields events shaped like the ones of the deployed RAG agent
+(function call, retrieval response with 10 chunks, final answer) without any
+network access. Latency, capacity and error rate are configurable so it can
+back load tests and local development.
+"""
+import random
+import threading
+import time
+import uuid
+
+AGENT_NAME = "ask_rag_agent"
+
+
+def function_call_event(message):
+    return {
+        "author": AGENT_NAME,
+        "content": {"parts": [{"functionCall": {
+            "name": "retrieve_rag_documentation",
+            "args": {"query": message},
+        }}]},
+    }
+
+
+def function_response_event(message, chunks=10, chunk_words=40):
+    return {
+        "author": AGENT_NAME,
+        "content": {"parts": [{"functionResponse": {
+            "name": "retrieve_rag_documentation",
+            "response": {"result": [
+                {"text": f"Stub chunk {i} for: {message} " + "lorem ipsum " * chunk_words,
+                 "source": "stub.docx", "distance": 0.1 + i / 100}
+                for i in range(chunks)
+            ]},
+        }}]},
+    }
+
+
+def answer_event(message):
+    return {
+        "author": AGENT_NAME,
+        "content": {"parts": [{"text": f"Stub answer to: {message}"}]},
+    }
+
+
+class StubAgentEngine:
+    def __init__(self, latency=1.0, jitter=0.3, capacity=4, error_rate=0.0, chunks=10, seed=None):
+        """
+        Args:
+            latency: mean seconds spent per query.
+            jitter: relative standard deviation of the latency.
+            capacity: queries served concurrently; further queries wait for a slot,
+                like requests queueing in front of a saturated backend.
+            error_rate: probability that a query fails with a quota error.
+            chunks: number of retrieved chunks in the function response.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.chunks = chunks
+        self._slots = threading.BoundedSemaphore(capacity)
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def create_session(self, user_id):
+        return {"id": str(uuid.uuid4()), "user_id": user_id}
+
+    def _sample(self):
+        with self._random_lock:
+            latency = max(0.0, self._random.gauss(self.latency, self.latency * self.jitter))
+            failed = self._random.random() < self.error_rate
+        return latency, failed
+
+    def stream_query(self, user_id, session_id, message):
+        latency, failed = self._sample()
+        with self._slots:
+            # Roughly: a third retrieving, two thirds generating the answer
+            time.sleep(latency / 3)
+            if failed:
+                raise RuntimeError("429 Resource exhausted (stub engine)")
+            yield function_call_event(message)
+            yield function_response_event(message, self.chunks)
+            time.sleep(latency * 2 / 3)
+            yield answer_event(message)
@@ -0,0 +1,175 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline benchmark of the chunk size and overlap used when uploading documents.
+
+The local documents are split the way the RAG engine's fixed-size chunking
+does (windows of chunk_size tokens, chunk_overlap tokens shared with the
+previous window) under several settings. For every setting it reports:
+
+    chunks            chunks in the index, i.e. embeddings computed on upload
+    avg / max tokens  size of the chunks
+    ingest ms         local time to chunk and index the documents
+    retrieved tokens  tokens the retrieval tool puts into the prompt per query
+    recall@k          share of the eval questions with a relevant chunk retrieved
+
+Retrieval is simulated with the TF-IDF backend of retrieval_sweep.py over the
+questions derived from the eval dataset, at the agent's top_k and distance
+threshold. Tokens are counted as words and punctuation marks, which is close
+to the engine's tokenizer for short list-like documents; the absolute numbers
+are estimates, the comparison between settings is what matters. The chosen
+setting goes into RAG_CHUNK_SIZE and RAG_CHUNK_OVERLAP in .env.
+
+Usage (from the project root):
+    python eval/chunking_benchmark.py                       # FILE_URL from .env
+    python eval/chunking_benchmark.py --document path/to/pwd.docx --settings 128:16,256:32,512:64
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+
+try:
+    from eval import retrieval_sweep
+except ImportError:
+    # Run as a script from the project root
+    import retrieval_sweep
+
+from rag.shared_libraries import chunking
+
+# The chunking of the RAG engine when none is configured
+ENGINE_DEFAULT = (chunking.DEFAULT_CHUNK_SIZE, chunking.DEFAULT_CHUNK_OVERLAP)
+DEFAULT_SETTINGS = ((128, 16), (256, 32), (512, 64), ENGINE_DEFAULT)
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def chunk_text(text, chunk_size, chunk_overlap):
+    """Splits text into windows of chunk_size tokens overlapping by chunk_overlap tokens.
+
+    The chunks are slices of the original text, so line breaks are kept.
+    """
+    if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+        raise ValueError(f"Invalid chunking {chunk_size}:{chunk_overlap}")
+    spans = [match.span() for match in TOKEN_PATTERN.finditer(text)]
+    step = chunk_size - chunk_overlap
+    chunks = []
+    for start in range(0, len(spans), step):
+        window = spans[start:start + chunk_size]
+        chunks.append(text[window[0][0]:window[-1][1]])
+        if start + chunk_size >= len(spans):
+            break
+    return chunks
+
+
+def evaluate_setting(texts, labels, chunk_size, chunk_overlap, top_k, threshold):
+    started = time.perf_counter()
+    chunks = [chunk for text in texts for chunk in chunk_text(text, chunk_size, chunk_overlap)]
+    backend = retrieval_sweep.LocalBackend(None, chunks=chunks)
+    ingest = time.perf_counter() - started
+
+    sizes = [count_tokens(chunk) for chunk in chunks] or [0]
+    result = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunks": len(chunks),
+        "avg_chunk_tokens": statistics.fmean(sizes),
+        "max_chunk_tokens": max(sizes),
+        "ingest_seconds": ingest,
+        "retrieved_tokens": None,
+        "recall_at_k": None,
+    }
+    if labels:
+        recalls, tokens = [], []
+        for label in labels:
+            contexts, _ = backend.retrieve(label["retrieval_query"], top_k, threshold)
+            recalls.append(1.0 if any(retrieval_sweep.is_relevant(c["text"], label) for c in contexts) else 0.0)
+            tokens.append(sum(count_tokens(c["text"]) for c in contexts))
+        result["retrieved_tokens"] = statistics.fmean(tokens)
+        result["recall_at_k"] = statistics.fmean(recalls)
+    return result
+
+
+def print_results(results, current):
+    print(f"{'size':>5} {'overlap':>7} {'chunks':>6} {'avg tok':>7} {'max tok':>7} "
+          f"{'ingest ms':>9} {'retr tok':>8} {'recall@k':>8}")
+    for r in results:
+        setting = (r["chunk_size"], r["chunk_overlap"])
+        marker = " <- current" if setting == current else (" <- engine default" if setting == ENGINE_DEFAULT else "")
+        retrieved = f"{r['retrieved_tokens']:>8.0f}" if r["retrieved_tokens"] is not None else f"{'-':>8}"
+        recall = f"{r['recall_at_k']:>8.2f}" if r["recall_at_k"] is not None else f"{'-':>8}"
+        print(
+            f"{r['chunk_size']:>5} {r['chunk_overlap']:>7} {r['chunks']:>6} {r['avg_chunk_tokens']:>7.0f} "
+            f"{r['max_chunk_tokens']:>7} {r['ingest_seconds'] * 1000:>9.1f} {retrieved} {recall}{marker}"
+        )
+
+
+def parse_settings(value):
+    settings = []
+    for item in value.split(","):
+        size, _, overlap = item.partition(":")
+        settings.append((int(size), int(overlap or 0)))
+    return settings
+
+
+def current_setting():
+    """The chunking of uploads configured in .env."""
+    return chunking.chunking_settings() or ENGINE_DEFAULT
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunk sizes and overlaps on the local documents.")
+    parser.add_argument("--document", action="append",
+                        help="Document to chunk (.txt, .pdf or .docx); repeatable, defaults to FILE_URL")
+    parser.add_argument("--settings", default=",".join(f"{size}:{overlap}" for size, overlap in DEFAULT_SETTINGS),
+                        help="Comma-separated chunk_size:chunk_overlap pairs in tokens")
+    parser.add_argument("--dataset", default=str(retrieval_sweep.DEFAULT_DATASET))
+    parser.add_argument("--top-k", type=int, default=retrieval_sweep.CURRENT_TOP_K)
+    parser.add_argument("--threshold", type=float, default=retrieval_sweep.CURRENT_THRESHOLD)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    from rag.shared_libraries import bootstrap
+
+    bootstrap.load_env()
+    documents = args.document or ([os.getenv("FILE_URL")] if os.getenv("FILE_URL") else [])
+    if not documents:
+        raise SystemExit("Pass --document or set FILE_URL in .env")
+    texts = [retrieval_sweep.load_document_text(document) for document in documents]
+    labels = retrieval_sweep.derive_labels(args.dataset) if os.path.exists(args.dataset) else []
+
+    current = current_setting()
+    settings = parse_settings(args.settings)
+    if current not in settings:
+        settings.append(current)
+    results = [
+        evaluate_setting(texts, labels, size, overlap, args.top_k, args.threshold)
+        for size, overlap in settings
+    ]
+    print(f"{len(documents)} document(s), {sum(count_tokens(text) for text in texts)} tokens, "
+          f"{len(labels)} labeled question(s), top_k={args.top_k}, threshold={args.threshold}\n")
+    print_results(results, current)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"documents": documents, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
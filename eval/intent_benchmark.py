@@ -0,0 +1,124 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Confusion-matrix benchmark of the local intent pre-router (deployment/intent_router.py).
+
+Every message of the labeled set (eval/data/intent_labels.json: the queries
+of deployment/run.py and the eval datasets, plus small talk and questions
+that open with a greeting or thanks) is classified by
+
+    rules        the keyword rules alone (the default, INTENT_MODEL unset)
+    rules+model  the rules, then the TF-IDF model (INTENT_MODEL=1)
+
+The model is evaluated leave-one-out: it is trained on the eval datasets
+and its seed examples without the message being classified. For each
+configuration it prints the confusion matrix (rows: labeled intent,
+columns: predicted intent) and counts
+
+    avoided    messages answered locally, i.e. Agent Engine round trips avoided
+    wrong      questions answered with a template instead of the agent
+    missed     small talk forwarded to the agent (a round trip, as before)
+
+Wrong answers are the expensive error; a configuration is only worth
+enabling with none of them.
+
+Usage (from the project root):
+    python -m eval.intent_benchmark
+    python -m eval.intent_benchmark --margin 0.1 --output intent_report.json
+"""
+
+import argparse
+import json
+import pathlib
+import time
+
+from deployment import intent_router
+
+DEFAULT_LABELS = pathlib.Path(__file__).parent / "data" / "intent_labels.json"
+INTENTS = ("greeting", "thanks", "goodbye", "chat", intent_router.QUESTION)
+
+
+def load_labels(path=DEFAULT_LABELS):
+    return [(item["query"], item["intent"]) for item in json.loads(pathlib.Path(path).read_text())]
+
+
+def evaluate(labels, classify):
+    """Classifies every labeled message with classify(message) and counts the outcomes."""
+    matrix = {intent: {predicted: 0 for predicted in INTENTS} for intent in INTENTS}
+    errors = []
+    seconds = 0.0
+    for message, intent in labels:
+        started = time.perf_counter()
+        predicted = classify(message)
+        seconds += time.perf_counter() - started
+        matrix[intent][predicted] += 1
+        if predicted != intent:
+            errors.append({"query": message, "intent": intent, "predicted": predicted})
+
+    question = intent_router.QUESTION
+    return {
+        "matrix": matrix,
+        "accuracy": sum(matrix[intent][intent] for intent in INTENTS) / len(labels) if labels else None,
+        "avoided": sum(n for intent in INTENTS for predicted, n in matrix[intent].items() if predicted != question),
+        "wrong": sum(n for predicted, n in matrix[question].items() if predicted != question),
+        "missed": sum(matrix[intent][question] for intent in INTENTS if intent != question),
+        "classify_us": seconds / len(labels) * 1e6 if labels else None,
+        "errors": errors,
+    }
+
+
+def leave_one_out(labels, margin):
+    """classify() of routers whose model never saw the message they classify (trained up front)."""
+    routers = {
+        message: intent_router.IntentRouter(
+            model=intent_router.IntentModel.from_eval_data(exclude={message}), margin=margin, repeat_ttl=0)
+        for message, _ in labels
+    }
+    return lambda message: routers[message].classify(message)
+
+
+def print_result(name, result):
+    print(f"\n{name}: accuracy {result['accuracy']:.2f}, {result['avoided']} round trip(s) avoided, "
+          f"{result['wrong']} wrong, {result['missed']} missed, {result['classify_us']:.0f} us per message")
+    print(f"{'labeled / predicted':>20} " + " ".join(f"{intent:>8}" for intent in INTENTS))
+    for intent in INTENTS:
+        print(f"{intent:>20} " + " ".join(f"{result['matrix'][intent][p]:>8}" for p in INTENTS))
+    for error in result["errors"]:
+        print(f"  {error['intent']} -> {error['predicted']}: {error['query']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confusion matrix of the local intent pre-router.")
+    parser.add_argument("--labels", default=str(DEFAULT_LABELS))
+    parser.add_argument("--margin", type=float, default=intent_router.DEFAULT_MODEL_MARGIN,
+                        help="Score margin the model needs to answer a message locally")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    small_talk = sum(1 for _, intent in labels if intent != intent_router.QUESTION)
+    print(f"{len(labels)} labeled message(s), {small_talk} small talk, {len(labels) - small_talk} question(s)")
+    results = {
+        "rules": evaluate(labels, intent_router.IntentRouter(repeat_ttl=0).classify),
+        "rules+model": evaluate(labels, leave_one_out(labels, args.margin)),
+    }
+    for name, result in results.items():
+        print_result(name, result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"labels": args.labels, "margin": args.margin, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Sweep benchmark for the retrieval tool's similarity_top_k and vector_distance_threshold.
+
+Labeled question -> expected-chunk pairs are derived from the eval dataset:
+every turn that expects a retrieval tool call becomes a question, and a
+retrieved chunk counts as relevant when it contains most of the key terms of
+the turn's reference answer.
+
+Backends:
+    live      queries the RAG_CORPUS (or its shards) with rag.retrieval_query for every setting
+    recorded  replays a file written by `--record` (one widest retrieval per question)
+    local     TF-IDF retrieval over the chunks of a local document, no network
+
+For every (top_k, threshold) setting it reports recall@k, MRR, the volume of
+retrieved tokens that ends up in the prompt and the retrieval latency, then
+recommends the cheapest setting that keeps the best recall (normally that of
+the current rag/agent.py configuration).
+
+Usage (from the project root):
+    python eval/retrieval_sweep.py --backend live --record eval/data/retrieval_recording.json
+    python eval/retrieval_sweep.py --backend recorded --recording eval/data/retrieval_recording.json
+    python eval/retrieval_sweep.py --backend local --document path/to/pwd.docx
+"""
+
+import argparse
+import json
+import math
+import os
+import pathlib
+import re
+import statistics
+import time
+import zipfile
+from collections import Counter
+
+DATA_DIR = pathlib.Path(__file__).parent / "data"
+DEFAULT_DATASET = DATA_DIR / "conversation-pwd.test.json"
+# Current values in rag/agent.py
+CURRENT_TOP_K = 10
+CURRENT_THRESHOLD = 0.6
+DEFAULT_TOP_KS = (1, 3, 5, 10, 20)
+DEFAULT_THRESHOLDS = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8)
+# Share of the reference key terms a chunk must contain to count as relevant
+MIN_TERM_RATIO = 0.5
+
+STOPWORDS = set("""
+a an and are as at be based by can citation do does for from have has how i in is it its
+me my of on or so that the their there this to was what when where which who with you your
+""".split())
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def key_terms(text):
+    # Citations such as "[Citation: Based on pwd.docx]" are not part of the answer
+    text = re.sub(r"\[[^\]]*\]", " ", text or "")
+    return sorted({word for word in _words(text) if word not in STOPWORDS and len(word) > 1})
+
+
+def derive_labels(dataset_file=DEFAULT_DATASET):
+    """Builds labeled retrieval cases from the turns that expect a tool call."""
+    labels = []
+    for turn in json.loads(pathlib.Path(dataset_file).read_text()):
+        for tool_use in turn.get("expected_tool_use", []):
+            labels.append({
+                "question": turn["query"],
+                "retrieval_query": tool_use.get("tool_input", {}).get("query", turn["query"]),
+                "expected_terms": key_terms(turn["reference"]),
+            })
+    return labels
+
+
+def is_relevant(chunk_text, label):
+    terms = label["expected_terms"]
+    if not terms:
+        return False
+    words = set(_words(chunk_text))
+    return sum(1 for term in terms if term in words) / len(terms) >= MIN_TERM_RATIO
+
+
+# --- Backends ---
+class LiveBackend:
+    """Retrieves from the RAG_CORPUS (or all RAG_CORPUS_SHARDS) configured in .env."""
+
+    def __init__(self):
+        from rag.shared_libraries import bootstrap, quota, sharding
+
+        bootstrap.init_vertexai()
+        self.retriever = sharding.ShardedRetriever(
+            sharding.load_shards(),
+            timeout=float(os.getenv("RAG_SHARD_TIMEOUT_SECONDS", sharding.DEFAULT_TIMEOUT_SECONDS)),
+            scheduler=quota.get_scheduler(),
+        )
+        # The shards are queried from worker threads, so set the process default
+        quota.set_default_priority(quota.BATCH)
+
+    def retrieve(self, query, top_k, threshold):
+        """Returns (contexts, latency) where contexts are sorted by distance."""
+        started = time.perf_counter()
+        contexts = self.retriever.retrieve(query, top_k=top_k, distance_threshold=threshold)
+        latency = time.perf_counter() - started
+        return [
+            {"text": c["text"], "distance": c["distance"], "source": c["source"]}
+            for c in contexts
+        ], latency
+
+
+class RecordedBackend:
+    """Replays the widest retrieval recorded per query and narrows it per setting.
+
+    Results of a smaller top_k or threshold are a prefix of the widest results,
+    so one recorded retrieval per question covers the whole sweep.
+    """
+
+    def __init__(self, recording_file):
+        self.recording = json.loads(pathlib.Path(recording_file).read_text())
+
+    def retrieve(self, query, top_k, threshold):
+        recorded = self.recording[query]
+        contexts = [c for c in recorded["contexts"] if c["distance"] <= threshold][:top_k]
+        return contexts, recorded["latency"]
+
+
+class LocalBackend:
+    """TF-IDF cosine retrieval over fixed-size word chunks of a local document.
+
+    Pre-chunked text can be passed as chunks instead of a document.
+    """
+
+    def __init__(self, document, chunk_words=200, overlap_words=40, chunks=None):
+        if chunks is None:
+            words = load_document_text(document).split()
+            step = max(1, chunk_words - overlap_words)
+            chunks = [
+                " ".join(words[start:start + chunk_words])
+                for start in range(0, max(1, len(words) - overlap_words), step)
+            ]
+        self.chunks = chunks
+        self.source = os.path.basename(document) if document else "chunks"
+        counts = [Counter(_words(chunk)) for chunk in self.chunks]
+        document_frequency = Counter(word for count in counts for word in count)
+        self.idf = {
+            word: math.log((1 + len(counts)) / (1 + df)) + 1
+            for word, df in document_frequency.items()
+        }
+        self.vectors = [self._vector(count) for count in counts]
+
+    def _vector(self, counts):
+        vector = {word: count * self.idf.get(word, 0.0) for word, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {word: v / norm for word, v in vector.items()}
+
+    def retrieve(self, query, top_k, threshold):
+        started = time.perf_counter()
+        query_vector = self._vector(Counter(_words(query)))
+        contexts = []
+        for chunk, vector in zip(self.chunks, self.vectors):
+            similarity = sum(weight * vector.get(word, 0.0) for word, weight in query_vector.items())
+            distance = 1.0 - similarity
+            if distance <= threshold:
+                contexts.append({"text": chunk, "distance": distance, "source": self.source})
+        contexts.sort(key=lambda c: c["distance"])
+        return contexts[:top_k], time.perf_counter() - started
+
+
+def load_document_text(path):
+    """Reads the text of a .txt, .pdf (requires pypdf) or .docx document."""
+    suffix = pathlib.Path(path).suffix.lower()
+    if suffix == ".pdf":
+        import pypdf
+
+        return "\n".join(page.extract_text() or "" for page in pypdf.PdfReader(path).pages)
+    if suffix == ".docx":
+        with zipfile.ZipFile(path) as docx:
+            xml = docx.read("word/document.xml").decode("utf-8")
+        xml = re.sub(r"</w:p>", "\n", xml)
+        return re.sub(r"<[^>]+>", "", xml)
+    return pathlib.Path(path).read_text(encoding="utf-8", errors="ignore")
+
+
+# --- Sweep ---
+def evaluate_setting(backend, labels, top_k, threshold):
+    recalls, reciprocal_ranks, tokens, latencies = [], [], [], []
+    for label in labels:
+        contexts, latency = backend.retrieve(label["retrieval_query"], top_k, threshold)
+        ranks = [rank for rank, context in enumerate(contexts, 1) if is_relevant(context["text"], label)]
+        recalls.append(1.0 if ranks else 0.0)
+        reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+        tokens.append(sum(estimate_tokens(context["text"]) for context in contexts))
+        latencies.append(latency)
+    return {
+        "top_k": top_k,
+        "threshold": threshold,
+        "recall_at_k": statistics.fmean(recalls),
+        "mrr": statistics.fmean(reciprocal_ranks),
+        "retrieved_tokens": statistics.fmean(tokens),
+        "latency": statistics.fmean(latencies),
+        "latency_max": max(latencies),
+    }
+
+
+def sweep(backend, labels, top_ks, thresholds):
+    return [
+        evaluate_setting(backend, labels, top_k, threshold)
+        for top_k in top_ks
+        for threshold in thresholds
+    ]
+
+
+def recommend(results):
+    """Cheapest setting (fewest retrieved tokens) that reaches the best recall of the sweep.
+
+    The current rag/agent.py setting normally reaches it, so the recommendation
+    keeps its recall; ties on tokens prefer a higher MRR, then a smaller top_k.
+    """
+    current = next(
+        (r for r in results if r["top_k"] == CURRENT_TOP_K and r["threshold"] == CURRENT_THRESHOLD),
+        None,
+    )
+    best_recall = max(r["recall_at_k"] for r in results)
+    candidates = [r for r in results if r["recall_at_k"] >= best_recall]
+    return current, min(candidates, key=lambda r: (r["retrieved_tokens"], -r["mrr"], r["top_k"], r["latency"]))
+
+
+def record(backend, labels, top_k, threshold, output_file):
+    """Stores the widest retrieval of every question for the recorded backend."""
+    recording = {}
+    for label in labels:
+        contexts, latency = backend.retrieve(label["retrieval_query"], top_k, threshold)
+        recording[label["retrieval_query"]] = {"latency": latency, "contexts": contexts}
+    with open(output_file, "w") as f:
+        json.dump(recording, f, indent=4)
+    print(f"Recorded {len(recording)} retrievals to {output_file}")
+
+
+def print_results(results, current, best):
+    print(f"{'top_k':>5} {'thresh':>6} {'recall@k':>8} {'MRR':>6} {'tokens':>8} {'latency s':>9}")
+    for r in results:
+        marker = " <- current" if r is current else (" <- recommended" if r is best else "")
+        print(
+            f"{r['top_k']:>5} {r['threshold']:>6.2f} {r['recall_at_k']:>8.2f} {r['mrr']:>6.2f} "
+            f"{r['retrieved_tokens']:>8.0f} {r['latency']:>9.3f}{marker}"
+        )
+    print(f"\nRecommended: similarity_top_k={best['top_k']}, "
+          f"vector_distance_threshold={best['threshold']} "
+          f"({best['retrieved_tokens']:.0f} retrieved tokens per query)")
+
+
+def _floats(value):
+    return [float(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep similarity_top_k and vector_distance_threshold.")
+    parser.add_argument("--backend", choices=("live", "recorded", "local"), default="recorded")
+    parser.add_argument("--dataset", default=str(DEFAULT_DATASET))
+    parser.add_argument("--recording", help="Recording file for the recorded backend")
+    parser.add_argument("--document", help="Local document for the local backend")
+    parser.add_argument("--record", help="Record the widest retrieval per question to this file and exit")
+    parser.add_argument("--top-k", default=",".join(map(str, DEFAULT_TOP_KS)))
+    parser.add_argument("--thresholds", default=",".join(map(str, DEFAULT_THRESHOLDS)))
+    parser.add_argument("--output", help="Write the sweep results as JSON")
+    args = parser.parse_args()
+
+    top_ks = [int(k) for k in _floats(args.top_k)]
+    thresholds = _floats(args.thresholds)
+    labels = derive_labels(args.dataset)
+    if not labels:
+        raise SystemExit(f"No turns with expected tool calls in {args.dataset}")
+
+    if args.backend == "live":
+        backend = LiveBackend()
+    elif args.backend == "recorded":
+        if not args.recording:
+            raise SystemExit("--recording is required for the recorded backend")
+        backend = RecordedBackend(args.recording)
+    else:
+        if not args.document:
+            raise SystemExit("--document is required for the local backend")
+        backend = LocalBackend(args.document)
+
+    if args.record:
+        record(backend, labels, max(top_ks), max(thresholds), args.record)
+        return
+
+    results = sweep(backend, labels, top_ks, thresholds)
+    current, best = recommend(results)
+    print(f"{len(labels)} labeled question(s), backend: {args.backend}\n")
+    print_results(results, current, best)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results, "recommended": best}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
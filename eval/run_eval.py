@@ -0,0 +1,278 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Parallel evaluation runner for the RAG agent.
+
+AgentEvaluator.evaluate runs every conversation and every repetition one
+after another. This runner replays the conversations of the eval datasets
+with an ADK Runner instead: each (dataset, run) pair is an independent
+session, and up to `--concurrency` of them are in flight at once. Turns of a
+conversation still run in order within their session.
+
+For every turn it records the same scores AgentEvaluator checks
+(`tool_trajectory_avg_score`: exact match of the tool calls,
+`response_match_score`: ROUGE-1 F1 against the reference), the latency and
+the token usage, then reports mean/stddev across runs per case and overall
+against the thresholds in test_config.json.
+
+Usage (from the project root):
+    python eval/run_eval.py --num-runs 5 --concurrency 4
+    python eval/run_eval.py eval/data/conversation-pwd.test.json --output eval_report.json
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import pathlib
+import re
+import statistics
+import time
+from collections import Counter
+
+import dotenv
+
+DATA_DIR = pathlib.Path(__file__).parent / "data"
+APP_NAME = "rag_eval"
+USER_ID = "eval_user"
+
+
+def load_datasets(paths):
+    """Returns (name, turns) pairs for the given dataset files or directories."""
+    files = []
+    for path in map(pathlib.Path, paths):
+        files.extend(sorted(path.glob("*.test.json")) if path.is_dir() else [path])
+    return [(file.name, json.loads(file.read_text())) for file in files]
+
+
+def load_criteria(dataset_dir=DATA_DIR):
+    config_file = pathlib.Path(dataset_dir) / "test_config.json"
+    if not config_file.exists():
+        return {}
+    return json.loads(config_file.read_text()).get("criteria", {})
+
+
+def _tokens(text):
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def rouge1_f1(candidate, reference):
+    """ROUGE-1 F1 score, using the rouge_score package when it is installed."""
+    try:
+        from rouge_score import rouge_scorer
+    except ImportError:
+        candidate_tokens, reference_tokens = Counter(_tokens(candidate)), Counter(_tokens(reference))
+        overlap = sum((candidate_tokens & reference_tokens).values())
+        if not overlap:
+            return 0.0
+        precision = overlap / sum(candidate_tokens.values())
+        recall = overlap / sum(reference_tokens.values())
+        return 2 * precision * recall / (precision + recall)
+    scorer = rouge_scorer.RougeScorer(["rouge1"], use_stemmer=True)
+    return scorer.score(reference or "", candidate or "")["rouge1"].fmeasure
+
+
+def trajectory_score(actual_calls, expected_calls):
+    """1.0 if the agent made exactly the expected tool calls, in order, else 0.0."""
+    expected = [(call["tool_name"], call["tool_input"]) for call in expected_calls]
+    return 1.0 if actual_calls == expected else 0.0
+
+
+async def _maybe_await(value):
+    return await value if inspect.isawaitable(value) else value
+
+
+async def run_conversation(runner, session_service, dataset_name, turns, run_index, semaphore):
+    """Replays one conversation in a fresh session and scores every turn."""
+    from google.genai import types
+
+    async with semaphore:
+        # create_session is synchronous in older ADK releases and a coroutine in newer ones
+        session = await _maybe_await(
+            session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+        )
+        results = []
+        for turn_index, turn in enumerate(turns):
+            message = types.Content(role="user", parts=[types.Part(text=turn["query"])])
+            tool_calls, response_parts = [], []
+            prompt_tokens = output_tokens = 0
+            started = time.perf_counter()
+            error = None
+            try:
+                async for event in runner.run_async(
+                    user_id=USER_ID, session_id=session.id, new_message=message
+                ):
+                    for call in event.get_function_calls() or []:
+                        tool_calls.append((call.name, dict(call.args or {})))
+                    usage = getattr(event, "usage_metadata", None)
+                    if usage:
+                        prompt_tokens += usage.prompt_token_count or 0
+                        output_tokens += usage.candidates_token_count or 0
+                    if event.is_final_response() and event.content and event.content.parts:
+                        response_parts.extend(part.text for part in event.content.parts if part.text)
+            except Exception as e:
+                error = str(e)
+            response = "".join(response_parts)
+            results.append({
+                "dataset": dataset_name,
+                "case": turn_index,
+                "run": run_index,
+                "query": turn["query"],
+                "response": response,
+                "error": error,
+                "latency": time.perf_counter() - started,
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "tool_trajectory_avg_score": trajectory_score(tool_calls, turn.get("expected_tool_use", [])),
+                "response_match_score": rouge1_f1(response, turn.get("reference", "")),
+            })
+        print(f"Finished {dataset_name} run {run_index + 1}")
+        return results
+
+
+async def run_all(datasets, num_runs, concurrency):
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from rag.agent import root_agent
+    from rag.shared_libraries import quota
+
+    scheduler = quota.get_scheduler()
+
+    async def wait_for_quota(callback_context, llm_request):
+        # Every model call of the eval goes through the shared Gemini quota at batch priority
+        await asyncio.to_thread(scheduler.acquire, "gemini", quota.BATCH)
+        return None
+
+    agent = root_agent.model_copy(update={"before_model_callback": wait_for_quota})
+    session_service = InMemorySessionService()
+    runner = Runner(app_name=APP_NAME, agent=agent, session_service=session_service)
+    semaphore = asyncio.Semaphore(concurrency)
+    jobs = [
+        run_conversation(runner, session_service, name, turns, run_index, semaphore)
+        for name, turns in datasets
+        for run_index in range(num_runs)
+    ]
+    results = []
+    for conversation in await asyncio.gather(*jobs):
+        results.extend(conversation)
+    return results
+
+
+METRICS = ("tool_trajectory_avg_score", "response_match_score", "latency", "prompt_tokens", "output_tokens")
+
+
+def _mean_std(values):
+    if not values:
+        return {"mean": None, "stddev": None}
+    return {
+        "mean": statistics.fmean(values),
+        "stddev": statistics.stdev(values) if len(values) > 1 else 0.0,
+    }
+
+
+def aggregate(results, criteria, num_runs):
+    """Aggregates per-turn results into per-case and overall mean/stddev across runs."""
+    cases = {}
+    for result in results:
+        cases.setdefault((result["dataset"], result["case"]), []).append(result)
+
+    report = {"num_runs": num_runs, "cases": [], "overall": {}, "criteria": {}}
+    for (dataset, case), case_results in sorted(cases.items()):
+        report["cases"].append({
+            "dataset": dataset,
+            "case": case,
+            "query": case_results[0]["query"],
+            "errors": sum(1 for r in case_results if r["error"]),
+            **{metric: _mean_std([r[metric] for r in case_results]) for metric in METRICS},
+        })
+
+    # Overall scores are averaged per run first, so the stddev is the run-to-run spread
+    for metric in METRICS:
+        per_run = []
+        for run_index in range(num_runs):
+            values = [r[metric] for r in results if r["run"] == run_index]
+            if values:
+                per_run.append(statistics.fmean(values))
+        report["overall"][metric] = _mean_std(per_run)
+
+    for name, threshold in criteria.items():
+        mean = report["overall"].get(name, {}).get("mean")
+        report["criteria"][name] = {
+            "threshold": threshold,
+            "mean": mean,
+            "passed": mean is not None and mean >= threshold,
+        }
+    report["errors"] = sum(1 for r in results if r["error"])
+    return report
+
+
+def print_report(report, wall_time):
+    print("\n" + "=" * 50)
+    print(f"{len(report['cases'])} cases x {report['num_runs']} runs in {wall_time:.1f}s")
+    for case in report["cases"]:
+        print(
+            f"- {case['dataset']}#{case['case']}: "
+            f"trajectory {_fmt(case['tool_trajectory_avg_score'])}, "
+            f"response {_fmt(case['response_match_score'])}, "
+            f"latency {_fmt(case['latency'])}s, "
+            f"tokens {_fmt(case['prompt_tokens'], 0)} in / {_fmt(case['output_tokens'], 0)} out"
+            + (f", {case['errors']} error(s)" if case["errors"] else "")
+        )
+    print("Overall (mean ± stddev across runs):")
+    for metric, values in report["overall"].items():
+        print(f"  {metric}: {_fmt(values)}")
+    for name, result in report["criteria"].items():
+        status = "PASS" if result["passed"] else "FAIL"
+        print(f"  [{status}] {name}: {_fmt(result['mean'])} (threshold {result['threshold']})")
+    print("=" * 50)
+
+
+def _fmt(value, digits=2):
+    if isinstance(value, dict):
+        if value["mean"] is None:
+            return "-"
+        return f"{value['mean']:.{digits}f} ± {value['stddev']:.{digits}f}"
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the agent evaluation datasets in parallel.")
+    parser.add_argument("datasets", nargs="*", default=[str(DATA_DIR)],
+                        help="Dataset files or directories (default: eval/data)")
+    parser.add_argument("--num-runs", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of conversations in flight")
+    parser.add_argument("--output", help="Write the full report (including every turn) as JSON")
+    args = parser.parse_args()
+
+    dotenv.load_dotenv()
+    datasets = load_datasets(args.datasets)
+    started = time.perf_counter()
+    results = asyncio.run(run_all(datasets, args.num_runs, args.concurrency))
+    wall_time = time.perf_counter() - started
+
+    report = aggregate(results, load_criteria(), args.num_runs)
+    report["wall_time"] = wall_time
+    print_report(report, wall_time)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({**report, "results": results}, f, indent=4)
+        print(f"Report written to {args.output}")
+    if not all(result["passed"] for result in report["criteria"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,4 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from . import agent
\ No newline at end of file
+import importlib
+
+
+def __getattr__(name):
+    # The agent (and with it the ADK and Vertex AI SDKs) is only imported when
+    # used, so the scripts using rag.shared_libraries start without it
+    if name == "agent":
+        return importlib.import_module(f"{__name__}.agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
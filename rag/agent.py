@@ -20,25 +20,41 @@ from vertexai.preview import rag
 
 from dotenv import load_dotenv
 from .prompts import return_instructions_root
+from .shared_libraries import sharding
 
 load_dotenv()
 
-ask_vertex_retrieval = VertexAiRagRetrieval(
-    name='retrieve_rag_documentation',
-    description=(
-        'Use this tool to retrieve documentation and reference materials for the question from the RAG corpus,'
-    ),
-    rag_resources=[
-        rag.RagResource(
-            # please fill in your own rag corpus
-            # here is a sample rag coprus for testing purpose
-            # e.g. projects/123/locations/us-central1/ragCorpora/456
-            rag_corpus=os.environ.get("RAG_CORPUS")
+SIMILARITY_TOP_K = 10
+VECTOR_DISTANCE_THRESHOLD = 0.6
+
+shards = sharding.load_shards()
+if len(shards) > 1:
+    # Several corpora (RAG_CORPUS_SHARDS): fan out to all of them and merge by distance
+    ask_vertex_retrieval = sharding.make_retrieval_tool(
+        sharding.ShardedRetriever(
+            shards,
+            top_k=SIMILARITY_TOP_K,
+            distance_threshold=VECTOR_DISTANCE_THRESHOLD,
+            timeout=float(os.environ.get("RAG_SHARD_TIMEOUT_SECONDS", sharding.DEFAULT_TIMEOUT_SECONDS)),
         )
-    ],
-    similarity_top_k=10,
-    vector_distance_threshold=0.6,
-)
+    )
+else:
+    ask_vertex_retrieval = VertexAiRagRetrieval(
+        name='retrieve_rag_documentation',
+        description=(
+            'Use this tool to retrieve documentation and reference materials for the question from the RAG corpus,'
+        ),
+        rag_resources=[
+            rag.RagResource(
+                # please fill in your own rag corpus
+                # here is a sample rag coprus for testing purpose
+                # e.g. projects/123/locations/us-central1/ragCorpora/456
+                rag_corpus=shards[0].corpus if shards else None
+            )
+        ],
+        similarity_top_k=SIMILARITY_TOP_K,
+        vector_distance_threshold=VECTOR_DISTANCE_THRESHOLD,
+    )
 
 root_agent = Agent(
     model='gemini-2.0-flash-001',
@@ -36,6 +36,12 @@ def return_instructions_root() -> str:
         Do not answer questions that are not related to the corpus.
         When crafting your answer, you may use the retrieval tool to fetch details
         from the corpus. Make sure to cite the source of the information.
+
+        A message may end with a <retrieved_context> block. It holds the chunks the
+        retrieval tool returns for the question, fetched while the user was typing.
+        Answer from these chunks without calling the retrieval tool, and cite them like
+        retrieved chunks (the source is in square brackets). Only use the retrieval
+        tool if they do not contain the answer. Never mention the block to the user.
         
         Citation Format Instructions:
  
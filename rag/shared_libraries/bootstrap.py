@@ -0,0 +1,276 @@
+"""Shared startup of the scripts: .env, settings, credentials and Vertex AI.
+
+Importing vertexai takes seconds, and google.auth.default() plus the first
+token refresh add a network round trip to every run. Most scheduled runs
+find nothing to do and never call the API, so this module defers all of it:
+
+    load_env()         loads the .env file once per process
+    require_env(name)  the value of a required setting, or ValueError
+    vertex_rag         vertexai.preview.rag, imported and initialized on first use
+    get_credentials()  (credentials, project) like google.auth.default(), with
+                       the access token cached on disk between runs
+    init_vertexai()    vertexai.init(), once per process and configuration
+    get_agent_engine() agent_engines.get(), once per process and resource name
+
+The token cache (CREDENTIALS_CACHE_PATH, default ~/.cache/rag-agent/
+credentials.json, readable by the user only) holds the current access token
+and its expiry. It is used until shortly before the token expires and only
+while the application default credentials file it was obtained with is
+unchanged; the credentials are then loaded and refreshed as usual and the
+new token is cached. CREDENTIALS_CACHE=0 disables the cache.
+"""
+import importlib
+import json
+import os
+import threading
+import types
+from datetime import datetime, timedelta
+
+import google.auth
+from google.auth import credentials as auth_credentials
+from dotenv import load_dotenv
+
+# ENV_FILE selects another settings file, e.g. to run a script against a test project
+ENV_FILE_PATH = os.getenv("ENV_FILE") or os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", ".env")
+)
+DEFAULT_CREDENTIALS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "rag-agent", "credentials.json")
+CLOUD_PLATFORM_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+# Cached tokens closer than this to their expiry are not used
+TOKEN_EXPIRY_MARGIN = timedelta(minutes=5)
+
+_lock = threading.RLock()
+_env_loaded = None
+_credentials = None
+_initialized = None
+_agent_engines = {}
+
+
+# --- Settings ---
+def load_env(override=False):
+    """Loads the .env file (once; again only to override with its values)."""
+    global _env_loaded
+    with _lock:
+        if _env_loaded is None or (override and not _env_loaded):
+            load_dotenv(ENV_FILE_PATH if os.path.exists(ENV_FILE_PATH) else None, override=override)
+            _env_loaded = override
+
+
+def require_env(name):
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(
+            f"{name} environment variable not set. Please set it in your .env file."
+        )
+    return value
+
+
+# --- Lazy imports ---
+class LazyModule(types.ModuleType):
+    """Stands in for a module that is only imported when first used."""
+
+    def __init__(self, name, on_load=None):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+        self.__dict__["_callbacks"] = [on_load] if on_load else []
+
+    @property
+    def loaded(self):
+        return self.__dict__["_module"] is not None
+
+    def load(self):
+        """Imports the module now (if it is not yet) and returns it."""
+        module = self.__dict__["_module"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    # A failing callback (e.g. no credentials) is retried on the next use
+                    callbacks = self.__dict__["_callbacks"]
+                    while callbacks:
+                        callbacks[0](module)
+                        callbacks.pop(0)
+                    self.__dict__["_module"] = module
+        return module
+
+    def when_loaded(self, callback):
+        """Calls callback(module) once the module is imported, right away if it is."""
+        with _lock:
+            if not self.loaded:
+                self.__dict__["_callbacks"].append(callback)
+                return
+        callback(self.load())
+
+    def discard(self, callback):
+        with _lock:
+            if callback in self.__dict__["_callbacks"]:
+                self.__dict__["_callbacks"].remove(callback)
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.load(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.load(), name)
+
+    def __dir__(self):
+        return dir(self.load())
+
+
+def _init_on_load(module):
+    init_vertexai()
+
+
+# The RAG API of the scripts; Vertex AI is initialized from .env on first use
+vertex_rag = LazyModule("vertexai.preview.rag", on_load=_init_on_load)
+
+
+# --- Credentials ---
+def _credentials_cache_path():
+    return os.path.expanduser(os.getenv("CREDENTIALS_CACHE_PATH") or DEFAULT_CREDENTIALS_CACHE_PATH)
+
+
+def _cache_enabled():
+    return os.getenv("CREDENTIALS_CACHE", "1").lower() not in ("0", "false", "no")
+
+
+def _credentials_source():
+    """Identifies the application default credentials a token was obtained with."""
+    path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    if not path:
+        try:
+            from google.auth import _cloud_sdk
+            path = _cloud_sdk.get_application_default_credentials_path()
+        except Exception:
+            path = None
+    try:
+        return f"{path}:{os.path.getmtime(path)}"
+    except (OSError, TypeError):
+        # No credentials file, e.g. the metadata server of a Google Cloud VM
+        return "metadata"
+
+
+def _read_token_cache():
+    try:
+        with open(_credentials_cache_path(), "r") as f:
+            cached = json.load(f)
+        expiry = datetime.fromisoformat(cached["expiry"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    # google-auth compares expiries as naive UTC datetimes
+    if cached.get("source") != _credentials_source() or expiry - TOKEN_EXPIRY_MARGIN <= _utcnow():
+        return None
+    cached["expiry"] = expiry
+    return cached
+
+
+def _write_token_cache(token, expiry, project, quota_project_id):
+    path = _credentials_cache_path()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    record = {
+        "token": token,
+        "expiry": expiry.isoformat() if expiry else None,
+        "project": project,
+        "quota_project_id": quota_project_id,
+        "source": _credentials_source(),
+    }
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing credentials cache {path}: {e}")
+
+
+def _utcnow():
+    from google.auth import _helpers
+    return _helpers.utcnow()
+
+
+class CachedCredentials(auth_credentials.Credentials):
+    """Credentials starting from a cached access token.
+
+    The application default credentials are only loaded when the token has
+    to be refreshed; every refreshed token is written back to the cache.
+    """
+
+    def __init__(self, token=None, expiry=None, project=None, quota_project_id=None, credentials=None):
+        super().__init__()
+        self.token = token
+        self.expiry = expiry
+        self.project = project
+        self._quota_project_id = quota_project_id
+        self._credentials = credentials
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, request):
+        with self._refresh_lock:
+            if self._credentials is None:
+                self._credentials, _ = google.auth.default(scopes=CLOUD_PLATFORM_SCOPES)
+            self._credentials.refresh(request)
+            self.token = self._credentials.token
+            self.expiry = self._credentials.expiry
+            self._quota_project_id = getattr(self._credentials, "quota_project_id", None) or self._quota_project_id
+            if _cache_enabled() and self.expiry is not None:
+                _write_token_cache(self.token, self.expiry, self.project, self._quota_project_id)
+
+
+def get_credentials():
+    """Returns (credentials, project) for the application default credentials, once per process."""
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            cached = _read_token_cache() if _cache_enabled() else None
+            if cached is not None:
+                credentials = CachedCredentials(
+                    cached["token"], cached["expiry"], cached.get("project"), cached.get("quota_project_id")
+                )
+                project = cached.get("project")
+            else:
+                inner, project = google.auth.default(scopes=CLOUD_PLATFORM_SCOPES)
+                credentials = CachedCredentials(
+                    project=project,
+                    quota_project_id=getattr(inner, "quota_project_id", None),
+                    credentials=inner,
+                )
+            _credentials = (credentials, project)
+        return _credentials
+
+
+# --- Vertex AI ---
+def init_vertexai(project=None, location=None, credentials=None, **kwargs):
+    """Calls vertexai.init() unless this process already did with the same settings.
+
+    project and location default to GOOGLE_CLOUD_PROJECT and GOOGLE_CLOUD_LOCATION.
+    """
+    global _initialized
+    load_env()
+    project = project or require_env("GOOGLE_CLOUD_PROJECT")
+    location = location or require_env("GOOGLE_CLOUD_LOCATION")
+    config = (project, location, id(credentials), tuple(sorted(kwargs.items())))
+    with _lock:
+        if _initialized == config:
+            return
+        import vertexai
+
+        if credentials is None:
+            credentials, _ = get_credentials()
+        vertexai.init(project=project, location=location, credentials=credentials, **kwargs)
+        _initialized = config
+
+
+def get_agent_engine(resource_name):
+    """Returns the deployed agent engine, fetched once per process."""
+    with _lock:
+        engine = _agent_engines.get(resource_name)
+        if engine is None:
+            init_vertexai()
+            from vertexai import agent_engines
+
+            engine = _agent_engines[resource_name] = agent_engines.get(resource_name)
+        return engine
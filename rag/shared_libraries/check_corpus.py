@@ -1,39 +1,30 @@
-from google.auth import default
-import vertexai
-from vertexai.preview import rag
 import os
-from dotenv import load_dotenv
+from rag.shared_libraries import bootstrap, corpus_cache, quota, sharding
 # import requests
 # import tempfile
 
 # Load environment variables from .env file
-load_dotenv()
+bootstrap.load_env()
+
+rag = bootstrap.vertex_rag
 
 # --- Please fill in your configurations ---
 # Retrieve the PROJECT_ID from the environmental variables.
-PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
-if not PROJECT_ID:
-    raise ValueError(
-        "GOOGLE_CLOUD_PROJECT environment variable not set. Please set it in your .env file."
-    )
-LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION")
-if not LOCATION:
-    raise ValueError(
-        "GOOGLE_CLOUD_LOCATION environment variable not set. Please set it in your .env file."
-    )
+PROJECT_ID = bootstrap.require_env("GOOGLE_CLOUD_PROJECT")
+LOCATION = bootstrap.require_env("GOOGLE_CLOUD_LOCATION")
 
 def check_corpus_status(corpus_display_name):
     """Checks the status of a corpus by corpus display name."""
     try:
         # Find corpus by display name
-        existing_corpora = rag.list_corpora()
-        corpus = None
-        for existing_corpus in existing_corpora:
-            if existing_corpus.display_name == corpus_display_name:
-                corpus = existing_corpus
-                print(f"Found existing corpus with display name '{corpus_display_name}'")
-                break
-        files = rag.list_files(corpus_name=corpus.name) if corpus else None
+        corpus = corpus_cache.find_corpus(corpus_display_name)
+        if corpus is None:
+            print(f"No corpus found with display name '{corpus_display_name}'")
+            return None
+        print(f"Found existing corpus with display name '{corpus_display_name}'")
+        # Always list the files live here and refresh the cached index with them
+        files = quota.call("rag", lambda: list(rag.list_files(corpus_name=corpus.name)))
+        corpus_cache.remember_files(corpus.name, files)
         if files:
             print(f"Files in corpus '{corpus.display_name}':")
             for file in files:
@@ -47,17 +38,21 @@ def check_corpus_status(corpus_display_name):
     
 def main():
     # Initialize Vertex AI
-    credentials, project = default()
-    vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
+    bootstrap.init_vertexai(PROJECT_ID, LOCATION)
 
-    # Check the status of the corpus
+    # Check the status of the corpus, or of every shard corpus when sharding is configured
     corpus_display_name = os.getenv("CORPUS_DISPLAY_NAME")
-    corpus_status = check_corpus_status(corpus_display_name)
-    if corpus_status:
-        print(f"Corpus '{corpus_display_name}' status: {corpus_status}")
-    else:
-        print(f"Corpus '{corpus_display_name}' not found or error occurred.")
-
+    display_names = [corpus_display_name]
+    if sharding.sharding_enabled():
+        shard_names = [name for name, _ in sharding.parse_routes(os.getenv("RAG_SHARD_ROUTES"))]
+        shard_names += [shard.name for shard in sharding.load_shards() if shard.name not in shard_names]
+        display_names = [f"{corpus_display_name}_{name}" for name in shard_names]
+    for display_name in display_names:
+        corpus_status = check_corpus_status(display_name)
+        if corpus_status:
+            print(f"Corpus '{display_name}' status: {corpus_status}")
+        else:
+            print(f"Corpus '{display_name}' not found or error occurred.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
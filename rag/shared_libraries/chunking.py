@@ -0,0 +1,35 @@
+"""Chunking of uploaded documents, configured by RAG_CHUNK_SIZE and RAG_CHUNK_OVERLAP.
+
+Kept free of import-time requirements so the offline chunking benchmark can
+read the configured setting without any cloud configuration.
+"""
+import os
+
+# Chunking of the RAG engine when RAG_CHUNK_SIZE / RAG_CHUNK_OVERLAP are not set (tokens)
+DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_CHUNK_OVERLAP = 200
+
+
+def default_overlap(chunk_size):
+    """The overlap used when only RAG_CHUNK_SIZE is set: a fifth of the size, at most DEFAULT_CHUNK_OVERLAP."""
+    return min(DEFAULT_CHUNK_OVERLAP, chunk_size // 5)
+
+
+def chunking_settings():
+    """Returns (chunk_size, chunk_overlap) in tokens from RAG_CHUNK_SIZE and RAG_CHUNK_OVERLAP.
+
+    Returns None when neither is set, leaving the chunking to the RAG engine.
+    A missing size is DEFAULT_CHUNK_SIZE, a missing overlap default_overlap(size).
+    """
+    size = os.getenv("RAG_CHUNK_SIZE")
+    overlap = os.getenv("RAG_CHUNK_OVERLAP")
+    if not size and not overlap:
+        return None
+    chunk_size = int(size) if size else DEFAULT_CHUNK_SIZE
+    chunk_overlap = int(overlap) if overlap else default_overlap(chunk_size)
+    if chunk_size <= 0 or not 0 <= chunk_overlap < chunk_size:
+        raise ValueError(
+            f"Invalid chunking RAG_CHUNK_SIZE={chunk_size}, RAG_CHUNK_OVERLAP={chunk_overlap}: "
+            "the size must be positive and the overlap smaller than the size."
+        )
+    return chunk_size, chunk_overlap
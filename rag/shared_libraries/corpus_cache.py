@@ -0,0 +1,214 @@
+"""Local cache of RAG corpus and corpus file metadata.
+
+Resolving a corpus by display name needs a full rag.list_corpora() scan and
+finding a file by display name needs a full rag.list_files() scan. The
+ingestion and scheduler scripts do both on every run, so this module keeps the
+resolved corpus resource names and a display-name index of each corpus' files
+in a small JSON file next to the .env file.
+
+Entries older than CORPUS_CACHE_TTL_SECONDS are ignored. Cached corpora and
+files are validated with a single get-by-name call before they are trusted,
+and the index is updated in place when the scripts upload or delete files.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from rag.shared_libraries import bootstrap, quota
+
+rag = bootstrap.vertex_rag
+
+DEFAULT_CACHE_FILE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", ".corpus_cache.json")
+)
+DEFAULT_CACHE_TTL_SECONDS = 3600
+# Serializes the load-modify-save updates of the worker threads (e.g. delete_all_corpora.py)
+_update_lock = threading.Lock()
+
+
+def get_cache_file_path():
+    return os.getenv("CORPUS_CACHE_PATH") or DEFAULT_CACHE_FILE_PATH
+
+
+def get_cache_ttl():
+    """Returns the cache TTL in seconds; 0 disables the cache."""
+    return float(os.getenv("CORPUS_CACHE_TTL_SECONDS", DEFAULT_CACHE_TTL_SECONDS))
+
+
+def load_cache():
+    """Loads the cache file, returning an empty cache if it is missing or corrupt."""
+    try:
+        with open(get_cache_file_path(), "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache.setdefault("corpora", {})
+    cache.setdefault("files", {})
+    return cache
+
+
+def save_cache(cache):
+    """Writes the cache file atomically so a crashed run never leaves half a file."""
+    path = get_cache_file_path()
+    tmp_path = None
+    try:
+        # A unique name per write, so concurrent writers never share a temporary file
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+        )
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f, indent=4)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing corpus cache {path}: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@contextmanager
+def _updating():
+    """Yields the cache to modify and saves it afterwards, one update at a time."""
+    with _update_lock:
+        cache = load_cache()
+        yield cache
+        save_cache(cache)
+
+
+def clear_cache():
+    try:
+        os.remove(get_cache_file_path())
+    except FileNotFoundError:
+        pass
+
+
+def _is_fresh(entry):
+    ttl = get_cache_ttl()
+    return ttl > 0 and time.time() - entry.get("cached_at", 0) < ttl
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _file_record(rag_file):
+    return {
+        "name": rag_file.name,
+        "display_name": rag_file.display_name,
+        "create_time": _timestamp(getattr(rag_file, "create_time", None)),
+        "update_time": _timestamp(getattr(rag_file, "update_time", None)),
+    }
+
+
+def _build_index(records):
+    """Groups file records by display name; display names are not unique in a corpus."""
+    index = {}
+    for record in records:
+        index.setdefault(record["display_name"], []).append(SimpleNamespace(**record))
+    return index
+
+
+# --- Corpora ---
+def remember_corpus(corpus):
+    with _updating() as cache:
+        cache["corpora"][corpus.display_name] = {
+            "name": corpus.name,
+            "display_name": corpus.display_name,
+            "cached_at": time.time(),
+        }
+
+
+def forget_corpus(corpus_name):
+    """Drops a corpus and its file index from the cache by resource name."""
+    with _updating() as cache:
+        cache["corpora"] = {
+            display_name: entry
+            for display_name, entry in cache["corpora"].items()
+            if entry["name"] != corpus_name
+        }
+        cache["files"].pop(corpus_name, None)
+
+
+def find_corpus(display_name):
+    """Returns the corpus with the given display name, or None if it does not exist.
+
+    A fresh cache entry is validated with one rag.get_corpus() call; otherwise
+    the corpora are scanned once and the result is cached.
+    """
+    entry = load_cache()["corpora"].get(display_name)
+    if entry and _is_fresh(entry):
+        try:
+            corpus = quota.call("rag", rag.get_corpus, name=entry["name"])
+            if corpus.display_name == display_name:
+                return corpus
+        except Exception as e:
+            print(f"Cached corpus '{display_name}' is no longer valid: {e}")
+        forget_corpus(entry["name"])
+
+    for existing_corpus in quota.call("rag", lambda: list(rag.list_corpora())):
+        if existing_corpus.display_name == display_name:
+            remember_corpus(existing_corpus)
+            return existing_corpus
+    return None
+
+
+# --- Files ---
+def remember_files(corpus_name, rag_files):
+    """Replaces the cached file listing of a corpus and returns its index."""
+    records = [_file_record(rag_file) for rag_file in rag_files]
+    with _updating() as cache:
+        cache["files"][corpus_name] = {"cached_at": time.time(), "files": records}
+    return _build_index(records)
+
+
+def remember_file(corpus_name, rag_file):
+    """Adds a freshly uploaded file to the cached listing, if there is one."""
+    with _updating() as cache:
+        entry = cache["files"].get(corpus_name)
+        if entry is not None:
+            entry["files"].append(_file_record(rag_file))
+
+
+def forget_file(corpus_name, file_name):
+    """Removes a deleted file from the cached listing by resource name."""
+    with _updating() as cache:
+        entry = cache["files"].get(corpus_name)
+        if entry is not None:
+            entry["files"] = [record for record in entry["files"] if record["name"] != file_name]
+
+
+def get_file_index(corpus_name, refresh=False):
+    """Returns a dict mapping file display names to lists of file records.
+
+    The cached listing is used while it is fresh; otherwise the corpus files
+    are listed once and cached.
+    """
+    entry = load_cache()["files"].get(corpus_name)
+    if entry and not refresh and _is_fresh(entry):
+        return _build_index(entry["files"])
+    return remember_files(corpus_name, quota.call("rag", lambda: list(rag.list_files(corpus_name=corpus_name))))
+
+
+def find_files(corpus_name, display_name):
+    """Returns the files with the given display name in a corpus.
+
+    Results served from the cache are validated with one rag.get_file() call
+    and the listing is refreshed if the cached file has disappeared.
+    """
+    files = get_file_index(corpus_name).get(display_name, [])
+    if not files:
+        return files
+    try:
+        quota.call("rag", rag.get_file, name=files[0].name)
+        return files
+    except Exception as e:
+        print(f"Cached file '{display_name}' is no longer valid: {e}")
+    return get_file_index(corpus_name, refresh=True).get(display_name, [])
@@ -1,54 +1,182 @@
-from google.auth import default
-import vertexai
-from vertexai.preview import rag
+import argparse
+import fnmatch
 import os
-from dotenv import load_dotenv
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from rag.shared_libraries import bootstrap, corpus_cache, quota
 # import requests
 # import tempfile
 
 # Load environment variables from .env file
-load_dotenv()
+bootstrap.load_env()
+
+rag = bootstrap.vertex_rag
 
 # --- Please fill in your configurations ---
 # Retrieve the PROJECT_ID from the environmental variables.
-PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
-if not PROJECT_ID:
-    raise ValueError(
-        "GOOGLE_CLOUD_PROJECT environment variable not set. Please set it in your .env file."
-    )
-LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION")
-if not LOCATION:
-    raise ValueError(
-        "GOOGLE_CLOUD_LOCATION environment variable not set. Please set it in your .env file."
-    )
-CORPUS_DISPLAY_NAME = os.getenv("CORPUS_DISPLAY_NAME", None)
-if not CORPUS_DISPLAY_NAME:
-    raise ValueError(
-        "CORPUS_DISPLAY_NAME environment variable not set. Please set it in your .env file."
-    )
+PROJECT_ID = bootstrap.require_env("GOOGLE_CLOUD_PROJECT")
+LOCATION = bootstrap.require_env("GOOGLE_CLOUD_LOCATION")
+CORPUS_DISPLAY_NAME = bootstrap.require_env("CORPUS_DISPLAY_NAME")
 FILE_URL = os.getenv("FILE_URL", None)
 FILE_NAME = os.getenv("FILE_NAME", None)
-ENV_FILE_PATH = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "..", "..", ".env")
-)
+ENV_FILE_PATH = bootstrap.ENV_FILE_PATH
 
 
 # --- Start of the script ---
 def initialize_vertex_ai():
-    credentials, _ = default()
-    vertexai.init(project=PROJECT_ID, location=LOCATION, credentials=credentials)
+    bootstrap.init_vertexai(PROJECT_ID, LOCATION)
+
+DEFAULT_WORKERS = 8
+
+
+def select_corpora(corpora, pattern=None, older_than_days=None):
+    """Filters corpora by display-name glob pattern and minimum age in days."""
+    cutoff = None
+    if older_than_days is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    selected = []
+    for corpus in corpora:
+        if pattern and not fnmatch.fnmatch(corpus.display_name, pattern):
+            continue
+        if cutoff is not None:
+            create_time = getattr(corpus, "create_time", None)
+            # Corpora without a creation time are never old enough to delete
+            if create_time is None or create_time > cutoff:
+                continue
+        selected.append(corpus)
+    return selected
+
+
+def run_concurrently(tasks, workers):
+    """Runs (label, fn) tasks concurrently; every API call waits for the shared "rag" quota.
+
+    Returns the list of succeeded labels and a list of (label, error) failures.
+    """
+    succeeded, failures = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fn): label for label, fn in tasks}
+        for future in as_completed(futures):
+            label = futures[future]
+            try:
+                future.result()
+                succeeded.append(label)
+                print(f"Deleted {label}")
+            except Exception as e:
+                failures.append((label, e))
+                print(f"Failed to delete {label}: {e}")
+    return succeeded, failures
+
+
+def delete_corpus(corpus):
+    quota.call("rag", rag.delete_corpus, corpus.name)
+    corpus_cache.forget_corpus(corpus.name)
+
+
+def delete_file(corpus, rag_file):
+    quota.call("rag", rag.delete_file, corpus_name=corpus.name, name=rag_file.name)
+    corpus_cache.forget_file(corpus.name, rag_file.name)
+
 
-def delete_all_corpora():
-    """Deletes all corpora in the project."""
-    existing_corpora = rag.list_corpora()
-    print(existing_corpora)
-    for existing_corpus in existing_corpora:
-        print(f"Deleting corpus with display name '{existing_corpus.display_name}'")
-        rag.delete_corpus(existing_corpus.name)
-        print(f"Deleted corpus with display name '{existing_corpus.display_name}'")
+def list_files_to_delete(corpora, workers, file_pattern=None):
+    """Lists the files of the given corpora concurrently.
+
+    Returns (corpus, file) pairs whose display name matches file_pattern.
+    """
+    def list_files(corpus):
+        return corpus, quota.call("rag", lambda: list(rag.list_files(corpus_name=corpus.name)))
+
+    pairs = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for corpus, files in executor.map(list_files, corpora):
+            for rag_file in files:
+                if file_pattern and not fnmatch.fnmatch(rag_file.display_name, file_pattern):
+                    continue
+                pairs.append((corpus, rag_file))
+    return pairs
+
+
+def print_summary(kind, succeeded, failures, elapsed, dry_run):
+    action = "Would delete" if dry_run else "Deleted"
+    print("=" * 50)
+    print(f"{action} {len(succeeded)} {kind} in {elapsed:.2f}s")
+    if failures:
+        print(f"Failed to delete {len(failures)} {kind}:")
+        for label, error in failures:
+            print(f" - {label}: {error}")
+    print("=" * 50)
+
+
+def delete_all_corpora(pattern=None, older_than_days=None, files_only=False,
+                       file_pattern=None, dry_run=False,
+                       workers=DEFAULT_WORKERS):
+    """Deletes the matching corpora (or only their files) in parallel.
+
+    With no filters every corpus in the project is deleted. Returns the list
+    of (label, error) failures.
+    """
+    started = time.perf_counter()
+    corpora = select_corpora(quota.call("rag", lambda: list(rag.list_corpora())), pattern, older_than_days)
+    print(f"Matched {len(corpora)} corpora")
+
+    if files_only:
+        kind = "files"
+        pairs = list_files_to_delete(corpora, workers, file_pattern)
+        tasks = [
+            (f"file '{rag_file.display_name}' from corpus '{corpus.display_name}'",
+             lambda corpus=corpus, rag_file=rag_file: delete_file(corpus, rag_file))
+            for corpus, rag_file in pairs
+        ]
+    else:
+        kind = "corpora"
+        tasks = [
+            (f"corpus '{corpus.display_name}' ({corpus.name})",
+             lambda corpus=corpus: delete_corpus(corpus))
+            for corpus in corpora
+        ]
+
+    if dry_run:
+        for label, _ in tasks:
+            print(f"[dry-run] Would delete {label}")
+        succeeded, failures = [label for label, _ in tasks], []
+    else:
+        succeeded, failures = run_concurrently(tasks, workers)
+
+    print_summary(kind, succeeded, failures, time.perf_counter() - started, dry_run)
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Bulk delete RAG corpora (or the files inside them) in parallel."
+    )
+    parser.add_argument("--pattern", help="Only corpora whose display name matches this glob pattern")
+    parser.add_argument("--older-than-days", type=float,
+                        help="Only corpora created more than this many days ago")
+    parser.add_argument("--files-only", action="store_true",
+                        help="Delete the files inside the matching corpora but keep the corpora")
+    parser.add_argument("--file-pattern", help="With --files-only, only files whose display name matches this glob pattern")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be deleted without deleting anything")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of concurrent deletions")
+    parser.add_argument("--qps", type=float,
+                        help="Maximum number of RAG API calls per second for this run, instead of "
+                             "QUOTA_RAG_PER_MINUTE (0 for unlimited)")
+    return parser.parse_args()
 
-    print("All corpora have been deleted.")
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.qps is not None:
+        # The calls are limited by the quota scheduler's "rag" bucket, created on the first call
+        os.environ["QUOTA_RAG_PER_MINUTE"] = str(args.qps * 60)
     initialize_vertex_ai()
-    delete_all_corpora()
\ No newline at end of file
+    failures = delete_all_corpora(
+        pattern=args.pattern,
+        older_than_days=args.older_than_days,
+        files_only=args.files_only,
+        file_pattern=args.file_pattern,
+        dry_run=args.dry_run,
+        workers=args.workers,
+    )
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,192 @@
+"""Local text extraction for PDFs before they are uploaded to a corpus.
+
+Uploading a raw PDF makes the RAG engine parse it server side, which is slow
+for bloated files and fails outright for some of them. preprocess_pdf() turns
+a PDF into a compact UTF-8 text file instead:
+
+1. Pages are extracted in batches by a process pool; every worker opens the
+   PDF itself and only parses the pages it was given, so the whole document
+   is never held in memory.
+2. Page text is whitespace-normalized and spooled to disk in page order while
+   the first/last lines of every page are counted.
+3. Lines that repeat at the top or bottom of most pages (headers, footers,
+   page numbers) are stripped while the spool is copied to the output file.
+
+Requires the optional `pypdf` package.
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+PAGE_SEPARATOR = "\f"
+# Pages extracted per worker task
+PAGES_PER_TASK = 8
+# Number of lines at the top and bottom of a page checked for headers/footers
+EDGE_LINES = 2
+# A header/footer line must appear on at least this share of the pages
+REPEATED_LINE_RATIO = 0.5
+
+
+def _import_pypdf():
+    try:
+        import pypdf
+    except ImportError as e:
+        raise ImportError(
+            "PDF preprocessing requires pypdf. Install it with "
+            "`poetry install --extras preprocess` or `pip install pypdf`."
+        ) from e
+    return pypdf
+
+
+def normalize_text(text):
+    """Collapses runs of spaces, strips lines and drops repeated blank lines."""
+    lines = []
+    for line in text.replace(PAGE_SEPARATOR, " ").splitlines():
+        line = re.sub(r"[ \t\u00a0]+", " ", line).strip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def _edge_key(position, line):
+    # Page numbers differ on every page, so compare lines with digits masked
+    return position, re.sub(r"\d+", "#", line)
+
+
+def _edge_keys(lines):
+    """Returns the (position, masked line) keys of the first and last lines of a page."""
+    content = [line for line in lines if line]
+    keys = {_edge_key(i, line) for i, line in enumerate(content[:EDGE_LINES])}
+    keys.update(_edge_key(-1 - i, line) for i, line in enumerate(reversed(content[-EDGE_LINES:])))
+    return keys
+
+
+def _extract_pages(task):
+    """Extracts and normalizes the text of pages [start, stop) of a PDF."""
+    path, start, stop = task
+    reader = _import_pypdf().PdfReader(path)
+    return [normalize_text(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def _strip_edges(lines, repeated):
+    """Drops repeated header lines from the top and footer lines from the bottom of a page."""
+    content = [i for i, line in enumerate(lines) if line]
+    start, stop = 0, len(content)
+    while start < min(EDGE_LINES, stop) and _edge_key(start, lines[content[start]]) in repeated:
+        start += 1
+    while (len(content) - stop < EDGE_LINES and stop > start
+           and _edge_key(stop - len(content) - 1, lines[content[stop - 1]]) in repeated):
+        stop -= 1
+    if start == stop:
+        return []
+    # Blank lines between the remaining lines are kept as paragraph breaks
+    return lines[content[start]:content[stop - 1] + 1]
+
+
+def _read_pages(spool):
+    """Yields the pages of a spool file one at a time."""
+    buffer = ""
+    while True:
+        chunk = spool.read(65536)
+        if not chunk:
+            break
+        buffer += chunk
+        *pages, buffer = buffer.split(PAGE_SEPARATOR)
+        yield from pages
+    if buffer:
+        yield buffer
+
+
+def preprocess_pdf(pdf_path, output_path, workers=None):
+    """Extracts the text of a PDF into output_path.
+
+    Returns a dict of extraction statistics, or None if the PDF has no
+    extractable text (e.g. a scanned document), in which case the raw PDF
+    should be uploaded instead.
+    """
+    started = time.perf_counter()
+    page_count = len(_import_pypdf().PdfReader(pdf_path).pages)
+    if workers is None:
+        workers = int(os.getenv("PREPROCESS_WORKERS", "0")) or os.cpu_count() or 1
+    tasks = [
+        (pdf_path, start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+
+    edge_counts = Counter()
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+        # A process pool only pays off once there is more than one task
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                batches = executor.map(_extract_pages, tasks)
+                for pages in batches:
+                    for page in pages:
+                        edge_counts.update(_edge_keys(page.split("\n")))
+                        spool.write(page + PAGE_SEPARATOR)
+        else:
+            for task in tasks:
+                for page in _extract_pages(task):
+                    edge_counts.update(_edge_keys(page.split("\n")))
+                    spool.write(page + PAGE_SEPARATOR)
+
+        min_count = max(2, REPEATED_LINE_RATIO * page_count)
+        repeated = {key for key, count in edge_counts.items() if count >= min_count}
+
+        spool.seek(0)
+        has_text = False
+        with open(output_path, "w", encoding="utf-8") as output:
+            for page in _read_pages(spool):
+                lines = _strip_edges(page.split("\n"), repeated)
+                if lines:
+                    output.write("\n".join(lines) + "\n\n")
+                    has_text = True
+
+    elapsed = time.perf_counter() - started
+    if not has_text:
+        print(f"No extractable text found in {pdf_path}; it is probably a scanned document.")
+        os.remove(output_path)
+        return None
+
+    input_bytes = os.path.getsize(pdf_path)
+    output_bytes = os.path.getsize(output_path)
+    stats = {
+        "output_path": output_path,
+        "pages": page_count,
+        "stripped_lines": len(repeated),
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "seconds": elapsed,
+    }
+    print_report(stats)
+    return stats
+
+
+def print_report(stats):
+    reduction = 1 - stats["output_bytes"] / stats["input_bytes"] if stats["input_bytes"] else 0
+    seconds = max(stats["seconds"], 1e-9)
+    print(
+        f"Extracted {stats['pages']} pages in {stats['seconds']:.2f}s "
+        f"({stats['pages'] / seconds:.1f} pages/s, "
+        f"{stats['input_bytes'] / seconds / 1e6:.2f} MB/s); "
+        f"stripped {stats['stripped_lines']} repeated header/footer line(s)"
+    )
+    print(
+        f"Size: {stats['input_bytes']} -> {stats['output_bytes']} bytes "
+        f"({reduction:.1%} smaller)"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python pdf_preprocess.py <input.pdf> [output.txt]")
+        sys.exit(1)
+    input_path = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) == 3 else os.path.splitext(input_path)[0] + ".txt"
+    preprocess_pdf(input_path, output_path)
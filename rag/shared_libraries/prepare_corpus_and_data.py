@@ -12,77 +12,84 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from google.auth import default
-import vertexai
-from vertexai.preview import rag
 import os
-from dotenv import load_dotenv, set_key
+from dotenv import set_key
 import requests
-# import tempfile
+import tempfile
+import time
+from rag.shared_libraries import bootstrap, corpus_cache, profiling, quota, sharding
+from rag.shared_libraries.chunking import chunking_settings
 
 # Load environment variables from .env file
-load_dotenv()
+bootstrap.load_env()
+
+# vertexai.preview.rag, imported and initialized on first use
+rag = bootstrap.vertex_rag
 
 # --- Please fill in your configurations ---
 # Retrieve the PROJECT_ID from the environmental variables.
-PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
-if not PROJECT_ID:
-    raise ValueError(
-        "GOOGLE_CLOUD_PROJECT environment variable not set. Please set it in your .env file."
-    )
-LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION")
-if not LOCATION:
-    raise ValueError(
-        "GOOGLE_CLOUD_LOCATION environment variable not set. Please set it in your .env file."
-    )
-CORPUS_DISPLAY_NAME = os.getenv("CORPUS_DISPLAY_NAME", None)
-if not CORPUS_DISPLAY_NAME:
-    raise ValueError(
-        "CORPUS_DISPLAY_NAME environment variable not set. Please set it in your .env file."
-    )
-CORPUS_DESCRIPTION = os.getenv("CORPUS_DESCRIPTION", None)
-if not CORPUS_DESCRIPTION:
-    raise ValueError(
-        "CORPUS_DESCRIPTION environment variable not set. Please set it in your .env file."
-    )
+PROJECT_ID = bootstrap.require_env("GOOGLE_CLOUD_PROJECT")
+LOCATION = bootstrap.require_env("GOOGLE_CLOUD_LOCATION")
+CORPUS_DISPLAY_NAME = bootstrap.require_env("CORPUS_DISPLAY_NAME")
+CORPUS_DESCRIPTION = bootstrap.require_env("CORPUS_DESCRIPTION")
 
 FILE_URL = os.getenv("FILE_URL", None)
 FILE_NAME = os.getenv("FILE_NAME", None)
 
-ENV_FILE_PATH = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "..", "..", ".env")
-)
-
+ENV_FILE_PATH = bootstrap.ENV_FILE_PATH
 
 # --- Start of the script ---
 def initialize_vertex_ai():
-    credentials, project = default()
+    _, project = bootstrap.get_credentials()
     print(f"Authenticated with project: {project}")
 
-    vertexai.init(project=PROJECT_ID, location=LOCATION
-                  , credentials=credentials
-                  )
+    bootstrap.init_vertexai(PROJECT_ID, LOCATION)
+    rag.load()
 
 
-def create_or_get_corpus():
-    """Creates a new corpus or retrieves an existing one."""
+def create_or_get_corpus(display_name=None, description=None):
+    """Creates a new corpus or retrieves an existing one (by default CORPUS_DISPLAY_NAME)."""
+    display_name = display_name or CORPUS_DISPLAY_NAME
+    description = description or CORPUS_DESCRIPTION
     embedding_model_config = rag.EmbeddingModelConfig(
         publisher_model="publishers/google/models/text-embedding-005"
     )
-    existing_corpora = rag.list_corpora()
-    corpus = None
-    for existing_corpus in existing_corpora:
-        if existing_corpus.display_name == CORPUS_DISPLAY_NAME:
-            corpus = existing_corpus
-            print(f"Found existing corpus with display name '{CORPUS_DISPLAY_NAME}'")
-            break
-    if corpus is None:
-        corpus = rag.create_corpus(
-            display_name=CORPUS_DISPLAY_NAME,
-            description=CORPUS_DESCRIPTION,
+    corpus = corpus_cache.find_corpus(display_name)
+    if corpus is not None:
+        print(f"Found existing corpus with display name '{display_name}'")
+    else:
+        corpus = quota.call(
+            "rag",
+            rag.create_corpus,
+            display_name=display_name,
+            description=description,
             embedding_model_config=embedding_model_config,
         )
-        print(f"Created new corpus with display name '{CORPUS_DISPLAY_NAME}'")
+        corpus_cache.remember_corpus(corpus)
+        print(f"Created new corpus with display name '{display_name}'")
+    return corpus
+
+
+def shard_corpus_display_name(shard_name):
+    return f"{CORPUS_DISPLAY_NAME}_{shard_name}"
+
+
+def corpus_for_document(document_name):
+    """Returns the corpus a document is uploaded to.
+
+    With sharding configured (RAG_SHARD_ROUTES or RAG_CORPUS_SHARDS) this is
+    the corpus of the shard the document is routed to, created if needed and
+    recorded in RAG_CORPUS_SHARDS. Otherwise it is the CORPUS_DISPLAY_NAME corpus.
+    """
+    if not sharding.sharding_enabled():
+        return create_or_get_corpus()
+    shard_name = sharding.route_document(document_name)
+    print(f"Routing {document_name} to shard '{shard_name}'")
+    corpus = create_or_get_corpus(
+        shard_corpus_display_name(shard_name),
+        f"{CORPUS_DESCRIPTION} ({shard_name} shard)",
+    )
+    update_shard_env(shard_name, corpus.name, ENV_FILE_PATH)
     return corpus
 
 
@@ -100,9 +107,35 @@ def download_pdf_from_url(url, output_path):
     return output_path
 
 
-def upload_pdf_to_corpus(corpus_name, file_path, display_name, description):
-    """Uploads a PDF file to the specified corpus."""
+def preprocess_enabled():
+    """Returns True if PREPROCESS_PDF is set to a truthy value in the environment."""
+    return os.getenv("PREPROCESS_PDF", "").lower() in ("1", "true", "yes")
+
+
+def transformation_config(chunking):
+    """Returns the TransformationConfig of (chunk_size, chunk_overlap), or None for the engine default."""
+    if chunking is None:
+        return None
+    chunk_size, chunk_overlap = chunking
+    return rag.TransformationConfig(
+        chunking_config=rag.ChunkingConfig(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    )
+
+
+def upload_pdf_to_corpus(corpus_name, file_path, display_name, description, preprocess=None, chunking=None):
+    """Uploads a PDF file to the specified corpus.
+
+    With preprocess=True (default: the PREPROCESS_PDF environment variable),
+    the text of a PDF is extracted locally and uploaded instead of the PDF.
+    The raw file is uploaded if it is not a PDF or has no extractable text.
+    chunking is a (chunk_size, chunk_overlap) pair in tokens and defaults to
+    chunking_settings().
+    """
     print(f"Uploading {display_name} to corpus...")
+    if preprocess is None:
+        preprocess = preprocess_enabled()
+    if chunking is None:
+        chunking = chunking_settings()
     try:
         # Verify file exists
         if not os.path.exists(file_path):
@@ -111,13 +144,39 @@ def upload_pdf_to_corpus(corpus_name, file_path, display_name, description):
         # Verify file is readable
         with open(file_path, 'rb') as f:
             pass
-        
-        rag_file = rag.upload_file(
-            corpus_name=corpus_name,
-            path=file_path,
-            display_name=display_name,
-            description=description,
-        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            upload_path = file_path
+            if preprocess and file_path.lower().endswith(".pdf"):
+                # Imported lazily so pypdf stays an optional dependency
+                from rag.shared_libraries.pdf_preprocess import preprocess_pdf
+
+                text_path = os.path.join(
+                    temp_dir, os.path.splitext(os.path.basename(file_path))[0] + ".txt"
+                )
+                stats = preprocess_pdf(file_path, text_path)
+                if stats:
+                    upload_path = text_path
+                else:
+                    print(f"Uploading the original PDF for {display_name}")
+            elif preprocess:
+                print(f"Skipping preprocessing of {file_path}: only PDF files are preprocessed")
+
+            kwargs = {}
+            if chunking is not None:
+                print(f"Chunking {display_name} into {chunking[0]} token chunks with {chunking[1]} tokens of overlap")
+                kwargs["transformation_config"] = transformation_config(chunking)
+            # Uploading embeds the document, so it counts against the embedding quota
+            rag_file = quota.call(
+                "embedding",
+                rag.upload_file,
+                corpus_name=corpus_name,
+                path=upload_path,
+                display_name=display_name,
+                description=description,
+                **kwargs,
+            )
+        corpus_cache.remember_file(corpus_name, rag_file)
         print(f"Successfully uploaded {display_name} to corpus")
         return rag_file
     except Exception as e:
@@ -125,6 +184,27 @@ def upload_pdf_to_corpus(corpus_name, file_path, display_name, description):
         return None
 
 
+def wait_for_file_indexed(file_name, timeout=300, interval=2):
+    """Polls a corpus file until the RAG engine reports it as ACTIVE.
+
+    Returns False if the file ends up in an error state or the timeout
+    expires. Returns True immediately if the file status is not reported.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        rag_file = quota.call("rag", rag.get_file, name=file_name)
+        state = getattr(getattr(rag_file, "file_status", None), "state", None)
+        if state is None:
+            return True
+        state = getattr(state, "name", str(state))
+        if state == "ACTIVE":
+            return True
+        if state == "ERROR" or time.monotonic() >= deadline:
+            print(f"File {file_name} is not indexed (state: {state})")
+            return False
+        time.sleep(interval)
+
+
 def update_env_file(corpus_name, env_file_path):
     """Updates the .env file with the corpus name."""
     try:
@@ -134,18 +214,47 @@ def update_env_file(corpus_name, env_file_path):
         print(f"Error updating .env file: {e}")
 
 
+def update_shard_env(shard_name, corpus_name, env_file_path):
+    """Records the corpus of a shard in RAG_CORPUS_SHARDS in the .env file."""
+    shards = sharding.parse_shards(os.getenv("RAG_CORPUS_SHARDS"))
+    if sharding.Shard(shard_name, corpus_name) in shards:
+        return
+    shards = [shard for shard in shards if shard.name != shard_name]
+    shards.append(sharding.Shard(shard_name, corpus_name))
+    value = sharding.format_shards(shards)
+    os.environ["RAG_CORPUS_SHARDS"] = value
+    try:
+        set_key(env_file_path, "RAG_CORPUS_SHARDS", value)
+        print(f"Updated RAG_CORPUS_SHARDS in {env_file_path} to {value}")
+    except Exception as e:
+        print(f"Error updating .env file: {e}")
+
+
 def list_corpus_files(corpus_name):
     """Lists files in the specified corpus."""
-    files = list(rag.list_files(corpus_name=corpus_name))
+    files = quota.call("rag", lambda: list(rag.list_files(corpus_name=corpus_name)))
+    corpus_cache.remember_files(corpus_name, files)
     print(f"Total files in corpus: {len(files)}")
     for file in files:
         print(f"File: {file.display_name} - {file.name}")
     return files
 
+
+def get_corpus_file_index(corpus_name, refresh=False):
+    """Returns a dict of file display name -> files in the corpus, using the local cache."""
+    return corpus_cache.get_file_index(corpus_name, refresh=refresh)
+
+
+def find_corpus_files(corpus_name, display_name):
+    """Returns the files with the given display name in the corpus, using the local cache."""
+    return corpus_cache.find_files(corpus_name, display_name)
+
+
 def delete_corpus_file(corpus_name, file_name):
     """Deletes a file from the specified corpus."""
     try:
-        rag.delete_file(corpus_name=corpus_name, name=file_name)
+        quota.call("rag", rag.delete_file, corpus_name=corpus_name, name=file_name)
+        corpus_cache.forget_file(corpus_name, file_name)
         print(f"Deleted file {file_name} from corpus {corpus_name}")
         # Try reset indexing after deletion
         # rag.reset_index(corpus_name=corpus_name)
@@ -155,24 +264,21 @@ def delete_corpus_file(corpus_name, file_name):
 
 def main():
     initialize_vertex_ai()
-    corpus = create_or_get_corpus()
+    corpus = corpus_for_document(FILE_NAME)
 
     if corpus:
         # delete corpus if exists
 
-        files = list_corpus_files(corpus.name)
-        if files:
-            for file in files:
-                if file.display_name == FILE_NAME:
-                    print(f"File {file.display_name} already exists in corpus. Deleting...")
-                    delete_corpus_file(corpus.name, file.name)
-                    # files.remove(file)
+        for file in find_corpus_files(corpus.name, FILE_NAME):
+            print(f"File {file.display_name} already exists in corpus. Deleting...")
+            delete_corpus_file(corpus.name, file.name)
         # rag.delete_corpus(corpus.name)
         # corpus = create_or_get_corpus()
         # print(f"Deleted corpus {corpus.name}")
 
-    # Update the .env file with the corpus name
-    update_env_file(corpus.name, ENV_FILE_PATH)
+    # Update the .env file with the corpus name (shards are recorded by corpus_for_document)
+    if not sharding.sharding_enabled():
+        update_env_file(corpus.name, ENV_FILE_PATH)
 
     # Create a temporary directory to store the downloaded PDF
     # with tempfile.TemporaryDirectory() as temp_dir:
@@ -194,4 +300,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    profiling.run("prepare_corpus_and_data", main)
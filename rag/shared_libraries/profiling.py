@@ -0,0 +1,337 @@
+"""Opt-in profiling for the GUI, the ingestion scripts and the runners.
+
+Set PROFILE=1 (and optionally PROFILE_DIR, default ./profiles) before starting
+an entry point that calls profiling.run(), or wrap any script or module from
+the command line:
+
+    PROFILE=1 python app.py
+    python -m rag.shared_libraries.profiling schedule/check_upload_new_pwd_file.py
+    python -m rag.shared_libraries.profiling -m deployment.run
+
+A profiled run writes, under PROFILE_DIR, files named <name>-<timestamp>.*:
+
+    .pstats     cProfile statistics of the main thread (snakeviz, pstats)
+    .collapsed  stacks of all threads sampled every PROFILE_SAMPLE_MS
+                milliseconds, one "frame;frame;frame count" line per stack,
+                the input format of flamegraph.pl and speedscope
+    .memory.txt top allocation sites from tracemalloc (PROFILE_MEMORY=0 disables)
+    .hotspots.json  call count and wall time of the well-known hot spots below
+
+Hot spots are timed wherever they are called from, including modules that
+are imported after profiling started. The hot spots of a script itself are
+timed when it calls run() from its __main__ block, as app.py does.
+Hot spots returning an iterator, like RAGAgent.stream_query, are timed until
+it is exhausted or closed.
+"""
+import argparse
+import collections.abc
+import cProfile
+import functools
+import importlib.abc
+import inspect
+import json
+import os
+import runpy
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+DEFAULT_OUTPUT_DIR = "profiles"
+DEFAULT_SAMPLE_MS = 5
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 30
+
+# module: [attribute paths] timed during a profiled run
+HOT_SPOTS = {
+    "app": ["ChatApp.load_threads", "ChatApp.save_thread", "ChatApp.update_thread_list",
+            "ChatApp.select_thread", "ChatApp.query_agent"],
+    "thread_archive": ["load_threads", "read_thread"],
+    "retrieval_prefetch": ["Prefetcher.take"],
+    "deployment.agent": ["RAGAgent.stream_query", "RAGAgent.create_session"],
+    "deployment.intent_router": ["IntentRouter.route"],
+    "deployment.server": ["ChatServer.start", "ChatServer.query", "SessionPool.fill"],
+    "rag.shared_libraries.prepare_corpus_and_data": [
+        "upload_pdf_to_corpus", "create_or_get_corpus", "list_corpus_files", "wait_for_file_indexed"],
+    "rag.shared_libraries.pdf_preprocess": ["preprocess_pdf"],
+    "rag.shared_libraries.sharding": ["ShardedRetriever.retrieve"],
+    "rag.shared_libraries.quota": ["Scheduler.acquire"],
+    "vertexai.preview.rag": ["list_corpora", "list_files", "get_corpus", "create_corpus",
+                             "upload_file", "delete_file", "retrieval_query"],
+    "vertexai.agent_engines": ["get", "create", "update"],
+}
+
+
+def enabled():
+    return os.getenv("PROFILE", "").lower() in ("1", "true", "yes")
+
+
+class HotSpotTimer:
+    """Accumulates call counts and wall time per hot spot."""
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, elapsed):
+        with self._lock:
+            entry = self.stats.setdefault(name, {"calls": 0, "total": 0.0, "max": 0.0})
+            entry["calls"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+
+    def wrap(self, name, fn):
+        if getattr(fn, "__profiled__", False):
+            return fn
+
+        if inspect.isgeneratorfunction(fn):
+            # Time until the generator is exhausted, not until it is created
+            @functools.wraps(fn)
+            def timed_generator(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    yield from fn(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - started)
+            wrapper = timed_generator
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException:
+                    self.add(name, time.perf_counter() - started)
+                    raise
+                if isinstance(result, collections.abc.Iterator):
+                    # RAGAgent.stream_query returns the engine's or the scheduler's stream
+                    return self._timed_iterator(name, result, started)
+                self.add(name, time.perf_counter() - started)
+                return result
+        wrapper.__profiled__ = True
+        return wrapper
+
+    def _timed_iterator(self, name, iterator, started):
+        """Yields from iterator and adds the time from started until it is exhausted or closed."""
+        try:
+            yield from iterator
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+
+def _patch(module, module_name, path, timer, patched):
+    """Wraps module.<path> and every other module-level reference to the same function."""
+    owner = module
+    *parents, attribute = path.split(".")
+    for parent in parents:
+        owner = getattr(owner, parent, None)
+        if owner is None:
+            return
+    original = getattr(owner, attribute, None)
+    if original is None or not callable(original) or getattr(original, "__profiled__", False):
+        return
+    if isinstance(inspect.getattr_static(owner, attribute), (staticmethod, classmethod)):
+        return
+    wrapper = timer.wrap(f"{module_name}.{path}", original)
+    setattr(owner, attribute, wrapper)
+    patched.append((owner, attribute, original))
+    if parents:
+        return
+    # `from module import function` copies made before profiling started
+    for other in list(sys.modules.values()):
+        namespace = getattr(other, "__dict__", None)
+        if other is module or not isinstance(namespace, dict):
+            continue
+        for name, value in list(namespace.items()):
+            if value is original:
+                setattr(other, name, wrapper)
+                patched.append((other, name, original))
+
+
+class _HotSpotFinder(importlib.abc.MetaPathFinder):
+    """Instruments hot spot modules that are imported while profiling."""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname not in HOT_SPOTS:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        if loader is None or not hasattr(loader, "exec_module"):
+            return spec
+        original_exec_module = loader.exec_module
+        profiler = self.profiler
+
+        def exec_module(module):
+            original_exec_module(module)
+            profiler.instrument(module)
+
+        # Loaders are created per module, so only this import is affected
+        loader.exec_module = exec_module
+        return spec
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of all threads and counts them in collapsed form."""
+
+    def __init__(self, interval):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.counts = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    def __init__(self, name, output_dir=None, sample_ms=None, memory=None):
+        self.name = name
+        self.output_dir = output_dir or os.getenv("PROFILE_DIR", DEFAULT_OUTPUT_DIR)
+        self.sample_interval = (sample_ms or float(os.getenv("PROFILE_SAMPLE_MS", DEFAULT_SAMPLE_MS))) / 1000
+        self.memory = memory if memory is not None else os.getenv("PROFILE_MEMORY", "1") != "0"
+        self.timer = HotSpotTimer()
+        self._patched = []
+        self._finder = _HotSpotFinder(self)
+        self._profile = cProfile.Profile()
+        self._sampler = None
+        self._started = None
+
+    def instrument(self, module, module_name=None):
+        module_name = module_name or module.__name__
+        for path in HOT_SPOTS.get(module_name, ()):
+            _patch(module, module_name, path, self.timer, self._patched)
+
+    def start(self):
+        for module_name in HOT_SPOTS:
+            if module_name in sys.modules:
+                self.instrument(sys.modules[module_name])
+        if self.name in HOT_SPOTS and "__main__" in sys.modules:
+            # An entry point run as a script, e.g. `python app.py` calling run("app", main)
+            self.instrument(sys.modules["__main__"], self.name)
+        sys.meta_path.insert(0, self._finder)
+        if self.memory:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._sampler = StackSampler(self.sample_interval)
+        self._sampler.start()
+        self._started = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self):
+        """Stops profiling, restores the hot spots and writes the reports; returns their prefix."""
+        self._profile.disable()
+        wall_time = time.perf_counter() - self._started
+        self._sampler.stop()
+        snapshot = tracemalloc.take_snapshot() if self.memory else None
+        if self.memory:
+            tracemalloc.stop()
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        for owner, attribute, original in reversed(self._patched):
+            setattr(owner, attribute, original)
+        self._patched = []
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"{self.name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        self._profile.dump_stats(f"{prefix}.pstats")
+        self._sampler.write(f"{prefix}.collapsed")
+        if snapshot is not None:
+            with open(f"{prefix}.memory.txt", "w") as f:
+                for statistic in snapshot.statistics("traceback")[:TOP_ALLOCATIONS]:
+                    f.write(f"{statistic.size / 1024:.1f} KiB in {statistic.count} blocks\n")
+                    for line in statistic.traceback.format():
+                        f.write(f"{line}\n")
+                    f.write("\n")
+        with open(f"{prefix}.hotspots.json", "w") as f:
+            json.dump({"wall_time": wall_time, "hot_spots": self.timer.stats}, f, indent=4)
+        self.print_summary(wall_time, prefix)
+        return prefix
+
+    def print_summary(self, wall_time, prefix):
+        print(f"\nProfile of {self.name}: {wall_time:.2f}s wall time, reports in {prefix}.*", file=sys.stderr)
+        for name, entry in sorted(self.timer.stats.items(), key=lambda item: -item[1]["total"]):
+            print(f"  {name}: {entry['calls']} call(s), {entry['total']:.3f}s total, "
+                  f"{entry['max']:.3f}s max", file=sys.stderr)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def run(name, main, *args, **kwargs):
+    """Calls main(*args, **kwargs), profiled when PROFILE is set."""
+    if not enabled():
+        return main(*args, **kwargs)
+    with Profiler(name):
+        return main(*args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a script or module under the profiler.",
+        usage="%(prog)s [-o DIR] (script.py | -m module) [args ...]",
+    )
+    parser.add_argument("-o", "--output-dir", help=f"Directory for the reports (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("-m", dest="module", help="Run a module like python -m")
+    parser.add_argument("--sample-ms", type=float, help="Stack sampling interval in milliseconds")
+    parser.add_argument("--no-memory", action="store_true", help="Do not trace allocations")
+    parser.add_argument("target", nargs=argparse.REMAINDER, help="Script and its arguments")
+    args = parser.parse_args()
+    if not args.module and not args.target:
+        parser.error("a script or -m module is required")
+
+    if args.module:
+        name = args.module.rsplit(".", 1)[-1]
+        sys.argv = [args.module] + args.target
+    else:
+        name = os.path.splitext(os.path.basename(args.target[0]))[0]
+        sys.argv = args.target
+        sys.path.insert(0, os.path.dirname(os.path.abspath(args.target[0])))
+
+    with Profiler(name, args.output_dir, args.sample_ms, memory=False if args.no_memory else None):
+        try:
+            if args.module:
+                runpy.run_module(args.module, run_name="__main__", alter_sys=True)
+            else:
+                runpy.run_path(args.target[0], run_name="__main__")
+        except SystemExit:
+            pass
+
+
+if __name__ == "__main__":
+    main()
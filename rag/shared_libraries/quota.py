@@ -0,0 +1,464 @@
+"""Quota-aware scheduler shared by all local callers of Vertex AI.
+
+The GUI, the sync scripts, the eval tools and the load test call Vertex AI
+from separate processes. Without coordination their requests overlap and
+all of them hit the same per-minute quotas (429 RESOURCE_EXHAUSTED) at once.
+
+Every outbound call is scheduled through a token bucket per resource:
+
+    gemini     agent queries (RAGAgent.stream_query, local eval runs)
+    rag        RAG Engine calls (list/get/create/delete, retrieval)
+    embedding  rag.upload_file, which embeds the uploaded document
+
+The buckets live in a small JSON state file next to the .env file, guarded by
+an OS file lock, so all local processes share them. A caller waiting for a
+token registers itself in the same file; a token is only handed out when no
+caller of a higher priority (or of the same priority that started waiting
+earlier) is waiting for the same resource:
+
+    interactive  GUI queries
+    sync         the schedule/ scripts
+    batch        eval, load tests and everything else (the default)
+
+A call failing with 429 blocks its resource for all processes with an
+exponential backoff and is retried. Configuration (.env):
+
+    QUOTA_ENABLED=1                 0 turns scheduling off
+    QUOTA_GEMINI_PER_MINUTE=60      per resource; 0 leaves a resource unlimited
+    QUOTA_RAG_PER_MINUTE=60
+    QUOTA_EMBEDDING_PER_MINUTE=30
+    QUOTA_BURST=5                   tokens a resource can save up
+    QUOTA_PRIORITY=batch            priority of callers that set none
+    QUOTA_STATE_FILE=.quota_state.json
+
+`python -m rag.shared_libraries.quota` prints the shared queue depth and
+bucket levels; Scheduler.metrics() also returns the wait times of the
+calling process.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+SYNC = 1
+BATCH = 2
+PRIORITY_NAMES = {"interactive": INTERACTIVE, "sync": SYNC, "batch": BATCH}
+
+DEFAULT_LIMITS = {"gemini": 60, "rag": 60, "embedding": 30}
+DEFAULT_BURST = 5
+DEFAULT_STATE_FILE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", ".quota_state.json")
+)
+# Waiters that have not polled for this long belong to a crashed process
+WAITER_TTL_SECONDS = 10
+POLL_INTERVAL_SECONDS = 0.25
+BACKOFF_INITIAL_SECONDS = 2
+BACKOFF_MAX_SECONDS = 60
+MAX_RETRIES = 5
+# Waits longer than this are logged
+SLOW_WAIT_SECONDS = 1.0
+
+
+def priority_value(priority):
+    """Accepts a priority constant or its name."""
+    if isinstance(priority, str):
+        try:
+            return PRIORITY_NAMES[priority.strip().lower()]
+        except KeyError:
+            raise ValueError(f"Unknown quota priority '{priority}', expected one of {', '.join(PRIORITY_NAMES)}")
+    return priority
+
+
+def priority_name(priority):
+    return next((name for name, value in PRIORITY_NAMES.items() if value == priority), str(priority))
+
+
+_local = threading.local()
+_default_priority = None
+
+
+def set_default_priority(priority):
+    """Sets the priority of all threads of this process that set none themselves."""
+    global _default_priority
+    _default_priority = priority_value(priority)
+
+
+def current_priority():
+    value = getattr(_local, "priority", None)
+    if value is not None:
+        return value
+    if _default_priority is not None:
+        return _default_priority
+    return priority_value(os.getenv("QUOTA_PRIORITY", "batch"))
+
+
+@contextlib.contextmanager
+def priority(value):
+    """Schedules the calls made by this thread inside the block at the given priority."""
+    previous = getattr(_local, "priority", None)
+    _local.priority = priority_value(value)
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def is_quota_error(error):
+    """True for 429 / RESOURCE_EXHAUSTED errors of the Google client libraries."""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or "Resource exhausted" in message
+
+
+class FileLock:
+    """Exclusive lock on a file, shared by the threads of a process and across processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._file = open(self.path, "a+")
+            if os.name == "nt":
+                import msvcrt
+                while True:
+                    try:
+                        self._file.seek(0)
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after 10 seconds; keep waiting
+                        continue
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._thread_lock.release()
+
+
+class Scheduler:
+    def __init__(self, limits=None, burst=DEFAULT_BURST, state_file=None, max_retries=MAX_RETRIES):
+        """
+        Args:
+            limits: dict of resource -> calls per minute; 0 leaves a resource unlimited.
+            burst: tokens a resource can save up while it is idle.
+            state_file: JSON file shared by all processes using the same quotas.
+            max_retries: retries of a call failing with 429.
+        """
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.burst = burst
+        self.state_file = state_file or DEFAULT_STATE_FILE_PATH
+        self.max_retries = max_retries
+        self._file_lock = FileLock(f"{self.state_file}.lock")
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._waiter_ids = itertools.count()
+
+    # --- Shared state ---
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault("buckets", {})
+        state.setdefault("waiters", {})
+        return state
+
+    def _save_state(self, state):
+        tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_file)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._file_lock:
+            state = self._load_state()
+            yield state
+            self._save_state(state)
+
+    def _bucket(self, state, resource, now):
+        """Returns the bucket of a resource, refilled up to now."""
+        rate = self.limits[resource] / 60
+        bucket = state["buckets"].setdefault(
+            resource, {"tokens": self.burst, "updated": now, "blocked_until": 0, "backoff": 0}
+        )
+        elapsed = max(0.0, now - bucket["updated"])
+        bucket["tokens"] = min(self.burst, bucket["tokens"] + elapsed * rate)
+        bucket["updated"] = now
+        return bucket
+
+    @staticmethod
+    def _live_waiters(state, now):
+        waiters = {
+            key: waiter for key, waiter in state["waiters"].items()
+            if now - waiter["seen"] < WAITER_TTL_SECONDS
+        }
+        state["waiters"] = waiters
+        return waiters
+
+    # --- Scheduling ---
+    def limited(self, resource):
+        return bool(self.limits.get(resource))
+
+    def acquire(self, resource, priority=None):
+        """Blocks until this process may make one call to the resource; returns the time waited."""
+        if not self.limited(resource):
+            return 0.0
+        priority = current_priority() if priority is None else priority_value(priority)
+        key = f"{os.getpid()}-{threading.get_ident()}-{next(self._waiter_ids)}"
+        started = time.monotonic()
+        since = time.time()
+        registered = False
+        try:
+            while True:
+                with self._transaction() as state:
+                    now = time.time()
+                    waiters = self._live_waiters(state, now)
+                    bucket = self._bucket(state, resource, now)
+                    ahead = sum(
+                        1 for other_key, waiter in waiters.items()
+                        if other_key != key and waiter["resource"] == resource
+                        and (waiter["priority"], waiter["since"]) < (priority, since)
+                    )
+                    if not ahead and now >= bucket["blocked_until"] and bucket["tokens"] >= 1:
+                        bucket["tokens"] -= 1
+                        waiters.pop(key, None)
+                        registered = False
+                        backoff = bucket["backoff"]
+                        break
+                    waiters[key] = {"resource": resource, "priority": priority, "since": since, "seen": now}
+                    registered = True
+                    if now < bucket["blocked_until"]:
+                        delay = bucket["blocked_until"] - now
+                    elif bucket["tokens"] < 1:
+                        delay = (1 - bucket["tokens"]) * 60 / self.limits[resource]
+                    else:
+                        delay = POLL_INTERVAL_SECONDS
+                time.sleep(min(max(delay, 0.01), POLL_INTERVAL_SECONDS))
+        finally:
+            if registered:
+                with self._transaction() as state:
+                    state["waiters"].pop(key, None)
+
+        waited = time.monotonic() - started
+        self._record(resource, priority, waited=waited)
+        if waited >= SLOW_WAIT_SECONDS:
+            logger.info("Waited %.2fs for %s quota (%s priority, %d caller(s) were ahead)",
+                        waited, resource, priority_name(priority), ahead)
+        if backoff:
+            # The resource recovered from a 429; let the next caller reset the backoff
+            self._recovered(resource)
+        return waited
+
+    def throttled(self, resource, priority=None):
+        """Blocks the resource for all processes after a 429, doubling the backoff each time."""
+        with self._transaction() as state:
+            now = time.time()
+            bucket = self._bucket(state, resource, now)
+            bucket["backoff"] = min(BACKOFF_MAX_SECONDS, bucket["backoff"] * 2 or BACKOFF_INITIAL_SECONDS)
+            bucket["blocked_until"] = max(bucket["blocked_until"],
+                                          now + bucket["backoff"] * random.uniform(0.75, 1.25))
+            bucket["tokens"] = 0
+            backoff = bucket["backoff"]
+        self._record(resource, current_priority() if priority is None else priority, throttled=True)
+        logger.warning("%s quota exhausted, backing off for %.0fs", resource, backoff)
+
+    def _recovered(self, resource):
+        with self._transaction() as state:
+            bucket = state["buckets"].get(resource)
+            if bucket and time.time() >= bucket["blocked_until"]:
+                bucket["backoff"] = 0
+
+    def call(self, resource, fn, *args, **kwargs):
+        """Calls fn(*args, **kwargs) when the quota allows it, retrying on 429."""
+        if not self.limited(resource):
+            return fn(*args, **kwargs)
+        for attempt in range(self.max_retries + 1):
+            self.acquire(resource)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_quota_error(e) or attempt == self.max_retries:
+                    raise
+                self.throttled(resource)
+
+    def stream(self, resource, fn, *args, **kwargs):
+        """Like call() for functions returning an iterator, e.g. stream_query.
+
+        The call is retried on 429 only while no item has been yielded yet.
+        """
+        if not self.limited(resource):
+            return fn(*args, **kwargs)
+        # Resolved now: the generator body runs in whichever thread iterates it
+        priority = current_priority()
+
+        def generate():
+            for attempt in range(self.max_retries + 1):
+                self.acquire(resource, priority)
+                started = False
+                try:
+                    for item in fn(*args, **kwargs):
+                        started = True
+                        yield item
+                    return
+                except Exception as e:
+                    if started or not is_quota_error(e) or attempt == self.max_retries:
+                        raise
+                    self.throttled(resource, priority)
+
+        return generate()
+
+    # --- Metrics ---
+    def _record(self, resource, priority, waited=None, throttled=False):
+        with self._stats_lock:
+            entry = self._stats.setdefault(
+                f"{resource}/{priority_name(priority)}",
+                {"calls": 0, "wait_total": 0.0, "wait_max": 0.0, "throttled": 0},
+            )
+            if waited is not None:
+                entry["calls"] += 1
+                entry["wait_total"] += waited
+                entry["wait_max"] = max(entry["wait_max"], waited)
+            if throttled:
+                entry["throttled"] += 1
+
+    def queue(self):
+        """Returns the shared queue depth and bucket levels of all resources."""
+        with self._file_lock:
+            state = self._load_state()
+        now = time.time()
+        report = {}
+        for resource, limit in self.limits.items():
+            if not limit:
+                continue
+            bucket = self._bucket(state, resource, now)
+            waiting = {name: 0 for name in PRIORITY_NAMES}
+            for waiter in self._live_waiters(state, now).values():
+                if waiter["resource"] == resource:
+                    waiting[priority_name(waiter["priority"])] += 1
+            report[resource] = {
+                "per_minute": limit,
+                "tokens": round(bucket["tokens"], 2),
+                "blocked_for": round(max(0.0, bucket["blocked_until"] - now), 1),
+                "waiting": waiting,
+            }
+        return report
+
+    def metrics(self):
+        """Returns the wait times of this process by resource/priority, and the shared queue."""
+        with self._stats_lock:
+            calls = {
+                key: dict(entry, wait_mean=entry["wait_total"] / entry["calls"] if entry["calls"] else 0.0)
+                for key, entry in self._stats.items()
+            }
+        return {"calls": calls, "queue": self.queue()}
+
+
+class _Unlimited:
+    """Stands in for the scheduler when QUOTA_ENABLED=0."""
+
+    def limited(self, resource):
+        return False
+
+    def acquire(self, resource, priority=None):
+        return 0.0
+
+    def call(self, resource, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    def stream(self, resource, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    def queue(self):
+        return {}
+
+    def metrics(self):
+        return {"calls": {}, "queue": {}}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def load_limits():
+    return {
+        resource: float(os.getenv(f"QUOTA_{resource.upper()}_PER_MINUTE", default))
+        for resource, default in DEFAULT_LIMITS.items()
+    }
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler configured from the environment."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            if os.getenv("QUOTA_ENABLED", "1").lower() in ("0", "false", "no"):
+                _scheduler = _Unlimited()
+            else:
+                _scheduler = Scheduler(
+                    load_limits(),
+                    burst=float(os.getenv("QUOTA_BURST", DEFAULT_BURST)),
+                    state_file=os.getenv("QUOTA_STATE_FILE"),
+                )
+        return _scheduler
+
+
+def call(resource, fn, *args, **kwargs):
+    """Calls fn through the process-wide scheduler."""
+    return get_scheduler().call(resource, fn, *args, **kwargs)
+
+
+def stream(resource, fn, *args, **kwargs):
+    return get_scheduler().stream(resource, fn, *args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the shared Vertex AI quota queue.")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Refresh every SECONDS until interrupted")
+    args = parser.parse_args()
+
+    from rag.shared_libraries import bootstrap
+    bootstrap.load_env()
+    scheduler = get_scheduler()
+    while True:
+        print(json.dumps(scheduler.metrics()["queue"], indent=4))
+        if not args.watch:
+            return
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Sharded retrieval over several RAG corpora.
+
+The documents are split into shards by document group, one corpus per shard.
+Both variables are set in .env:
+
+    # shard name=corpus resource name; written by prepare_corpus_and_data.py
+    RAG_CORPUS_SHARDS=hints=projects/123/locations/us-central1/ragCorpora/1,manuals=projects/123/locations/us-central1/ragCorpora/2
+    # shard name:glob;glob,... - a document goes to the first shard with a matching glob
+    RAG_SHARD_ROUTES=hints:*pwd*;*password*,manuals:*.pdf;*
+
+ShardedRetriever queries all shards concurrently, drops the shards that do not
+answer within RAG_SHARD_TIMEOUT_SECONDS and merges the remaining contexts by
+distance into one top-k list. The latency and status of every shard are
+logged and kept in `last_report`.
+
+Without RAG_CORPUS_SHARDS the single RAG_CORPUS is used as one "default" shard.
+"""
+import fnmatch
+import heapq
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD = "default"
+DEFAULT_TOP_K = 10
+DEFAULT_DISTANCE_THRESHOLD = 0.6
+DEFAULT_TIMEOUT_SECONDS = 5.0
+
+Shard = namedtuple("Shard", ["name", "corpus"])
+
+
+def parse_shards(value):
+    """Parses 'name=corpus,name=corpus' into a list of Shards."""
+    shards = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, separator, corpus = item.partition("=")
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid RAG_CORPUS_SHARDS entry '{item}', expected name=corpus")
+        shards.append(Shard(name.strip(), corpus.strip()))
+    return shards
+
+
+def format_shards(shards):
+    return ",".join(f"{shard.name}={shard.corpus}" for shard in shards)
+
+
+def parse_routes(value):
+    """Parses 'name:glob;glob,name:glob' into a list of (shard name, [globs])."""
+    routes = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, separator, patterns = item.partition(":")
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid RAG_SHARD_ROUTES entry '{item}', expected name:glob;glob")
+        routes.append((name.strip(), [p.strip() for p in patterns.split(";") if p.strip()]))
+    return routes
+
+
+def load_shards():
+    """Returns the shards configured in the environment."""
+    shards = parse_shards(os.getenv("RAG_CORPUS_SHARDS"))
+    if shards:
+        return shards
+    corpus = os.getenv("RAG_CORPUS")
+    return [Shard(DEFAULT_SHARD, corpus)] if corpus else []
+
+
+def sharding_enabled():
+    return bool(os.getenv("RAG_CORPUS_SHARDS") or os.getenv("RAG_SHARD_ROUTES"))
+
+
+def route_document(document_name, routes=None):
+    """Returns the name of the shard a document belongs to.
+
+    Globs are matched case-insensitively against the file name. Documents
+    matching no route go to the first shard of the routes, or of
+    RAG_CORPUS_SHARDS when no routes are configured.
+    """
+    if routes is None:
+        routes = parse_routes(os.getenv("RAG_SHARD_ROUTES"))
+    if not routes:
+        shards = load_shards()
+        return shards[0].name if shards else DEFAULT_SHARD
+    file_name = os.path.basename(document_name).lower()
+    for name, patterns in routes:
+        if any(fnmatch.fnmatch(file_name, pattern.lower()) for pattern in patterns):
+            return name
+    return routes[0][0]
+
+
+def _distance(context):
+    # Older SDK releases report `distance`, newer ones `score`
+    distance = getattr(context, "distance", None)
+    if distance is None:
+        distance = getattr(context, "score", None)
+    return distance if distance is not None else float("inf")
+
+
+class ShardedRetriever:
+    def __init__(self, shards, top_k=DEFAULT_TOP_K, distance_threshold=DEFAULT_DISTANCE_THRESHOLD,
+                 timeout=DEFAULT_TIMEOUT_SECONDS, query_shard=None, scheduler=None):
+        """
+        Args:
+            shards: the Shards to fan out to.
+            top_k: number of contexts returned per shard and after the merge.
+            distance_threshold: contexts farther away than this are dropped.
+            timeout: seconds to wait for the shards; slower shards are skipped.
+            query_shard: function(shard, query, top_k, threshold) returning a list
+                of context dicts; defaults to rag.retrieval_query on the shard.
+            scheduler: optional quota.Scheduler the shard queries go through
+                (local callers only; the deployed agent is not scheduled).
+        """
+        self.shards = list(shards)
+        self.top_k = top_k
+        self.distance_threshold = distance_threshold
+        self.timeout = timeout
+        self.query_shard = query_shard or self._retrieval_query
+        self.scheduler = scheduler
+        self.last_report = []
+        self._executor = None
+
+    def __getstate__(self):
+        # The retriever is pickled with the agent on deployment; threads are not picklable
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["scheduler"] = None
+        return state
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # Timed-out queries keep their worker busy until they return, so leave headroom
+            self._executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.shards)),
+                                                thread_name_prefix="rag-shard")
+        return self._executor
+
+    @staticmethod
+    def _retrieval_query(shard, query, top_k, threshold):
+        # Imported here so the ingestion scripts can use the shard routing without the SDK
+        from vertexai.preview import rag
+
+        response = rag.retrieval_query(
+            rag_resources=[rag.RagResource(rag_corpus=shard.corpus)],
+            text=query,
+            rag_retrieval_config=rag.RagRetrievalConfig(
+                top_k=top_k,
+                filter=rag.Filter(vector_distance_threshold=threshold),
+            ),
+        )
+        return [
+            {"text": context.text, "source": context.source_uri, "distance": _distance(context)}
+            for context in response.contexts.contexts
+        ]
+
+    def _timed_query(self, shard, query, top_k, threshold):
+        started = time.perf_counter()
+        if self.scheduler is not None:
+            contexts = self.scheduler.call("rag", self.query_shard, shard, query, top_k, threshold)
+        else:
+            contexts = self.query_shard(shard, query, top_k, threshold)
+        return contexts, time.perf_counter() - started
+
+    def retrieve(self, query, top_k=None, distance_threshold=None):
+        """Returns the top_k contexts of all shards, closest first."""
+        top_k = top_k or self.top_k
+        threshold = self.distance_threshold if distance_threshold is None else distance_threshold
+        started = time.perf_counter()
+        futures = {
+            self.executor.submit(self._timed_query, shard, query, top_k, threshold): shard
+            for shard in self.shards
+        }
+        wait(futures, timeout=self.timeout)
+
+        merged = []
+        report = []
+        for future, shard in futures.items():
+            entry = {"shard": shard.name, "status": "ok", "latency": None, "results": 0}
+            if not future.done():
+                future.cancel()
+                entry["status"] = "timeout"
+            elif future.exception() is not None:
+                entry["status"] = "error"
+                entry["error"] = str(future.exception())
+            else:
+                contexts, entry["latency"] = future.result()
+                entry["results"] = len(contexts)
+                merged.extend(dict(context, shard=shard.name) for context in contexts)
+            report.append(entry)
+
+        self.last_report = report
+        logger.info(
+            "Sharded retrieval took %.3fs: %s", time.perf_counter() - started,
+            ", ".join(
+                f"{e['shard']}={e['latency']:.3f}s ({e['results']})" if e["status"] == "ok"
+                else f"{e['shard']}={e['status']}"
+                for e in report
+            ),
+        )
+        return heapq.nsmallest(top_k, merged, key=lambda context: context["distance"])
+
+
+def make_retrieval_tool(retriever):
+    """Returns the retrieve_rag_documentation function tool over the retriever."""
+
+    def retrieve_rag_documentation(query: str) -> list:
+        """Use this tool to retrieve documentation and reference materials for the question from the RAG corpora."""
+        contexts = retriever.retrieve(query)
+        if not contexts:
+            return [{"text": "No matching result found in the RAG corpora."}]
+        return contexts
+
+    return retrieve_rag_documentation
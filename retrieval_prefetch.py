@@ -0,0 +1,210 @@
+"""Speculative retrieval for the question being typed in ChatApp.
+
+Retrieval sits on the critical path of every question. With PREFETCH_RETRIEVAL=1
+ChatApp hands the draft in its input box to a Prefetcher once the user
+pauses typing (PREFETCH_DEBOUNCE_MS). The Prefetcher retrieves the chunks
+for the draft in the background and keeps them for PREFETCH_TTL_SECONDS.
+
+When the message is sent, take() returns the chunks of a draft whose words
+match the message closely enough (Jaccard similarity of at least
+PREFETCH_MIN_SIMILARITY), waiting up to PREFETCH_WAIT_SECONDS for a
+prefetch still in flight. ChatApp sends them along with the message
+(with_context()), and the agent answers from them instead of calling its
+retrieval tool; on a miss it retrieves as usual. A prefetch whose draft was
+edited beyond that similarity is cancelled, or dropped when it returns.
+
+stats() reports the prefetches, hits and the retrieval time saved.
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_DEBOUNCE_MS = 400
+DEFAULT_TTL_SECONDS = 60.0
+DEFAULT_MIN_SIMILARITY = 0.8
+# Longest wait for a matching prefetch still in flight when a message is sent, about one retrieval
+DEFAULT_WAIT_SECONDS = 1.0
+# Drafts shorter than this are not worth a retrieval
+MIN_DRAFT_WORDS = 3
+MAX_ENTRIES = 16
+# Marks the prefetched chunks in a message (see rag/prompts.py)
+CONTEXT_START = "<retrieved_context>"
+CONTEXT_END = "</retrieved_context>"
+
+
+def prefetch_enabled():
+    return os.getenv("PREFETCH_RETRIEVAL", "").lower() in ("1", "true", "yes")
+
+
+def words(text):
+    return frozenset(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+def similarity(a, b):
+    """Jaccard similarity of two word sets."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def with_context(message, contexts):
+    """Returns the message with the prefetched chunks appended for the agent."""
+    chunks = "\n\n".join(
+        f"[{context.get('source') or 'corpus'}]\n{context['text']}" for context in contexts
+    )
+    return f"{message}\n\n{CONTEXT_START}\n{chunks}\n{CONTEXT_END}"
+
+
+def default_retriever():
+    """Retrieves from the corpus (or shards) configured in .env, like the agent's retrieval tool."""
+    from rag.shared_libraries import bootstrap, quota, sharding
+
+    bootstrap.init_vertexai()
+    retriever = sharding.ShardedRetriever(
+        sharding.load_shards(),
+        timeout=float(os.getenv("RAG_SHARD_TIMEOUT_SECONDS", sharding.DEFAULT_TIMEOUT_SECONDS)),
+        scheduler=quota.get_scheduler(),
+    )
+    return retriever.retrieve
+
+
+class _Entry:
+    def __init__(self, draft):
+        self.draft = draft
+        self.words = words(draft)
+        self.future = None
+        self.contexts = None
+        self.latency = None
+        self.finished = None
+        self.cancelled = False
+
+
+class Prefetcher:
+    def __init__(self, retrieve=None, ttl=None, min_similarity=None, max_entries=MAX_ENTRIES):
+        """
+        Args:
+            retrieve: function(query) returning a list of context dicts; defaults
+                to the corpus configured in .env (connected on the first prefetch).
+            ttl: seconds a prefetched result is reused for (PREFETCH_TTL_SECONDS).
+            min_similarity: Jaccard similarity between draft and message needed
+                to reuse it (PREFETCH_MIN_SIMILARITY).
+        """
+        self._retrieve = retrieve
+        self.ttl = ttl if ttl is not None else float(os.getenv("PREFETCH_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.min_similarity = (
+            min_similarity if min_similarity is not None
+            else float(os.getenv("PREFETCH_MIN_SIMILARITY", DEFAULT_MIN_SIMILARITY))
+        )
+        self.max_entries = max_entries
+        self._entries = []
+        self._lock = threading.Lock()
+        # One retrieval at a time; a newer draft cancels the queued one
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self.prefetches = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _run(self, entry):
+        if entry.cancelled:
+            return
+        if self._retrieve is None:
+            self._retrieve = default_retriever()
+        started = time.perf_counter()
+        try:
+            contexts = self._retrieve(entry.draft)
+        except Exception as e:
+            print(f"Prefetch failed: {e}")
+            with self._lock:
+                self.errors += 1
+                self._drop(entry)
+            return
+        with self._lock:
+            entry.latency = time.perf_counter() - started
+            entry.finished = time.monotonic()
+            entry.contexts = contexts
+
+    def _drop(self, entry):
+        if entry in self._entries:
+            self._entries.remove(entry)
+
+    def _expire(self):
+        now = time.monotonic()
+        self._entries = [
+            entry for entry in self._entries
+            if entry.finished is None or now - entry.finished < self.ttl
+        ]
+
+    def _best(self, text_words):
+        best, best_similarity = None, self.min_similarity
+        for entry in self._entries:
+            entry_similarity = similarity(entry.words, text_words)
+            if entry_similarity >= best_similarity:
+                best, best_similarity = entry, entry_similarity
+        return best
+
+    def draft_changed(self, draft):
+        """Starts a retrieval for the draft unless a close enough one is cached or running."""
+        draft_words = words(draft)
+        if len(draft_words) < MIN_DRAFT_WORDS:
+            return False
+        with self._lock:
+            self._expire()
+            if self._best(draft_words) is not None:
+                return False
+            # Retrievals for drafts that no longer resemble the text are not needed
+            for entry in [e for e in self._entries if e.contexts is None]:
+                entry.cancelled = True
+                entry.future.cancel()
+                self._drop(entry)
+                self.cancelled += 1
+            entry = _Entry(draft)
+            entry.future = self._executor.submit(self._run, entry)
+            self._entries.append(entry)
+            del self._entries[:-self.max_entries]
+            self.prefetches += 1
+        return True
+
+    def take(self, message, timeout=None):
+        """Returns the prefetched contexts for the message, or None.
+
+        A matching prefetch still in flight is waited for (up to timeout
+        seconds); the time it had already spent counts as saved.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._expire()
+            entry = self._best(words(message))
+        if entry is not None:
+            try:
+                entry.future.result(timeout)
+            except Exception:
+                # Cancelled, or still running after the timeout
+                entry = None
+        with self._lock:
+            if entry is None or entry.contexts is None or entry.cancelled:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += max(0.0, entry.latency - (time.perf_counter() - started))
+            return entry.contexts
+
+    def stats(self):
+        with self._lock:
+            taken = self.hits + self.misses
+            return {
+                "prefetches": self.prefetches,
+                "cancelled": self.cancelled,
+                "errors": self.errors,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / taken if taken else None,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
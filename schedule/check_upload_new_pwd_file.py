@@ -2,17 +2,24 @@ import os
 import json
 import logging
 from datetime import datetime
-from dotenv import load_dotenv
+from rag.shared_libraries import bootstrap
+from rag.shared_libraries.chunking import chunking_settings
 from rag.shared_libraries.prepare_corpus_and_data import (
-    initialize_vertex_ai,
-    create_or_get_corpus,
-    list_corpus_files,
+    corpus_for_document,
+    find_corpus_files,
     delete_corpus_file,
-    upload_pdf_to_corpus
+    upload_pdf_to_corpus,
+    wait_for_file_indexed
 )
+from rag.shared_libraries import profiling, quota
+from sync_lock import SyncLock
+from sync_telemetry import SyncRecorder
 
 # Load environment variables
-load_dotenv(override=True)
+bootstrap.load_env(override=True)
+
+# Imported and initialized on the first RAG API call, so unchanged runs skip it
+vertex_rag = bootstrap.vertex_rag
 
 # Configure logging to print to both file and console
 log_file = './schedule/upload_history.log'
@@ -32,69 +39,137 @@ def get_last_updated_time(file_path):
             return data.get("last_updated")
     return None
 
-def write_last_updated_time(file_path, last_updated):
+def get_last_chunking(file_path):
+    """Returns the chunking the file was last uploaded with (None for the RAG engine default)."""
+    if os.path.exists(file_path):
+        with open(file_path, 'r') as f:
+            chunking = json.load(f).get("chunking")
+            return tuple(chunking) if chunking else None
+    return None
+
+def write_last_updated_time(file_path, last_updated, chunking=None):
     if isinstance(last_updated, datetime):
         last_updated = last_updated.isoformat()
     with open(file_path, 'w') as f:
-        json.dump({"last_updated": last_updated}, f, indent=4)
+        json.dump({"last_updated": last_updated, "chunking": chunking}, f, indent=4)
 
 def get_file_last_modified_time(file_path):
     return datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
 
-def main():
-    logging.info("\n" + "="*50 + "\nExecution started at: " + datetime.now().isoformat() + "\n" + "="*50)
+def initialize(recorder):
+    if not vertex_rag.loaded:
+        with recorder.phase("init"):
+            vertex_rag.load()
+
 
-    initialize_vertex_ai()
+def sync_file(recorder):
+    """Re-uploads FILE_URL to the corpus if it or the chunking changed since the last upload.
 
+    Vertex AI is only imported and initialized (the init phase) once the
+    corpus is needed; the caller is responsible for holding the SyncLock.
+    Phase timings are recorded on the given SyncRecorder and the outcome of
+    the sync is returned.
+    """
     last_updated_file = './schedule/last_updated.json'
     file_url = os.getenv("FILE_URL")
     file_name = os.getenv("FILE_NAME")
 
     if not file_url or not file_name:
         logging.error("FILE_URL or FILE_NAME is not set in the environment variables.")
-        return
+        return "misconfigured"
 
+    chunking = chunking_settings()
     last_updated = get_last_updated_time(last_updated_file)
     if last_updated:
         logging.info(f"Last updated time from file: {last_updated}")
     else:
         logging.info("'last_updated.json' not found or does not have a valid value. Checking corpus for existing file.")
 
+    # The corpus (of the file's shard) is resolved at most once per run, usually from the local cache
+    corpus = None
     if not last_updated:
-        corpus = create_or_get_corpus()
-        files = list_corpus_files(corpus.name)
-
-        for file in files:
-            if file.display_name == file_name:
-                last_updated = file.update_time
-                logging.info(f"Found existing file in corpus. Last updated time: {last_updated}")
-                write_last_updated_time(last_updated_file, last_updated)
-                break
+        initialize(recorder)
+        with recorder.phase("list"):
+            corpus = corpus_for_document(file_name)
+            existing_files = find_corpus_files(corpus.name, file_name)
+        if existing_files:
+            last_updated = existing_files[0].update_time
+            logging.info(f"Found existing file in corpus. Last updated time: {last_updated}")
+            # The chunking of that upload is unknown; assume the current one
+            write_last_updated_time(last_updated_file, last_updated, chunking)
 
     file_last_modified = get_file_last_modified_time(file_url)
     logging.info(f"File last modified time: {file_last_modified}")
 
-    if not last_updated or file_last_modified > last_updated:
+    if last_updated and file_last_modified <= last_updated:
+        if get_last_chunking(last_updated_file) == chunking:
+            logging.info("File has not been modified since last update. No action taken.")
+            return "unchanged"
+        logging.info(f"Chunking changed to {chunking or 'the RAG engine default'} since last update. Updating corpus.")
+    else:
         logging.info("File has been modified since last update. Updating corpus.")
-        corpus = create_or_get_corpus()
-        files = list_corpus_files(corpus.name)
-
-        for file in files:
-            if file.display_name == file_name:
-                delete_corpus_file(corpus.name, file.name)
-                logging.info(f"Deleted existing file: {file_name} from corpus.")
-
-        upload_pdf_to_corpus(
+    initialize(recorder)
+    with recorder.phase("list"):
+        if corpus is None:
+            corpus = corpus_for_document(file_name)
+        existing_files = find_corpus_files(corpus.name, file_name)
+
+    with recorder.phase("delete"):
+        for file in existing_files:
+            delete_corpus_file(corpus.name, file.name)
+            logging.info(f"Deleted existing file: {file_name} from corpus.")
+
+    with recorder.phase("upload"):
+        rag_file = upload_pdf_to_corpus(
             corpus_name=corpus.name,
             file_path=file_url,
             display_name=file_name,
-            description="Updated file uploaded to corpus."
+            description="Updated file uploaded to corpus.",
+            chunking=chunking,
         )
-        completed_upload_time = datetime.now().isoformat()
-        write_last_updated_time(last_updated_file, completed_upload_time)
-        logging.info(f"Uploaded new file: {file_name} to corpus. Completed upload time: {completed_upload_time}")
-    else:
-        logging.info("File has not been modified since last update. No action taken.")
+    if rag_file is None:
+        # last_updated.json is left untouched so the next run retries the upload
+        logging.error(f"Failed to upload {file_name} to corpus.")
+        return "upload_failed"
+
+    with recorder.phase("index_wait"):
+        indexed = wait_for_file_indexed(rag_file.name)
+    completed_upload_time = datetime.now().isoformat()
+    write_last_updated_time(last_updated_file, completed_upload_time, chunking)
+    logging.info(f"Uploaded new file: {file_name} to corpus. Completed upload time: {completed_upload_time}")
+    if not indexed:
+        logging.warning(f"{file_name} was uploaded but is not indexed yet.")
+        return "updated_not_indexed"
+    return "updated"
+
+
+def run_sync(recorder):
+    """Runs one sync under the RAG API instrumentation and records its outcome."""
+    try:
+        with recorder.instrument(vertex_rag):
+            outcome = sync_file(recorder)
+    except Exception as e:
+        logging.exception(f"Sync failed: {e}")
+        recorder.finish("error", error=e)
+        raise
+    recorder.finish(outcome)
+    return outcome
+
+
+def main():
+    logging.info("\n" + "="*50 + "\nExecution started at: " + datetime.now().isoformat() + "\n" + "="*50)
+    # Background sync yields the shared Vertex AI quota to GUI queries
+    quota.set_default_priority(quota.SYNC)
+
+    lock = SyncLock()
+    if not lock.acquire():
+        logging.info(f"Another sync is in progress (lock file {lock.path}). Skipping this run.")
+        SyncRecorder(trigger="schedule").finish("skipped_locked")
+        return
+    try:
+        run_sync(SyncRecorder(trigger="schedule"))
+    finally:
+        lock.release()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    profiling.run("check_upload_new_pwd_file", main)
@@ -0,0 +1,82 @@
+import os
+import time
+
+LOCK_FILE_PATH = './schedule/sync.lock'
+# A lock older than this is considered left behind by a crashed run
+STALE_LOCK_SECONDS = 30 * 60
+
+
+class SyncLockBusy(RuntimeError):
+    """Raised by `with SyncLock():` when another sync holds the lock."""
+
+
+class SyncLock:
+    """Lock file preventing overlapping corpus syncs across processes.
+
+    Used by both the scheduled check_upload_new_pwd_file.py run and the
+    watch_pwd_file.py daemon so only one of them updates the corpus at a time.
+    """
+
+    def __init__(self, path=LOCK_FILE_PATH, stale_after=STALE_LOCK_SECONDS):
+        self.path = path
+        self.stale_after = stale_after
+        self.acquired = False
+
+    def acquire(self):
+        """Tries to take the lock without blocking and returns True on success."""
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._is_stale():
+                    return False
+                self._remove()
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(f"{os.getpid()} {time.time()}")
+            self.acquired = True
+            return True
+        return False
+
+    def release(self):
+        if self.acquired:
+            self._remove()
+            self.acquired = False
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _is_stale(self):
+        try:
+            with open(self.path, 'r') as f:
+                pid, created = f.read().split()
+            pid, created = int(pid), float(created)
+        except (OSError, ValueError):
+            # Unreadable or half-written lock file; only trust its age
+            try:
+                created = os.path.getmtime(self.path)
+            except OSError:
+                return True
+            pid = None
+        if time.time() - created > self.stale_after:
+            return True
+        # os.kill(pid, 0) terminates the process on Windows, so only check on POSIX
+        if pid is not None and os.name == 'posix':
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+        return False
+
+    def __enter__(self):
+        if not self.acquire():
+            raise SyncLockBusy(f"Another sync holds {self.path}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
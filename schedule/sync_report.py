@@ -0,0 +1,186 @@
+"""Aggregates the structured sync records written by sync_telemetry.py.
+
+Run from the project root:
+    python schedule/sync_report.py                 # all records
+    python schedule/sync_report.py --days 30       # only the last 30 days
+    python schedule/sync_report.py --json          # machine-readable output
+"""
+import argparse
+import json
+import statistics
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from tabulate import tabulate
+from sync_telemetry import HISTORY_FILE_PATH, load_history
+
+PHASES = ("init", "list", "delete", "upload", "index_wait")
+PERCENTILES = (50, 90, 99)
+# Recent median durations this much above the baseline are flagged as regressions
+REGRESSION_FACTOR = 1.5
+REGRESSION_WINDOW = 10
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a non-empty list of numbers."""
+    values = sorted(values)
+    if len(values) == 1:
+        return values[0]
+    rank = (len(values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def summarize(values):
+    summary = {"count": len(values)}
+    if values:
+        summary["mean"] = statistics.fmean(values)
+        for pct in PERCENTILES:
+            summary[f"p{pct}"] = percentile(values, pct)
+        summary["max"] = max(values)
+    return summary
+
+
+def filter_records(records, days=None):
+    if days is None:
+        return records
+    cutoff = datetime.now() - timedelta(days=days)
+    return [r for r in records if datetime.fromisoformat(r["started_at"]) >= cutoff]
+
+
+def build_report(records):
+    """Aggregates sync records into outcome counts, percentiles and a daily trend."""
+    updated = [r for r in records if r.get("outcome", "").startswith("updated")]
+    report = {
+        "runs": len(records),
+        "outcomes": dict(Counter(r.get("outcome") for r in records)),
+        "duration": {
+            "all": summarize([r["duration"] for r in records if r.get("duration") is not None]),
+            "updated": summarize([r["duration"] for r in updated]),
+        },
+        "phases": {
+            phase: summarize([r["phases"][phase] for r in records if phase in r.get("phases", {})])
+            for phase in PHASES
+        },
+        "api_calls_per_run": {},
+        "bytes_uploaded": summarize([r["bytes_uploaded"] for r in updated]),
+        "daily": [],
+        "regressions": [],
+    }
+
+    calls = Counter()
+    for record in records:
+        calls.update(record.get("api_calls", {}))
+    if records:
+        report["api_calls_per_run"] = {api: count / len(records) for api, count in sorted(calls.items())}
+
+    by_day = defaultdict(list)
+    for record in records:
+        if record.get("duration") is not None:
+            by_day[record["started_at"][:10]].append(record)
+    for day, day_records in sorted(by_day.items()):
+        durations = [r["duration"] for r in day_records]
+        upload_times = [r["phases"]["upload"] for r in day_records if "upload" in r.get("phases", {})]
+        report["daily"].append({
+            "day": day,
+            "runs": len(day_records),
+            "updates": sum(1 for r in day_records if r.get("outcome", "").startswith("updated")),
+            "median_duration": statistics.median(durations),
+            "max_duration": max(durations),
+            "median_upload": statistics.median(upload_times) if upload_times else None,
+        })
+
+    report["regressions"] = find_regressions(updated)
+    return report
+
+
+def find_regressions(updated_records):
+    """Compares the median of the most recent updates against all earlier ones."""
+    regressions = []
+    if len(updated_records) < 2 * REGRESSION_WINDOW:
+        return regressions
+    recent = updated_records[-REGRESSION_WINDOW:]
+    baseline = updated_records[:-REGRESSION_WINDOW]
+    metrics = {"duration": lambda r: r.get("duration")}
+    for phase in ("upload", "index_wait"):
+        metrics[phase] = lambda r, phase=phase: r.get("phases", {}).get(phase)
+    for metric, get in metrics.items():
+        recent_values = [v for v in map(get, recent) if v is not None]
+        baseline_values = [v for v in map(get, baseline) if v is not None]
+        if not recent_values or not baseline_values:
+            continue
+        recent_median = statistics.median(recent_values)
+        baseline_median = statistics.median(baseline_values)
+        if baseline_median > 0 and recent_median > REGRESSION_FACTOR * baseline_median:
+            regressions.append({
+                "metric": metric,
+                "baseline_median": baseline_median,
+                "recent_median": recent_median,
+            })
+    return regressions
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return value
+
+
+def print_report(report):
+    print(f"Sync runs: {report['runs']}")
+    if not report["runs"]:
+        return
+    print("Outcomes: " + ", ".join(f"{k}={v}" for k, v in sorted(report["outcomes"].items())))
+    print()
+
+    rows = [["total (all runs)", *_summary_row(report["duration"]["all"])],
+            ["total (updates)", *_summary_row(report["duration"]["updated"])]]
+    rows += [[f"phase: {phase}", *_summary_row(summary)] for phase, summary in report["phases"].items()]
+    headers = ["seconds", "count", "mean", *(f"p{p}" for p in PERCENTILES), "max"]
+    print(tabulate(rows, headers=headers))
+    print()
+
+    if report["api_calls_per_run"]:
+        print("API calls per run: " + ", ".join(
+            f"{api}={count:.2f}" for api, count in report["api_calls_per_run"].items()))
+    if report["bytes_uploaded"]["count"]:
+        print(f"Bytes uploaded per update: mean {report['bytes_uploaded']['mean']:.0f}, "
+              f"max {report['bytes_uploaded']['max']}")
+    print()
+
+    print(tabulate(
+        [[d["day"], d["runs"], d["updates"], _fmt(d["median_duration"]), _fmt(d["max_duration"]),
+          _fmt(d["median_upload"])] for d in report["daily"]],
+        headers=["day", "runs", "updates", "median s", "max s", "median upload s"],
+    ))
+
+    for regression in report["regressions"]:
+        print(f"\nREGRESSION: median {regression['metric']} of the last {REGRESSION_WINDOW} updates is "
+              f"{regression['recent_median']:.2f}s vs {regression['baseline_median']:.2f}s before")
+
+
+def _summary_row(summary):
+    return [summary["count"], *(_fmt(summary.get(key)) for key in ("mean", *(f"p{p}" for p in PERCENTILES), "max"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on corpus sync telemetry.")
+    parser.add_argument("--history-file", default=HISTORY_FILE_PATH)
+    parser.add_argument("--days", type=float, help="Only include runs from the last N days")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    records = filter_records(load_history(args.history_file), args.days)
+    report = build_report(records)
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print_report(report)
+    if report["regressions"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Structured telemetry for corpus sync runs.
+
+Every sync appends one JSON record to schedule/sync_history.jsonl:
+
+    {"started_at": "...", "trigger": "schedule", "outcome": "updated",
+     "duration": 12.3, "phases": {"init": 1.2, "list": 0.4, "delete": 0.8,
+     "upload": 9.1, "index_wait": 0.8}, "api_calls": {"list_files": 1, ...},
+     "bytes_uploaded": 51234, "error": null}
+
+schedule/sync_report.py aggregates these records.
+"""
+import os
+import json
+import time
+import logging
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+HISTORY_FILE_PATH = './schedule/sync_history.jsonl'
+
+# RAG API functions whose calls are counted during a sync
+RAG_API_FUNCTIONS = (
+    "list_corpora",
+    "get_corpus",
+    "create_corpus",
+    "list_files",
+    "get_file",
+    "upload_file",
+    "delete_file",
+)
+
+
+class SyncRecorder:
+    """Collects phase timings, API call counts and the outcome of one sync run."""
+
+    def __init__(self, trigger="schedule", history_file=HISTORY_FILE_PATH):
+        self.history_file = history_file
+        self._started = time.perf_counter()
+        self.record = {
+            "started_at": datetime.now().isoformat(),
+            "trigger": trigger,
+            "outcome": None,
+            "duration": None,
+            "phases": {},
+            "api_calls": {},
+            "bytes_uploaded": 0,
+            "error": None,
+        }
+
+    @contextmanager
+    def phase(self, name):
+        """Times a block of the sync; repeated phases accumulate."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases = self.record["phases"]
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - started
+
+    def count_call(self, api):
+        calls = self.record["api_calls"]
+        calls[api] = calls.get(api, 0) + 1
+
+    def add_bytes_uploaded(self, size):
+        self.record["bytes_uploaded"] += size
+
+    @contextmanager
+    def instrument(self, rag_module):
+        """Counts calls to the RAG API functions of rag_module while the block runs.
+
+        upload_file calls also add the size of the uploaded file to bytes_uploaded.
+        A bootstrap.LazyModule is only patched if it gets imported during the block.
+        """
+        originals = {}
+
+        def counted(name, fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                self.count_call(name)
+                if name == "upload_file" and kwargs.get("path"):
+                    try:
+                        self.add_bytes_uploaded(os.path.getsize(kwargs["path"]))
+                    except OSError:
+                        pass
+                return fn(*args, **kwargs)
+            return wrapper
+
+        def patch(module):
+            for name in RAG_API_FUNCTIONS:
+                if hasattr(module, name):
+                    originals[name] = getattr(module, name)
+                    setattr(module, name, counted(name, originals[name]))
+            originals[None] = module
+
+        lazy = hasattr(type(rag_module), "when_loaded")
+        if lazy:
+            rag_module.when_loaded(patch)
+        else:
+            patch(rag_module)
+        try:
+            yield self
+        finally:
+            if lazy:
+                rag_module.discard(patch)
+            module = originals.pop(None, None)
+            for name, fn in originals.items():
+                setattr(module, name, fn)
+
+    def finish(self, outcome, error=None):
+        """Stores the outcome and appends the record to the history file."""
+        self.record["outcome"] = outcome
+        self.record["error"] = str(error) if error else None
+        self.record["duration"] = time.perf_counter() - self._started
+        self.record["phases"] = {
+            name: round(seconds, 4) for name, seconds in self.record["phases"].items()
+        }
+        self.record["duration"] = round(self.record["duration"], 4)
+        try:
+            with open(self.history_file, 'a') as f:
+                f.write(json.dumps(self.record) + "\n")
+        except OSError as e:
+            logging.error(f"Could not write sync telemetry to {self.history_file}: {e}")
+        logging.info(f"Sync telemetry: {json.dumps(self.record)}")
+        return self.record
+
+
+def load_history(history_file=HISTORY_FILE_PATH):
+    """Returns the sync records of the history file, skipping malformed lines."""
+    records = []
+    if not os.path.exists(history_file):
+        return records
+    with open(history_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
@@ -0,0 +1,161 @@
+"""Long-running watcher that syncs FILE_URL to the corpus as soon as it changes.
+
+Alternative to running check_upload_new_pwd_file.py from the Task Scheduler:
+Vertex AI is initialized once, the document's folder is watched with
+watchdog (inotify on Linux, ReadDirectoryChangesW on Windows) and a burst of
+save events is debounced into a single sync. Without watchdog installed the
+file's modification time is polled instead.
+
+Run from the project root:
+    python schedule/watch_pwd_file.py
+"""
+import os
+import time
+import logging
+import threading
+from rag.shared_libraries import bootstrap, profiling, quota
+from rag.shared_libraries.prepare_corpus_and_data import initialize_vertex_ai
+from check_upload_new_pwd_file import run_sync
+from sync_lock import SyncLock
+from sync_telemetry import SyncRecorder
+
+bootstrap.load_env(override=True)
+
+# Seconds without further events before a sync starts
+DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "5"))
+# Polling interval used when watchdog is not installed
+POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", "2"))
+
+
+class DebouncedSync:
+    """Coalesces bursts of change notifications into single sync runs.
+
+    Every trigger() restarts the debounce timer. Triggers arriving while a
+    sync is running schedule exactly one follow-up sync.
+    """
+
+    def __init__(self, sync, delay=DEBOUNCE_SECONDS):
+        self._sync = sync
+        self._delay = delay
+        self._lock = threading.Lock()
+        self._timer = None
+        self._running = False
+        self._pending = False
+
+    def trigger(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._delay, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _fire(self):
+        with self._lock:
+            self._timer = None
+            if self._running:
+                self._pending = True
+                return
+            self._running = True
+        while True:
+            try:
+                self._sync()
+            except Exception as e:
+                logging.exception(f"Sync failed: {e}")
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
+
+
+def run_locked_sync(retry):
+    """Runs one sync under the lock file, retrying later if another sync holds it."""
+    lock = SyncLock()
+    if not lock.acquire():
+        logging.info(f"Another sync is in progress (lock file {lock.path}). Retrying later.")
+        retry()
+        return
+    try:
+        # Vertex AI was initialized once at startup and is reused by every sync
+        run_sync(SyncRecorder(trigger="watch"))
+    finally:
+        lock.release()
+
+
+def watch_with_watchdog(file_path, on_change):
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    target = os.path.normcase(os.path.abspath(file_path))
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            # Editors often save through a temporary file that is renamed over the target
+            paths = (event.src_path, getattr(event, "dest_path", ""))
+            if any(path and os.path.normcase(os.path.abspath(path)) == target for path in paths):
+                on_change()
+
+    observer = Observer()
+    observer.schedule(Handler(), os.path.dirname(target), recursive=False)
+    observer.start()
+    logging.info(f"Watching {file_path} for changes (watchdog)")
+    try:
+        while observer.is_alive():
+            observer.join(1)
+    finally:
+        observer.stop()
+        observer.join()
+
+
+def watch_with_polling(file_path, on_change):
+    logging.info(f"watchdog is not installed; polling {file_path} every {POLL_SECONDS}s")
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.stat(file_path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != last_mtime:
+            if last_mtime is not None:
+                on_change()
+            last_mtime = mtime
+        time.sleep(POLL_SECONDS)
+
+
+def main():
+    file_url = os.getenv("FILE_URL")
+    if not file_url or not os.getenv("FILE_NAME"):
+        logging.error("FILE_URL or FILE_NAME is not set in the environment variables.")
+        return
+
+    # Background sync yields the shared Vertex AI quota to GUI queries
+    quota.set_default_priority(quota.SYNC)
+    # Initialized once and reused by every sync for the lifetime of the watcher
+    initialize_vertex_ai()
+
+    debouncer = DebouncedSync(lambda: run_locked_sync(retry=debouncer.trigger))
+    # Catch up with changes made while the watcher was not running
+    debouncer.trigger()
+
+    try:
+        try:
+            import watchdog  # noqa: F401
+        except ImportError:
+            watch_with_polling(file_url, debouncer.trigger)
+        else:
+            watch_with_watchdog(file_url, debouncer.trigger)
+    except KeyboardInterrupt:
+        logging.info("Watcher stopped.")
+    finally:
+        debouncer.cancel()
+
+
+if __name__ == "__main__":
+    profiling.run("watch_pwd_file", main)
@@ -0,0 +1,107 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Fixtures for the ChatApp micro-benchmarks.
+
+The benchmarks build ChatApp objects with build_ui=False, so no window, icon
+or agent connection is needed. When a display is available the thread list
+and chat view are real Tk widgets of a withdrawn root window; otherwise (CI,
+SSH sessions) minimal in-memory stand-ins are used so the persistence and
+list-building code paths can still be measured.
+"""
+
+import json
+import os
+import tkinter as tk
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app import ChatApp  # noqa: E402
+from thread_store import ThreadStore  # noqa: E402
+
+from ..fakes import FakeListbox, FakeText  # noqa: E402
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def pytest_collection_modifyitems(items):
+    # Deselected by default (see [tool.pytest.ini_options]); run with -m benchmark
+    for item in items:
+        if str(item.path).startswith(BENCHMARK_DIR):
+            item.add_marker(pytest.mark.benchmark)
+
+
+@pytest.fixture(scope="session")
+def tk_root():
+    """A withdrawn Tk root window, or None when there is no display."""
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        yield None
+        return
+    root.withdraw()
+    yield root
+    root.destroy()
+
+
+def make_messages(count):
+    return [
+        {"author": "user" if i % 2 == 0 else "agent",
+         "message": f"Message {i}: what is the hint for account number {i}?"}
+        for i in range(count)
+    ]
+
+
+def thread_title(index):
+    return f"2025-01-01 00_00_{index:05d}"
+
+
+def write_history(thread_dir, thread_count, messages_per_thread):
+    """Writes a synthetic thread_history directory like the one ChatApp saves."""
+    os.makedirs(thread_dir, exist_ok=True)
+    messages = make_messages(messages_per_thread)
+    for index in range(thread_count):
+        with open(os.path.join(thread_dir, f"{thread_title(index)}.json"), "w") as file:
+            json.dump(messages, file, indent=4)
+    return thread_dir
+
+
+@pytest.fixture
+def make_app(tk_root, monkeypatch):
+    """Returns a factory building a headless ChatApp over a thread directory."""
+    # Neither the chat server nor the retrieval prefetch are part of the measured paths
+    monkeypatch.delenv("CHAT_SERVER_URL", raising=False)
+    monkeypatch.delenv("PREFETCH_RETRIEVAL", raising=False)
+    widgets = []
+
+    def factory(thread_dir, load=True):
+        app = ChatApp(tk_root, thread_dir=thread_dir, store=ThreadStore(thread_dir), build_ui=False)
+        if tk_root is not None:
+            app.thread_list = tk.Listbox(tk_root)
+            app.chat_display = tk.Text(tk_root, state="disabled")
+            widgets.extend([app.thread_list, app.chat_display])
+        else:
+            app.thread_list = FakeListbox()
+            app.chat_display = FakeText()
+        if load:
+            app.load_threads()
+            app.update_thread_list()
+        return app
+
+    yield factory
+    for widget in widgets:
+        widget.destroy()
@@ -0,0 +1,134 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Micro-benchmarks for the ChatApp persistence and rendering hot paths.
+
+Run and store the results for the current commit:
+    pytest tests/benchmarks -m benchmark --benchmark-autosave
+Compare against the stored results of earlier commits:
+    pytest tests/benchmarks -m benchmark --benchmark-compare --benchmark-compare-fail=median:20%
+"""
+
+import os
+
+import pytest
+
+import thread_archive
+from thread_store import ThreadStore
+
+from .conftest import thread_title, write_history
+
+THREAD_COUNTS = [10, 100, 1000, 10000]
+MESSAGE_COUNTS = [10, 1000, 10000]
+
+
+@pytest.fixture(scope="module")
+def histories(tmp_path_factory):
+    """Synthetic thread_history directories, built once per module and reused."""
+    cache = {}
+
+    def get(thread_count, messages_per_thread):
+        key = (thread_count, messages_per_thread)
+        if key not in cache:
+            thread_dir = tmp_path_factory.mktemp(f"history_{thread_count}x{messages_per_thread}")
+            cache[key] = write_history(str(thread_dir), thread_count, messages_per_thread)
+        return cache[key]
+
+    return get
+
+
+@pytest.mark.parametrize("thread_count", THREAD_COUNTS)
+def test_startup_load(benchmark, make_app, histories, thread_count):
+    """load_threads + update_thread_list, as run when the window opens."""
+    thread_dir = histories(thread_count, 4)
+
+    app = benchmark(make_app, thread_dir)
+
+    assert len(app.threads) == thread_count
+
+
+@pytest.mark.parametrize("message_count", MESSAGE_COUNTS)
+def test_startup_load_long_thread(benchmark, make_app, histories, message_count):
+    thread_dir = histories(1, message_count)
+
+    app = benchmark(make_app, thread_dir)
+
+    assert len(app.threads[thread_title(0)]) == message_count
+
+
+@pytest.mark.parametrize("message_count", MESSAGE_COUNTS)
+def test_save_message(benchmark, make_app, tmp_path, message_count):
+    """display_message: append one message, refresh the list and save the thread."""
+    thread_dir = write_history(str(tmp_path), 1, message_count)
+    app = make_app(thread_dir)
+    app.current_thread = thread_title(0)
+
+    benchmark(app.display_message, "user", "What is my Kahoot account?")
+
+    assert len(app.threads[app.current_thread]) > message_count
+
+
+@pytest.mark.parametrize("thread_count", THREAD_COUNTS)
+def test_save_message_many_threads(benchmark, make_app, histories, tmp_path, thread_count):
+    app = make_app(histories(thread_count, 4))
+    # Saves go to a scratch directory so the shared history stays unchanged
+    app.thread_dir = str(tmp_path)
+    app.store = ThreadStore(app.thread_dir)
+    app.current_thread = "2099-01-01 00_00_00"
+    app.threads[app.current_thread] = []
+
+    benchmark(app.display_message, "user", "What is my Kahoot account?")
+
+    assert len(app.threads) == thread_count + 1
+
+
+@pytest.mark.parametrize("thread_count", THREAD_COUNTS)
+def test_refresh_thread_list(benchmark, make_app, histories, thread_count):
+    app = make_app(histories(thread_count, 4))
+
+    benchmark(app.update_thread_list)
+
+    assert app.thread_list.size() == thread_count
+
+
+@pytest.mark.parametrize("message_count", MESSAGE_COUNTS)
+def test_switch_thread(benchmark, make_app, histories, tmp_path, message_count):
+    """select_thread between two threads, including the save of the current one."""
+    app = make_app(histories(2, message_count))
+    app.thread_dir = str(tmp_path)
+    app.store = ThreadStore(app.thread_dir)
+    switches = iter(range(10**9))
+
+    def switch():
+        app.thread_list.selection_clear(0, "end")
+        app.thread_list.selection_set(next(switches) % 2)
+        app.select_thread(None)
+
+    benchmark(switch)
+
+    assert app.current_thread in app.threads
+
+
+@pytest.mark.parametrize("thread_count", THREAD_COUNTS)
+def test_startup_load_archived(benchmark, make_app, tmp_path, thread_count):
+    """Startup when all but the last ten threads were archived by thread_archive.py."""
+    thread_dir = write_history(str(tmp_path), thread_count, 4)
+    for index in range(thread_count - 10):
+        os.utime(os.path.join(thread_dir, f"{thread_title(index)}.json"), (0, 0))
+    thread_archive.archive_threads(thread_dir, older_than_days=30)
+
+    app = benchmark(make_app, thread_dir)
+
+    assert len(app.threads) + len(app.archived) == thread_count
+    assert app.thread_list.size() == thread_count
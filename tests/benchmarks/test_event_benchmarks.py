@@ -0,0 +1,186 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks of deployment.events against the former dict-walking helpers.
+
+"pretty print" covers the console path of ChatApp.query_agent (print every
+event and extract the answer); "accumulate text" covers the answer-only path
+of the load test, where no previews are rendered. The streams replay the
+event shapes of the deployed agent (function call, retrieval response,
+answer) for many queries. To benchmark a stream recorded from the real agent
+instead, point EVENT_STREAM_FILE at a JSONL file with one event per line:
+    EVENT_STREAM_FILE=events.jsonl pytest tests/benchmarks -m benchmark -k events
+"""
+
+import contextlib
+import json
+import os
+import tracemalloc
+
+import pytest
+
+from deployment import events
+from deployment.stub_engine import answer_event, function_call_event, function_response_event
+
+QUERY_COUNTS = [100, 1000]
+CHUNK_WORDS = 200
+
+
+def legacy_pretty_print_event(event):
+    """pretty_print_event as it was duplicated in deployment/agent.py and run.py."""
+    if "content" not in event:
+        print(f"[{event.get('author', 'unknown')}]: {event}")
+        return
+
+    author = event.get("author", "unknown")
+    parts = event["content"].get("parts", [])
+
+    for part in parts:
+        if "text" in part:
+            text = part["text"]
+            if len(text) > 200:
+                text = text[:197] + "..."
+            print(f"[{author}]: {text}")
+        elif "functionCall" in part:
+            func_call = part["functionCall"]
+            print(f"[{author}]: Function call: {func_call.get('name', 'unknown')}")
+            args = json.dumps(func_call.get("args", {}))
+            if len(args) > 100:
+                args = args[:97] + "..."
+            print(f"  Args: {args}")
+        elif "functionResponse" in part:
+            func_response = part["functionResponse"]
+            print(f"[{author}]: Function response: {func_response.get('name', 'unknown')}")
+            response = json.dumps(func_response.get("response", {}))
+            if len(response) > 100:
+                response = response[:97] + "..."
+            print(f"  Response: {response}")
+
+
+def legacy_get_agent_text_from_event(event):
+    author = event.get("author", "unknown")
+    if author == "ask_rag_agent" and "content" in event:
+        parts = event["content"].get("parts", [])
+        for part in parts:
+            if "text" in part:
+                return part["text"]
+    return None
+
+
+def make_stream(query_count):
+    stream_file = os.getenv("EVENT_STREAM_FILE")
+    if stream_file:
+        with open(stream_file) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    stream = []
+    for i in range(query_count):
+        message = f"Question {i} about my accounts?"
+        stream.append(function_call_event(message))
+        stream.append(function_response_event(message, chunk_words=CHUNK_WORDS))
+        stream.append(answer_event(message))
+    return stream
+
+
+class NullWriter:
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def print_legacy(stream):
+    with contextlib.redirect_stdout(NullWriter()):
+        for event in stream:
+            legacy_pretty_print_event(event)
+            legacy_get_agent_text_from_event(event)
+
+
+def print_events(stream):
+    with contextlib.redirect_stdout(NullWriter()):
+        for event in stream:
+            event = events.Event.from_dict(event)
+            event.pretty_print()
+            event.text()
+
+
+def accumulate_legacy(stream):
+    texts = []
+    for event in stream:
+        text = legacy_get_agent_text_from_event(event)
+        if text:
+            texts.append(text)
+    return texts
+
+
+def accumulate_events(stream):
+    answer = events.TextAccumulator()
+    for event in stream:
+        answer.add(event)
+    return answer.texts
+
+
+def peak_allocation(func, stream):
+    tracemalloc.start()
+    try:
+        func(stream)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(scope="module")
+def streams():
+    return {count: make_stream(count) for count in QUERY_COUNTS}
+
+
+def test_output_matches_legacy(streams, capsys):
+    for event in streams[QUERY_COUNTS[0]] + [{"author": "user"}]:
+        legacy_pretty_print_event(event)
+        legacy_output = capsys.readouterr().out
+        events.pretty_print_event(event)
+        assert capsys.readouterr().out == legacy_output
+        assert events.agent_text(event) == legacy_get_agent_text_from_event(event)
+
+
+def test_preview_allocates_less(streams):
+    stream = streams[QUERY_COUNTS[0]]
+    legacy_peak = peak_allocation(print_legacy, stream)
+    events_peak = peak_allocation(print_events, stream)
+    print(f"\npeak allocation: legacy {legacy_peak} B, events {events_peak} B")
+    assert events_peak < legacy_peak
+
+
+@pytest.mark.parametrize("query_count", QUERY_COUNTS)
+def test_pretty_print_legacy(benchmark, streams, query_count):
+    benchmark.group = f"pretty print {query_count} queries"
+    benchmark(print_legacy, streams[query_count])
+
+
+@pytest.mark.parametrize("query_count", QUERY_COUNTS)
+def test_pretty_print_events(benchmark, streams, query_count):
+    benchmark.group = f"pretty print {query_count} queries"
+    benchmark(print_events, streams[query_count])
+
+
+@pytest.mark.parametrize("query_count", QUERY_COUNTS)
+def test_accumulate_text_legacy(benchmark, streams, query_count):
+    benchmark.group = f"accumulate text {query_count} queries"
+    benchmark(accumulate_legacy, streams[query_count])
+
+
+@pytest.mark.parametrize("query_count", QUERY_COUNTS)
+def test_accumulate_text_events(benchmark, streams, query_count):
+    benchmark.group = f"accumulate text {query_count} queries"
+    assert benchmark(accumulate_events, streams[query_count]) == accumulate_legacy(streams[query_count])
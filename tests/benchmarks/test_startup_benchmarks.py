@@ -0,0 +1,68 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Startup benchmarks of the scripts, each measured in a fresh interpreter.
+
+"eager_sdk_imports" is what every script used to import before doing
+anything (the rag package with the agent, google.auth and the Vertex AI RAG
+SDK); the other benchmarks import the same entry points through the shared
+bootstrap, which defers the SDKs until the first API call. "unchanged_sync"
+is a complete scheduled sync run that finds the document unchanged.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+ENV = {
+    "GOOGLE_CLOUD_PROJECT": "project",
+    "GOOGLE_CLOUD_LOCATION": "us-central1",
+    "CORPUS_DISPLAY_NAME": "corpus",
+    "CORPUS_DESCRIPTION": "description",
+    "QUOTA_ENABLED": "0",
+}
+
+
+def run_python(args, cwd=REPO_ROOT, env=None):
+    env = dict(os.environ, **ENV, **(env or {}))
+    env["PYTHONPATH"] = os.pathsep.join([REPO_ROOT, os.path.join(REPO_ROOT, "schedule")])
+    subprocess.run([sys.executable, *args], cwd=cwd, env=env, check=True, capture_output=True)
+
+
+@pytest.mark.parametrize("code", [
+    pytest.param("import rag.agent, google.auth, vertexai; from vertexai.preview import rag", id="eager_sdk_imports"),
+    pytest.param("import rag.shared_libraries.prepare_corpus_and_data", id="prepare_corpus"),
+    pytest.param("import deployment.agent", id="rag_agent_client"),
+])
+def test_import_time(benchmark, code):
+    benchmark.pedantic(run_python, args=(["-c", code],), rounds=3, iterations=1)
+
+
+def test_unchanged_sync(benchmark, tmp_path):
+    document = tmp_path / "passwords.pdf"
+    document.write_bytes(b"%PDF-1.4")
+    (tmp_path / "schedule").mkdir()
+    (tmp_path / "schedule" / "last_updated.json").write_text(json.dumps({"last_updated": "9999-01-01T00:00:00"}))
+    (tmp_path / ".env").write_text("")
+    # An empty settings file, so a developer's .env cannot point the run at a real document
+    env = {"FILE_URL": str(document), "FILE_NAME": "passwords.pdf", "ENV_FILE": str(tmp_path / ".env")}
+    script = os.path.join(REPO_ROOT, "schedule", "check_upload_new_pwd_file.py")
+
+    benchmark.pedantic(run_python, args=([script],), kwargs={"cwd": tmp_path, "env": env}, rounds=3, iterations=1)
+    history = (tmp_path / "schedule" / "sync_history.jsonl").read_text().splitlines()
+    assert json.loads(history[-1])["outcome"] == "unchanged"
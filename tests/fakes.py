@@ -0,0 +1,59 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-memory stand-ins for the Tk widgets of ChatApp, for tests without a display."""
+
+
+class FakeListbox:
+    def __init__(self):
+        self.items = []
+        self.selection = ()
+
+    def delete(self, first, last=None):
+        self.items.clear()
+
+    def insert(self, index, item):
+        self.items.append(item)
+
+    def get(self, index):
+        return self.items[index]
+
+    def size(self):
+        return len(self.items)
+
+    def curselection(self):
+        return self.selection
+
+    def selection_set(self, index):
+        self.selection = (index,)
+
+    def selection_clear(self, first, last=None):
+        self.selection = ()
+
+    def activate(self, index):
+        pass
+
+
+class FakeText:
+    def __init__(self):
+        self.chunks = []
+
+    def config(self, **kwargs):
+        pass
+
+    def delete(self, first, last=None):
+        self.chunks.clear()
+
+    def insert(self, index, text):
+        self.chunks.append(text)
@@ -0,0 +1,130 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the shared bootstrap: lazy SDK imports, settings and the credentials cache."""
+
+import os
+import subprocess
+import sys
+from datetime import timedelta
+
+import pytest
+
+from rag.shared_libraries import bootstrap
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class FakeCredentials:
+    def __init__(self, token="fresh-token", lifetime=timedelta(hours=1)):
+        self.token = None
+        self.expiry = None
+        self.quota_project_id = "quota-project"
+        self._token = token
+        self._lifetime = lifetime
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = self._token
+        self.expiry = bootstrap._utcnow() + self._lifetime
+
+
+@pytest.fixture
+def credentials_cache(tmp_path, monkeypatch):
+    adc_file = tmp_path / "adc.json"
+    adc_file.write_text("{}")
+    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", str(adc_file))
+    monkeypatch.setenv("CREDENTIALS_CACHE_PATH", str(tmp_path / "cache" / "credentials.json"))
+    monkeypatch.delenv("CREDENTIALS_CACHE", raising=False)
+    monkeypatch.setattr(bootstrap, "_credentials", None)
+    return adc_file
+
+
+def test_lazy_module_imports_on_first_use_and_retries_failed_callbacks():
+    calls = []
+
+    def on_load(module):
+        calls.append(module.__name__)
+        if len(calls) == 1:
+            raise RuntimeError("no credentials")
+
+    module = bootstrap.LazyModule("json", on_load=on_load)
+    assert not module.loaded
+    with pytest.raises(RuntimeError):
+        module.dumps
+    assert not module.loaded
+
+    assert module.dumps([1]) == "[1]"
+    assert module.loaded
+    assert calls == ["json", "json"]
+
+    loaded = []
+    module.when_loaded(loaded.append)
+    assert loaded == [sys.modules["json"]]
+
+
+def test_require_env(monkeypatch):
+    monkeypatch.setenv("BOOTSTRAP_TEST_SETTING", "value")
+    assert bootstrap.require_env("BOOTSTRAP_TEST_SETTING") == "value"
+    monkeypatch.setenv("BOOTSTRAP_TEST_SETTING", "")
+    with pytest.raises(ValueError, match="BOOTSTRAP_TEST_SETTING environment variable not set"):
+        bootstrap.require_env("BOOTSTRAP_TEST_SETTING")
+
+
+def test_refreshed_token_is_cached_for_the_next_run(credentials_cache, monkeypatch):
+    inner = FakeCredentials()
+    monkeypatch.setattr(bootstrap.google.auth, "default", lambda scopes=None: (inner, "my-project"))
+    credentials, project = bootstrap.get_credentials()
+    credentials.refresh(None)
+    assert (credentials.token, project, credentials.quota_project_id) == ("fresh-token", "my-project", "quota-project")
+    cache_path = os.environ["CREDENTIALS_CACHE_PATH"]
+    if os.name == "posix":
+        assert os.stat(cache_path).st_mode & 0o777 == 0o600
+
+    # The next run starts from the cached token without loading the credentials
+    def no_default(scopes=None):
+        raise AssertionError("google.auth.default() called despite a cached token")
+
+    monkeypatch.setattr(bootstrap, "_credentials", None)
+    monkeypatch.setattr(bootstrap.google.auth, "default", no_default)
+    credentials, project = bootstrap.get_credentials()
+    assert credentials.valid
+    assert (credentials.token, project, credentials.quota_project_id) == ("fresh-token", "my-project", "quota-project")
+
+
+def test_cached_token_is_ignored_when_expiring_or_credentials_change(credentials_cache, monkeypatch):
+    inner = FakeCredentials(lifetime=timedelta(minutes=2))
+    monkeypatch.setattr(bootstrap.google.auth, "default", lambda scopes=None: (inner, "my-project"))
+    bootstrap.get_credentials()[0].refresh(None)
+    assert bootstrap._read_token_cache() is None
+
+    inner._lifetime = timedelta(hours=1)
+    bootstrap.get_credentials()[0].refresh(None)
+    assert bootstrap._read_token_cache()["token"] == "fresh-token"
+    os.utime(credentials_cache, (0, 0))
+    assert bootstrap._read_token_cache() is None
+
+
+def test_scripts_import_without_the_vertex_ai_sdk():
+    env = dict(os.environ, GOOGLE_CLOUD_PROJECT="project", GOOGLE_CLOUD_LOCATION="us-central1",
+               CORPUS_DISPLAY_NAME="corpus", CORPUS_DESCRIPTION="description")
+    code = (
+        "import sys\n"
+        "import rag.shared_libraries.prepare_corpus_and_data, deployment.agent\n"
+        "print(sorted(m for m in ('vertexai', 'google.adk') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,81 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the configurable upload chunking and the offline chunking benchmark."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from eval import chunking_benchmark
+from rag.shared_libraries import chunking
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_chunking_settings_from_environment(monkeypatch):
+    monkeypatch.delenv("RAG_CHUNK_SIZE", raising=False)
+    monkeypatch.delenv("RAG_CHUNK_OVERLAP", raising=False)
+    assert chunking.chunking_settings() is None
+    monkeypatch.setenv("RAG_CHUNK_SIZE", "256")
+    assert chunking.chunking_settings() == (256, 51)
+    monkeypatch.setenv("RAG_CHUNK_OVERLAP", "32")
+    assert chunking.chunking_settings() == (256, 32)
+    monkeypatch.setenv("RAG_CHUNK_OVERLAP", "256")
+    with pytest.raises(ValueError, match="overlap smaller than the size"):
+        chunking.chunking_settings()
+
+
+def test_benchmark_runs_without_cloud_settings(tmp_path):
+    document = tmp_path / "pwd.txt"
+    document.write_text("\n".join(f"- Service {i}: login with email, hint pet {i}" for i in range(40)))
+    env = {name: value for name, value in os.environ.items()
+           if not name.startswith(("GOOGLE_CLOUD_", "CORPUS_", "RAG_CHUNK_"))}
+    env["ENV_FILE"] = str(tmp_path / ".env")
+
+    result = subprocess.run(
+        [sys.executable, "-m", "eval.chunking_benchmark", "--document", str(document), "--settings", "32:4"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "<- current" in result.stdout
+
+
+def test_chunk_text_windows_overlap_and_keep_the_text():
+    text = "\n".join(f"- site{i}: hint {i}" for i in range(10))
+    tokens = chunking_benchmark.TOKEN_PATTERN.findall(text)
+    chunks = chunking_benchmark.chunk_text(text, 12, 4)
+
+    assert all(chunking_benchmark.count_tokens(chunk) <= 12 for chunk in chunks)
+    assert chunks[0] == text[:len(chunks[0])] and "\n" in chunks[0]
+    # Consecutive chunks share their last / first 4 tokens and together cover the text
+    assert chunking_benchmark.TOKEN_PATTERN.findall(chunks[0])[-4:] == \
+        chunking_benchmark.TOKEN_PATTERN.findall(chunks[1])[:4]
+    assert chunks[-1].endswith("hint 9")
+    assert len(chunks) == -(-(len(tokens) - 4) // 8)
+    assert chunking_benchmark.chunk_text("", 12, 4) == []
+
+
+def test_smaller_chunks_retrieve_fewer_tokens():
+    lines = [f"- Service {i}: account type standard, login with email, hint pet {i}" for i in range(80)]
+    lines.insert(40, "- Kahoot: the account type is Teacher, login with Google")
+    labels = [{"retrieval_query": "Kahoot account type", "expected_terms": ["kahoot", "teacher"]}]
+
+    small = chunking_benchmark.evaluate_setting(["\n".join(lines)], labels, 32, 4, top_k=3, threshold=0.95)
+    large = chunking_benchmark.evaluate_setting(["\n".join(lines)], labels, 512, 64, top_k=3, threshold=0.95)
+    assert small["chunks"] > large["chunks"]
+    assert small["recall_at_k"] == large["recall_at_k"] == 1.0
+    assert small["retrieved_tokens"] < large["retrieved_tokens"]
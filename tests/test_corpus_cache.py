@@ -0,0 +1,44 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the local corpus and corpus file metadata cache."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from rag.shared_libraries import corpus_cache
+
+
+def test_concurrent_forgets_are_not_lost(tmp_path, monkeypatch):
+    monkeypatch.setenv("CORPUS_CACHE_PATH", str(tmp_path / ".corpus_cache.json"))
+    corpora = [SimpleNamespace(name=f"corpora/{i}", display_name=f"corpus {i}") for i in range(40)]
+    for corpus in corpora:
+        corpus_cache.remember_corpus(corpus)
+        corpus_cache.remember_files(corpus.name, [
+            SimpleNamespace(name=f"{corpus.name}/files/{j}", display_name=f"file {j}") for j in range(3)
+        ])
+
+    # As delete_all_corpora.py does from its worker threads
+    def delete(corpus):
+        corpus_cache.forget_file(corpus.name, f"{corpus.name}/files/0")
+        corpus_cache.forget_corpus(corpus.name)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(delete, corpora[:30]))
+
+    cache = corpus_cache.load_cache()
+    assert sorted(cache["corpora"]) == sorted(corpus.display_name for corpus in corpora[30:])
+    assert sorted(cache["files"]) == sorted(corpus.name for corpus in corpora[30:])
+    assert os.listdir(tmp_path) == [".corpus_cache.json"]
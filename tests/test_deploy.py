@@ -0,0 +1,138 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the fingerprint-based skip/update logic of deployment/deploy.py."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from deployment import deploy
+
+
+class FakeAgentEngines:
+    """Local stand-in for vertexai.agent_engines that records its calls."""
+
+    def __init__(self):
+        self.engines = {}
+        self.calls = []
+
+    def _engine(self, resource_name, description):
+        engine = SimpleNamespace(
+            resource_name=resource_name,
+            gca_resource=SimpleNamespace(description=description),
+        )
+        self.engines[resource_name] = engine
+        return engine
+
+    def get(self, resource_name):
+        self.calls.append(("get", resource_name))
+        if resource_name not in self.engines:
+            raise LookupError(resource_name)
+        return self.engines[resource_name]
+
+    def create(self, app, **kwargs):
+        self.calls.append(("create", kwargs["description"]))
+        return self._engine(f"engines/{len(self.engines) + 1}", kwargs["description"])
+
+    def update(self, resource_name, **kwargs):
+        self.calls.append(("update", resource_name))
+        return self._engine(resource_name, kwargs["description"])
+
+
+@pytest.fixture
+def package_dir(tmp_path):
+    (tmp_path / "agent.py").write_text("root_agent = None\n")
+    (tmp_path / "prompts.py").write_text("PROMPT = 'v1'\n")
+    return tmp_path
+
+
+def _deploy(engines, package_dir, agent_engine_id=None, **kwargs):
+    fingerprint = deploy.compute_fingerprint(package_dir=str(package_dir), config={})
+    return deploy.deploy(
+        engines,
+        agent_engine_id=agent_engine_id,
+        app_factory=lambda: object(),
+        fingerprint=fingerprint,
+        **kwargs,
+    )
+
+
+def test_fingerprint_changes_with_sources_requirements_and_config(package_dir):
+    base = deploy.compute_fingerprint(package_dir=str(package_dir), config={})
+    assert base == deploy.compute_fingerprint(package_dir=str(package_dir), config={})
+    assert base != deploy.compute_fingerprint(package_dir=str(package_dir), config={"x": 1})
+    assert base != deploy.compute_fingerprint(
+        package_dir=str(package_dir), requirements=["google-adk"], config={})
+
+    (package_dir / "__pycache__").mkdir()
+    (package_dir / "__pycache__" / "agent.cpython-311.pyc").write_bytes(b"bytecode")
+    assert base == deploy.compute_fingerprint(package_dir=str(package_dir), config={})
+
+    (package_dir / "prompts.py").write_text("PROMPT = 'v2'\n")
+    assert base != deploy.compute_fingerprint(package_dir=str(package_dir), config={})
+
+
+def test_first_deploy_creates_engine(package_dir):
+    engines = FakeAgentEngines()
+
+    action, resource_name, timings = _deploy(engines, package_dir)
+
+    assert action == "created"
+    assert deploy.read_fingerprint(engines.engines[resource_name]) is not None
+    assert {"fingerprint", "build", "deploy"} <= set(timings)
+
+
+def test_unchanged_fingerprint_skips_deploy(package_dir):
+    engines = FakeAgentEngines()
+    _, resource_name, _ = _deploy(engines, package_dir)
+    built = []
+
+    action, skipped_name, _ = deploy.deploy(
+        engines,
+        agent_engine_id=resource_name,
+        app_factory=lambda: built.append(True),
+        fingerprint=deploy.compute_fingerprint(package_dir=str(package_dir), config={}),
+    )
+
+    assert (action, skipped_name) == ("skipped", resource_name)
+    assert not built
+    assert [call[0] for call in engines.calls] == ["create", "get"]
+
+
+def test_changed_fingerprint_updates_in_place(package_dir):
+    engines = FakeAgentEngines()
+    _, resource_name, _ = _deploy(engines, package_dir)
+    (package_dir / "prompts.py").write_text("PROMPT = 'v2'\n")
+
+    action, updated_name, _ = _deploy(engines, package_dir, agent_engine_id=resource_name)
+
+    assert (action, updated_name) == ("updated", resource_name)
+    assert len(engines.engines) == 1
+
+
+def test_force_and_new_flags(package_dir):
+    engines = FakeAgentEngines()
+    _, resource_name, _ = _deploy(engines, package_dir)
+
+    assert _deploy(engines, package_dir, agent_engine_id=resource_name, force=True)[0] == "updated"
+    assert _deploy(engines, package_dir, agent_engine_id=resource_name, create_new=True)[0] == "created"
+
+
+def test_missing_engine_falls_back_to_create(package_dir):
+    engines = FakeAgentEngines()
+
+    action, _, _ = _deploy(engines, package_dir, agent_engine_id="engines/deleted")
+
+    assert action == "created"
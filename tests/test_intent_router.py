@@ -0,0 +1,89 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the local intent pre-router: rules, model, repeats and the round trips avoided."""
+
+from deployment import intent_router
+from deployment.agent import RAGAgent
+from deployment.events import TextAccumulator
+from deployment.stub_engine import StubAgentEngine
+from eval import intent_benchmark
+
+
+class CountingEngine(StubAgentEngine):
+    def __init__(self):
+        super().__init__(latency=0.0, jitter=0.0)
+        self.queries = []
+
+    def stream_query(self, user_id, session_id, message):
+        self.queries.append(message)
+        return super().stream_query(user_id, session_id, message)
+
+
+def test_rules_answer_small_talk_and_forward_questions():
+    assert intent_router.rule_intent("Hi, how are you?") == "greeting"
+    assert intent_router.rule_intent("Hello, how is it going today?") == "greeting"
+    assert intent_router.rule_intent("That covers my questions for now. Thanks!") == "thanks"
+    assert intent_router.rule_intent("Thanks, I got all the information I need. Goodbye!") == "goodbye"
+    for question in ["What type of Kahoot account do I have?", "Hi, what is my Netflix password hint?",
+                     "Thanks! Also, how do I log in to my bank account?", "Bye the way, what is my Zoom login?",
+                     "Good morning, how many are there?", "Thank you, what is it?"]:
+        assert intent_router.rule_intent(question) == intent_router.QUESTION
+    # Chunks appended by the retrieval prefetch are not part of the message
+    assert intent_router.rule_intent("Hello!\n\n<retrieved_context>\n[pwd.docx]\nKahoot: Teacher") == "greeting"
+
+
+def test_agent_answers_small_talk_and_repeats_locally():
+    engine = CountingEngine()
+    agent = RAGAgent(agent_engine=engine, router=intent_router.IntentRouter(repeat_ttl=60))
+
+    def ask(message, session_id=None):
+        answer = TextAccumulator()
+        for event in agent.stream_query(message, session_id=session_id):
+            answer.add(event)
+        return answer.answer
+
+    assert ask("Hi, how are you?") == intent_router.TEMPLATES["greeting"]
+    assert ask("What type of Kahoot account do I have?") == "Stub answer to: What type of Kahoot account do I have?"
+    assert ask("what type of kahoot account do I have") == "Stub answer to: What type of Kahoot account do I have?"
+    # Another session asks the agent again
+    ask("What type of Kahoot account do I have?", session_id="other")
+    assert ask("Thanks, I got all the information I need. Goodbye!") == intent_router.TEMPLATES["goodbye"]
+
+    assert engine.queries == ["What type of Kahoot account do I have?"] * 2
+    stats = agent.router.stats()
+    assert stats["answered"] == {"greeting": 1, "repeat": 1, "goodbye": 1}
+    assert (stats["forwarded"], stats["round_trips_avoided"], stats["avoided_rate"]) == (2, 3, 0.6)
+
+
+def test_repeats_are_forwarded_unless_enabled(monkeypatch):
+    monkeypatch.delenv("INTENT_REPEAT_TTL_SECONDS", raising=False)
+    engine = CountingEngine()
+    agent = RAGAgent(agent_engine=engine, router=intent_router.IntentRouter())
+    for _ in range(3):
+        list(agent.stream_query("What type of Kahoot account do I have?"))
+
+    assert len(engine.queries) == 3
+    assert agent.router.stats()["answered"] == {}
+    assert RAGAgent(agent_engine=engine, router=False).router is None
+
+
+def test_model_recognizes_small_talk_the_rules_forward():
+    labels = intent_benchmark.load_labels()
+    rules = intent_benchmark.evaluate(labels, intent_router.IntentRouter(repeat_ttl=0).classify)
+    model = intent_benchmark.evaluate(labels, intent_benchmark.leave_one_out(labels, 0.15))
+
+    assert rules["wrong"] == model["wrong"] == 0
+    assert model["avoided"] > rules["avoided"]
+    assert model["matrix"]["greeting"]["greeting"] == 8
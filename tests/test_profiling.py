@@ -0,0 +1,115 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the opt-in profiler: reports, hot spot timing and restoring the patched functions."""
+
+import json
+import sys
+import time
+import types
+
+import pytest
+
+from deployment.agent import RAGAgent
+from deployment.stub_engine import StubAgentEngine
+from rag.shared_libraries import profiling
+
+MODULE_NAME = "profiling_test_module"
+
+
+def _make_module():
+    module = types.ModuleType(MODULE_NAME)
+
+    def load(delay=0.01):
+        time.sleep(delay)
+        return "loaded"
+
+    def stream(count):
+        for i in range(count):
+            time.sleep(0.001)
+            yield i
+
+    class Store:
+        def save(self, value):
+            return value * 2
+
+    module.load = load
+    module.stream = stream
+    module.Store = Store
+    return module
+
+
+@pytest.fixture
+def hot_module(monkeypatch):
+    module = _make_module()
+    monkeypatch.setitem(sys.modules, MODULE_NAME, module)
+    monkeypatch.setitem(profiling.HOT_SPOTS, MODULE_NAME, ["load", "stream", "Store.save", "missing"])
+    return module
+
+
+def test_profiler_writes_reports(tmp_path, hot_module):
+    with profiling.Profiler("toy", str(tmp_path), sample_ms=1):
+        hot_module.load()
+        assert list(hot_module.stream(3)) == [0, 1, 2]
+        assert hot_module.Store().save(2) == 4
+    files = sorted(path.suffix for path in tmp_path.iterdir())
+    assert files == [".collapsed", ".json", ".pstats", ".txt"]
+
+    report = json.loads(next(tmp_path.glob("*.hotspots.json")).read_text())
+    hot_spots = report["hot_spots"]
+    assert hot_spots[f"{MODULE_NAME}.load"]["calls"] == 1
+    assert hot_spots[f"{MODULE_NAME}.load"]["total"] >= 0.01
+    assert hot_spots[f"{MODULE_NAME}.stream"]["total"] >= 0.003
+    assert hot_spots[f"{MODULE_NAME}.Store.save"]["calls"] == 1
+    assert "MainThread" in next(tmp_path.glob("*.collapsed")).read_text()
+
+
+def test_profiler_restores_hot_spots_and_imported_copies(tmp_path, hot_module, monkeypatch):
+    original_load = hot_module.load
+    original_save = hot_module.Store.save
+    importer = types.ModuleType("profiling_test_importer")
+    importer.load = original_load  # like `from profiling_test_module import load`
+    monkeypatch.setitem(sys.modules, importer.__name__, importer)
+
+    with profiling.Profiler("toy", str(tmp_path), memory=False):
+        assert hot_module.load is not original_load
+        assert importer.load is hot_module.load
+        importer.load(0)
+
+    assert hot_module.load is original_load
+    assert importer.load is original_load
+    assert hot_module.Store.save is original_save
+    assert not any(isinstance(finder, profiling._HotSpotFinder) for finder in sys.meta_path)
+
+
+def test_run_without_profile_calls_main(tmp_path, monkeypatch):
+    monkeypatch.delenv("PROFILE", raising=False)
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    assert profiling.run("toy", lambda value: value + 1, 1) == 2
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setenv("PROFILE", "1")
+    assert profiling.run("toy", lambda value: value + 1, 1) == 2
+    assert any(path.name.endswith(".hotspots.json") for path in tmp_path.iterdir())
+
+
+def test_streams_returned_by_hot_spots_are_timed_until_exhausted(tmp_path):
+    agent = RAGAgent(agent_engine=StubAgentEngine(latency=0.1, jitter=0.0), router=False)
+
+    with profiling.Profiler("toy", str(tmp_path), memory=False):
+        events = agent.stream_query("What type of Kahoot account do I have?")
+        assert len(list(events)) == 3
+
+    report = json.loads(next(tmp_path.glob("*.hotspots.json")).read_text())
+    assert report["hot_spots"]["deployment.agent.RAGAgent.stream_query"]["total"] >= 0.1
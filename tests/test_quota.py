@@ -0,0 +1,118 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the shared quota scheduler: token buckets, priorities, shared state and 429 backoff."""
+
+import threading
+import time
+
+import pytest
+
+from rag.shared_libraries import quota
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return str(tmp_path / "quota_state.json")
+
+
+def test_bucket_spaces_calls_after_burst(state_file):
+    scheduler = quota.Scheduler({"rag": 600}, burst=2, state_file=state_file)
+    waits = [scheduler.acquire("rag") for _ in range(4)]
+    assert waits[0] < 0.05 and waits[1] < 0.05
+    # 600 per minute is one token every 0.1s once the burst is spent
+    assert sum(waits[2:]) >= 0.15
+    assert scheduler.metrics()["calls"]["rag/batch"]["calls"] == 4
+
+
+def test_unlimited_resource_does_not_touch_state(state_file):
+    scheduler = quota.Scheduler({"rag": 0}, state_file=state_file)
+    assert scheduler.call("rag", lambda: "ok") == "ok"
+    assert scheduler.acquire("rag") == 0.0
+
+
+def test_schedulers_sharing_a_state_file_share_the_bucket(state_file):
+    gui = quota.Scheduler({"gemini": 300}, burst=1, state_file=state_file)
+    sync = quota.Scheduler({"gemini": 300}, burst=1, state_file=state_file)
+    assert gui.acquire("gemini") < 0.05
+    # The only token was taken by the other "process"; the next one is 0.2s away
+    assert sync.acquire("gemini") >= 0.1
+
+
+def test_interactive_callers_go_before_waiting_background_callers(state_file):
+    scheduler = quota.Scheduler({"gemini": 240}, burst=1, state_file=state_file)
+    scheduler.acquire("gemini")
+    order = []
+
+    def caller(priority):
+        scheduler.acquire("gemini", priority)
+        order.append(quota.priority_value(priority))
+
+    background = [threading.Thread(target=caller, args=(quota.BATCH,)) for _ in range(2)]
+    for thread in background:
+        thread.start()
+    time.sleep(0.05)
+    queue = scheduler.queue()["gemini"]["waiting"]
+    assert queue["batch"] == 2
+    interactive = threading.Thread(target=caller, args=("interactive",))
+    interactive.start()
+    for thread in background + [interactive]:
+        thread.join()
+
+    assert order == [quota.INTERACTIVE, quota.BATCH, quota.BATCH]
+    assert scheduler.queue()["gemini"]["waiting"] == {"interactive": 0, "sync": 0, "batch": 0}
+
+
+def test_quota_errors_back_off_and_retry(state_file, monkeypatch):
+    monkeypatch.setattr(quota, "BACKOFF_INITIAL_SECONDS", 0.05)
+    scheduler = quota.Scheduler({"rag": 6000}, state_file=state_file)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RuntimeError("429 Resource exhausted")
+        return "ok"
+
+    assert scheduler.call("rag", flaky) == "ok"
+    assert attempts[1] - attempts[0] >= 0.03
+    assert scheduler.metrics()["calls"]["rag/batch"]["throttled"] == 1
+
+    with pytest.raises(ValueError):
+        scheduler.call("rag", lambda: (_ for _ in ()).throw(ValueError("not a quota error")))
+
+
+def test_stream_retries_only_before_the_first_item(state_file, monkeypatch):
+    monkeypatch.setattr(quota, "BACKOFF_INITIAL_SECONDS", 0.01)
+    scheduler = quota.Scheduler({"gemini": 6000}, state_file=state_file)
+    calls = []
+
+    def events(fail_after):
+        calls.append(fail_after)
+        if len(calls) == 1:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        yield "first"
+        if fail_after:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        yield "second"
+
+    with quota.priority(quota.INTERACTIVE):
+        stream = scheduler.stream("gemini", events, False)
+    assert list(stream) == ["first", "second"]
+    assert "gemini/interactive" in scheduler.metrics()["calls"]
+
+    calls.clear()
+    calls.append("already failed once")
+    with pytest.raises(RuntimeError):
+        list(scheduler.stream("gemini", events, True))
@@ -0,0 +1,99 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the speculative retrieval of ChatApp drafts: matching, cancellation and statistics."""
+
+import threading
+import time
+
+from app import ChatApp
+from retrieval_prefetch import CONTEXT_START, Prefetcher, with_context
+from thread_store import ThreadStore
+
+
+class SlowRetriever:
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.queries = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, query):
+        self.queries.append(query)
+        self.release.wait(5)
+        time.sleep(self.latency)
+        return [{"text": f"chunk for {query}", "source": "pwd.docx", "distance": 0.2}]
+
+
+def test_close_message_reuses_the_prefetched_draft():
+    retriever = SlowRetriever()
+    prefetcher = Prefetcher(retriever, ttl=60, min_similarity=0.6)
+    assert prefetcher.draft_changed("What type of Kahoot account do I have")
+    # A close enough draft does not start another retrieval
+    assert not prefetcher.draft_changed("What type of Kahoot account do I have?")
+
+    contexts = prefetcher.take("what type of kahoot account do i have please")
+    assert contexts == [{"text": "chunk for What type of Kahoot account do I have", "source": "pwd.docx",
+                         "distance": 0.2}]
+    assert prefetcher.take("How can I login Cursor AI") is None
+    stats = prefetcher.stats()
+    assert (stats["prefetches"], stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+    assert retriever.queries == ["What type of Kahoot account do I have"]
+
+
+def test_significant_edit_cancels_the_prefetch_in_flight():
+    retriever = SlowRetriever()
+    retriever.release.clear()
+    prefetcher = Prefetcher(retriever, ttl=60)
+    prefetcher.draft_changed("What type of Kahoot account")
+    while not retriever.queries:
+        time.sleep(0.01)
+    prefetcher.draft_changed("My last four digits of SIN")
+    prefetcher.draft_changed("How can I login Cursor AI")
+    retriever.release.set()
+
+    assert prefetcher.take("How can I login Cursor AI") is not None
+    assert prefetcher.take("What type of Kahoot account") is None
+    assert prefetcher.stats()["cancelled"] == 2
+    # The first retrieval was already running; the queued second one never ran
+    assert retriever.queries == ["What type of Kahoot account", "How can I login Cursor AI"]
+
+
+def test_saved_time_and_expiry():
+    prefetcher = Prefetcher(SlowRetriever(latency=0.1), ttl=0.2)
+    prefetcher.draft_changed("What type of Kahoot account")
+    time.sleep(0.15)
+    assert prefetcher.take("What type of Kahoot account") is not None
+    assert prefetcher.stats()["saved_seconds"] >= 0.05
+
+    time.sleep(0.25)
+    assert prefetcher.take("What type of Kahoot account") is None
+
+
+def test_with_context_appends_the_chunks():
+    message = with_context("Kahoot account?", [{"text": "Kahoot: Teacher", "source": "pwd.docx"}])
+    assert message.startswith("Kahoot account?\n\n" + CONTEXT_START)
+    assert "[pwd.docx]\nKahoot: Teacher" in message
+
+
+def test_chat_server_clients_do_not_prefetch(tmp_path, monkeypatch):
+    monkeypatch.setenv("PREFETCH_RETRIEVAL", "1")
+    monkeypatch.delenv("CHAT_SERVER_URL", raising=False)
+    app = ChatApp(None, store=ThreadStore(str(tmp_path)), build_ui=False)
+    assert app.prefetcher is not None
+    app.prefetcher.close()
+
+    # The prefetch would retrieve with local Vertex AI credentials
+    monkeypatch.setenv("CHAT_SERVER_URL", "http://127.0.0.1:8765")
+    assert ChatApp(None, store=ThreadStore(str(tmp_path)), build_ui=False).prefetcher is None
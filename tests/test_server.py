@@ -0,0 +1,172 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the chat server, its session pool and the thin clients used by ChatApp."""
+
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import WebSocketDisconnect  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from deployment.agent import RAGAgent  # noqa: E402
+from deployment.client import RemoteRAGAgent, RemoteThreadStore  # noqa: E402
+from deployment.server import ChatServer, SessionPool, create_app  # noqa: E402
+from deployment.stub_engine import StubAgentEngine  # noqa: E402
+
+
+class CountingEngine(StubAgentEngine):
+    def __init__(self):
+        super().__init__(latency=0.0, jitter=0.0)
+        self.sessions = []
+        self.queries = []
+
+    def create_session(self, user_id):
+        session = super().create_session(user_id)
+        self.sessions.append(session["id"])
+        return session
+
+    def stream_query(self, user_id, session_id, message):
+        self.queries.append((session_id, message))
+        return super().stream_query(user_id, session_id, message)
+
+
+@pytest.fixture
+def engine():
+    return CountingEngine()
+
+
+@pytest.fixture
+def client(engine, tmp_path):
+    server = ChatServer(lambda: RAGAgent(agent_engine=engine), str(tmp_path / "threads"), pool_size=2)
+    with TestClient(create_app(server, token="")) as test_client:
+        yield test_client
+
+
+def _records(response):
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def test_query_streams_events_and_answer(client, engine):
+    with client.stream("POST", "/query", json={"message": "kahoot?", "thread": "t1"}) as response:
+        records = _records(response)
+    assert [r for r in records if "event" in r][0]["event"]["content"]["parts"][0]["functionCall"]
+    assert records[-1]["done"] and records[-1]["answer"] == "Stub answer to: kahoot?"
+
+    health = client.get("/health").json()
+    assert health["ready"] and health["queries"] == 1
+    assert health["sessions"]["hits"] == 1
+
+
+def test_threads_keep_their_session(client, engine):
+    for thread in ("a", "b", "a"):
+        client.post("/query", json={"message": f"hi {thread}", "thread": thread}).read()
+    sessions = [session_id for session_id, _ in engine.queries]
+    assert sessions[0] == sessions[2] != sessions[1]
+    # RAGAgent's own session plus the warm pool, refilled in the background
+    assert len(engine.sessions) >= 3
+
+
+def test_websocket_serves_several_queries(client):
+    with client.websocket_connect("/ws") as websocket:
+        for message in ("first", "second"):
+            websocket.send_json({"message": message, "thread": "ws"})
+            while True:
+                record = websocket.receive_json()
+                if record.get("done"):
+                    break
+            assert record["answer"] == f"Stub answer to: {message}"
+        websocket.send_json({})
+        assert "error" in websocket.receive_json()
+        # A malformed frame does not close the connection
+        websocket.send_text("not json")
+        assert "error" in websocket.receive_json()
+        websocket.send_bytes(b"\x00")
+        assert "error" in websocket.receive_json()
+        websocket.send_json({"message": "third"})
+        while not (record := websocket.receive_json()).get("done"):
+            pass
+        assert record["answer"] == "Stub answer to: third"
+
+
+def test_thread_store_api(client):
+    messages = [{"author": "user", "message": "hello"}]
+    assert client.put("/threads/2025-01-01 10_00_00", json={"messages": messages}).status_code == 200
+    assert client.get("/threads").json()["threads"] == {"2025-01-01 10_00_00": messages}
+    assert client.get("/threads/2025-01-01 10_00_00").json()["messages"] == messages
+    assert client.delete("/threads/2025-01-01 10_00_00").status_code == 200
+    assert client.get("/threads/2025-01-01 10_00_00").status_code == 404
+
+
+def test_token_is_required_when_configured(engine, tmp_path):
+    server = ChatServer(lambda: RAGAgent(agent_engine=engine), str(tmp_path), pool_size=0)
+    with TestClient(create_app(server, token="secret")) as test_client:
+        assert test_client.get("/health").status_code == 401
+        assert test_client.get("/health", headers={"Authorization": "Bearer secret"}).status_code == 200
+        with pytest.raises(WebSocketDisconnect):
+            with test_client.websocket_connect("/ws") as websocket:
+                websocket.receive_json()
+        with test_client.websocket_connect("/ws?token=secret") as websocket:
+            websocket.send_json({"message": "hi"})
+            assert "event" in websocket.receive_json()
+
+
+def test_session_pool_refills_after_binding(engine):
+    agent = RAGAgent(agent_engine=engine)
+    pool = SessionPool(agent, size=2)
+    pool.fill()
+    first = pool.session_id("t")
+    assert pool.session_id("t") == first
+    assert pool.session_id(None) is None
+    deadline = time.monotonic() + 2
+    while pool.stats()["warm"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.stats() == {"warm": 2, "bound": 1, "hits": 1, "misses": 0}
+    pool.close()
+
+
+def test_remote_clients_against_a_running_server(engine, tmp_path):
+    uvicorn = pytest.importorskip("uvicorn")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = ChatServer(lambda: RAGAgent(agent_engine=engine), str(tmp_path), pool_size=1)
+    http_server = uvicorn.Server(uvicorn.Config(create_app(server, token=""), port=port, log_level="warning"))
+    thread = threading.Thread(target=http_server.run, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not http_server.started and time.monotonic() < deadline:
+            time.sleep(0.05)
+        url = f"http://127.0.0.1:{port}"
+        agent = RemoteRAGAgent(url)
+        texts = [agent.get_agent_text_from_event(e) for e in agent.stream_query("hi", thread="2025 x")]
+        assert texts[-1] == "Stub answer to: hi"
+
+        store = RemoteThreadStore(url)
+        store.save("2025-01-01 10:00:00", [{"author": "user", "message": "hi"}])
+        threads, archived = store.load()
+        assert list(threads) == ["2025-01-01 10:00:00"] and archived == {}
+        store.delete("2025-01-01 10:00:00")
+        assert store.load() == ({}, {})
+    finally:
+        http_server.should_exit = True
+        thread.join(timeout=10)
@@ -0,0 +1,105 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the shard configuration, routing and fan-out/merge of sharded retrieval."""
+
+import pickle
+import time
+
+import pytest
+
+from rag.shared_libraries import sharding
+from rag.shared_libraries.sharding import Shard, ShardedRetriever
+
+SHARDS = [Shard("hints", "corpora/1"), Shard("manuals", "corpora/2"), Shard("slow", "corpora/3")]
+
+
+def fake_query(results, delays=None, failing=()):
+    def query_shard(shard, query, top_k, threshold):
+        time.sleep((delays or {}).get(shard.name, 0))
+        if shard.name in failing:
+            raise RuntimeError("429 Resource exhausted")
+        return [c for c in results.get(shard.name, []) if c["distance"] <= threshold][:top_k]
+    return query_shard
+
+
+def contexts(shard, *distances):
+    return [{"text": f"{shard} {d}", "source": f"{shard}.pdf", "distance": d} for d in distances]
+
+
+def test_parse_and_format_shards():
+    value = "hints=projects/1/locations/l/ragCorpora/1, manuals=projects/1/locations/l/ragCorpora/2"
+    shards = sharding.parse_shards(value)
+
+    assert [shard.name for shard in shards] == ["hints", "manuals"]
+    assert sharding.parse_shards(sharding.format_shards(shards)) == shards
+    with pytest.raises(ValueError):
+        sharding.parse_shards("projects/1/locations/l/ragCorpora/1")
+
+
+def test_load_shards_falls_back_to_rag_corpus(monkeypatch):
+    monkeypatch.delenv("RAG_CORPUS_SHARDS", raising=False)
+    monkeypatch.setenv("RAG_CORPUS", "corpora/9")
+
+    assert sharding.load_shards() == [Shard(sharding.DEFAULT_SHARD, "corpora/9")]
+
+
+def test_route_document():
+    routes = sharding.parse_routes("hints:*pwd*;*password*, manuals:*.pdf")
+
+    assert sharding.route_document("data/Pwd_Hints.docx", routes) == "hints"
+    assert sharding.route_document("/tmp/guide.PDF", routes) == "manuals"
+    # Unmatched documents go to the first shard
+    assert sharding.route_document("notes.txt", routes) == "hints"
+
+
+def test_retrieve_merges_shards_by_distance():
+    retriever = ShardedRetriever(SHARDS, top_k=3, distance_threshold=0.6, query_shard=fake_query({
+        "hints": contexts("hints", 0.1, 0.5),
+        "manuals": contexts("manuals", 0.2, 0.3, 0.7),
+        "slow": contexts("slow", 0.4),
+    }))
+
+    results = retriever.retrieve("question")
+
+    assert [(c["shard"], c["distance"]) for c in results] == [("hints", 0.1), ("manuals", 0.2), ("manuals", 0.3)]
+    assert {e["shard"]: e["results"] for e in retriever.last_report} == {"hints": 2, "manuals": 2, "slow": 1}
+    assert all(e["status"] == "ok" and e["latency"] is not None for e in retriever.last_report)
+
+
+def test_slow_and_failing_shards_are_skipped():
+    retriever = ShardedRetriever(SHARDS, timeout=0.2, query_shard=fake_query(
+        {"hints": contexts("hints", 0.3), "slow": contexts("slow", 0.1)},
+        delays={"slow": 1.0},
+        failing=("manuals",),
+    ))
+
+    started = time.perf_counter()
+    results = retriever.retrieve("question")
+
+    assert time.perf_counter() - started < 0.9
+    assert [c["shard"] for c in results] == ["hints"]
+    assert {e["shard"]: e["status"] for e in retriever.last_report} == {
+        "hints": "ok", "manuals": "error", "slow": "timeout"}
+
+
+def test_retriever_is_picklable_after_use():
+    # The agent, and with it the retriever, is pickled when it is deployed
+    retriever = ShardedRetriever(SHARDS[:1])
+    retriever.executor.submit(time.sleep, 0).result()
+
+    restored = pickle.loads(pickle.dumps(retriever))
+
+    assert restored.shards == SHARDS[:1]
+    assert restored._executor is None
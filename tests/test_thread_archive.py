@@ -0,0 +1,189 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the thread history archive and retention tier."""
+
+import json
+import os
+import time
+
+import pytest
+
+import thread_archive
+from app import ChatApp
+from thread_store import ThreadStore
+
+from .fakes import FakeListbox, FakeText
+
+DAY = 86400
+
+
+def write_thread(thread_dir, title, messages, age_days):
+    path = os.path.join(thread_dir, f"{title}.json")
+    with open(path, "w") as f:
+        json.dump(messages, f, indent=4)
+    modified = time.time() - age_days * DAY
+    os.utime(path, (modified, modified))
+
+
+def messages(count, text="hint for account"):
+    return [{"author": "user", "message": f"{text} {i}"} for i in range(count)]
+
+
+@pytest.fixture
+def history(tmp_path):
+    thread_dir = str(tmp_path)
+    write_thread(thread_dir, "2024-01-01 10_00_00", messages(50, "kahoot login"), age_days=400)
+    write_thread(thread_dir, "2024-06-01 10_00_00", messages(50), age_days=100)
+    write_thread(thread_dir, "2025-01-01 10_00_00", messages(5), age_days=1)
+    return thread_dir
+
+
+def test_archive_moves_old_threads_into_a_bundle(history):
+    stats = thread_archive.archive_threads(history, older_than_days=30)
+
+    assert (stats["archived"], stats["bundles"]) == (2, 1)
+    threads, index = thread_archive.load_threads(history)
+    assert list(threads) == ["2025-01-01 10_00_00"]
+    assert sorted(index) == ["2024-01-01 10_00_00", "2024-06-01 10_00_00"]
+    assert index["2024-01-01 10_00_00"]["first_message"] == "kahoot login 0"
+    assert thread_archive.read_thread(history, "2024-01-01 10_00_00") == messages(50, "kahoot login")
+
+
+def test_dry_run_changes_nothing(history):
+    before = sorted(os.listdir(history))
+
+    assert thread_archive.archive_threads(history, older_than_days=30, dry_run=True)["archived"] == 2
+    assert thread_archive.apply_retention(history, retention_days=30, dry_run=True)["evicted"] == 2
+    assert sorted(os.listdir(history)) == before
+
+
+def test_search_covers_live_and_archived_threads(history):
+    thread_archive.archive_threads(history, older_than_days=30)
+
+    hits = list(thread_archive.search(history, "KAHOOT login 4"))
+
+    assert {(title, archived) for title, archived, _ in hits} == {("2024-01-01 10_00_00", True)}
+
+
+def test_retention_evicts_oldest_first_and_compacts_bundles(history):
+    thread_archive.archive_threads(history, older_than_days=30)
+
+    stats = thread_archive.apply_retention(history, retention_days=365)
+
+    assert stats["evicted"] == 1
+    threads, index = thread_archive.load_threads(history)
+    assert sorted(index) == ["2024-06-01 10_00_00"]
+    assert thread_archive.read_bundle(history, index["2024-06-01 10_00_00"]["bundle"]).keys() == {"2024-06-01 10_00_00"}
+    assert len(thread_archive._bundle_files(history)) == 1
+
+
+def test_size_cap_keeps_the_newest_threads(history):
+    thread_archive.archive_threads(history, older_than_days=30)
+    newest_size = os.path.getsize(os.path.join(history, "2025-01-01 10_00_00.json"))
+
+    thread_archive.apply_retention(history, max_bytes=newest_size)
+
+    threads, index = thread_archive.load_threads(history)
+    assert list(threads) == ["2025-01-01 10_00_00"]
+    assert index == {}
+    assert thread_archive._bundle_files(history) == []
+
+
+def test_forgotten_threads_are_dropped_on_compaction(history):
+    thread_archive.archive_threads(history, older_than_days=30)
+    thread_archive.forget(history, "2024-01-01 10_00_00")
+
+    thread_archive.compact_bundles(history)
+
+    index = thread_archive.load_index(history)
+    assert thread_archive.read_bundle(history, index["2024-06-01 10_00_00"]["bundle"]).keys() == {"2024-06-01 10_00_00"}
+
+
+def test_retention_counts_a_thread_both_live_and_archived_once(history):
+    thread_archive.archive_threads(history, older_than_days=30)
+    # The state an interrupted archive run leaves behind: the live file is still there
+    title = "2024-06-01 10_00_00"
+    modified = thread_archive.load_index(history)[title]["modified"]
+    write_thread(history, title, messages(50), age_days=0)
+    os.utime(os.path.join(history, f"{title}.json"), (modified, modified))
+
+    stats = thread_archive.apply_retention(history, retention_days=30)
+
+    assert stats["evicted"] == 2
+    threads, index = thread_archive.load_threads(history)
+    assert list(threads) == ["2025-01-01 10_00_00"]
+    assert index == {}
+
+
+def test_corrupt_index_loads_as_empty(history):
+    thread_archive.archive_threads(history, older_than_days=30)
+    with open(os.path.join(thread_archive.archive_dir(history), thread_archive.INDEX_FILE_NAME), "w") as f:
+        f.write('{"version": 1, "thre')
+
+    threads, index = thread_archive.load_threads(history)
+
+    assert list(threads) == ["2025-01-01 10_00_00"]
+    assert index == {}
+
+
+def headless_app(thread_dir, monkeypatch):
+    monkeypatch.delenv("CHAT_SERVER_URL", raising=False)
+    monkeypatch.delenv("PREFETCH_RETRIEVAL", raising=False)
+    app = ChatApp(None, thread_dir=thread_dir, store=ThreadStore(thread_dir), build_ui=False)
+    app.thread_list, app.chat_display = FakeListbox(), FakeText()
+    app.load_threads()
+    app.update_thread_list()
+    return app
+
+
+def test_open_archived_thread_in_the_app(history, monkeypatch):
+    thread_archive.archive_threads(history, older_than_days=30)
+    title = "2024-06-01 10_00_00"
+    app = headless_app(history, monkeypatch)
+
+    # Threads are listed oldest first
+    app.thread_list.selection_set(1)
+    app.select_thread(None)
+
+    assert app.current_thread == title
+    assert app.threads[title] == messages(50)
+    # Viewing keeps the thread archived, adding a message makes it live again
+    app.save_thread(title)
+    assert title in thread_archive.load_index(history)
+    app.display_message("user", "One more question")
+    assert title not in thread_archive.load_index(history)
+    assert os.path.exists(os.path.join(history, f"{title}.json"))
+
+
+def test_unreadable_bundle_is_reported_in_the_app(history, monkeypatch):
+    thread_archive.archive_threads(history, older_than_days=30)
+    # A zstd bundle where zstandard is not installed
+    monkeypatch.setattr(thread_archive, "zstandard", None)
+    index = thread_archive.load_index(history)
+    bundle = index["2024-01-01 10_00_00"]["bundle"]
+    os.rename(os.path.join(thread_archive.archive_dir(history), bundle),
+              os.path.join(thread_archive.archive_dir(history), bundle.replace(".gz", ".zst")))
+    for entry in index.values():
+        entry["bundle"] = bundle.replace(".gz", ".zst")
+    thread_archive.save_index(history, index)
+    errors = []
+    monkeypatch.setattr("app.messagebox.showerror", lambda title, message: errors.append(message))
+    app = headless_app(history, monkeypatch)
+
+    app.thread_list.selection_set(0)
+    app.select_thread(None)
+
+    assert app.current_thread is None
+    assert len(errors) == 1 and "--extras archive" in errors[0]
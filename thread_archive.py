@@ -0,0 +1,359 @@
+"""Archive and retention tier for the chat thread history.
+
+Threads in thread_history/ that were not modified for a number of days are
+moved into compressed bundles under thread_history/archive/ (zstd when the
+zstandard package is installed, gzip otherwise). archive/index.json keeps the
+first message, size and modification time of every archived thread, so the
+GUI lists archived threads without decompressing anything and only opens a
+bundle when one of its threads is selected.
+
+A retention period and a size cap can be enforced as well. Both evict the
+least recently modified threads first, archived or not.
+
+Usage:
+    python thread_archive.py --archive-after-days 30 --max-mb 50
+    python thread_archive.py --retention-days 365 --dry-run
+    python thread_archive.py --search "kahoot"
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+import uuid
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+THREAD_DIR = "thread_history"
+ARCHIVE_DIR_NAME = "archive"
+INDEX_FILE_NAME = "index.json"
+DEFAULT_ARCHIVE_AFTER_DAYS = 30
+# Uncompressed size of a bundle; opening an archived thread decompresses its whole bundle
+BUNDLE_MAX_BYTES = 4 * 1024 * 1024
+PREVIEW_LENGTH = 50
+
+
+def archive_dir(thread_dir):
+    return os.path.join(thread_dir, ARCHIVE_DIR_NAME)
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_index(thread_dir):
+    """Returns {title: entry} for the archived threads."""
+    try:
+        with open(os.path.join(archive_dir(thread_dir), INDEX_FILE_NAME), "r") as f:
+            return json.load(f)["threads"]
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError) as e:
+        print(f"Ignoring unreadable archive index in {archive_dir(thread_dir)}: {e}")
+        return {}
+
+
+def save_index(thread_dir, index):
+    os.makedirs(archive_dir(thread_dir), exist_ok=True)
+    data = json.dumps({"version": 1, "threads": index}, separators=(",", ":")).encode("utf-8")
+    _write_atomic(os.path.join(archive_dir(thread_dir), INDEX_FILE_NAME), data)
+
+
+def bundle_extension():
+    return ".json.zst" if zstandard is not None else ".json.gz"
+
+
+def write_bundle(thread_dir, threads):
+    """Writes {title: messages} to a new compressed bundle and returns its file name."""
+    name = f"bundle-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}{bundle_extension()}"
+    data = json.dumps(threads, separators=(",", ":")).encode("utf-8")
+    if name.endswith(".zst"):
+        data = zstandard.ZstdCompressor(level=10).compress(data)
+    else:
+        data = gzip.compress(data, compresslevel=9)
+    os.makedirs(archive_dir(thread_dir), exist_ok=True)
+    _write_atomic(os.path.join(archive_dir(thread_dir), name), data)
+    return name
+
+
+def read_bundle(thread_dir, name):
+    with open(os.path.join(archive_dir(thread_dir), name), "rb") as f:
+        data = f.read()
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{name} is zstd compressed; install zstandard to open it")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+def read_thread(thread_dir, title, index=None):
+    """Returns the messages of an archived thread."""
+    if index is None:
+        index = load_index(thread_dir)
+    return read_bundle(thread_dir, index[title]["bundle"])[title]
+
+
+def first_message(messages):
+    return messages[0]["message"][:PREVIEW_LENGTH] if messages else "No messages"
+
+
+def load_threads(thread_dir):
+    """Loads the live threads and the archive index, as done when the GUI starts."""
+    threads = {}
+    for file_name in os.listdir(thread_dir):
+        if file_name.endswith(".json"):
+            with open(os.path.join(thread_dir, file_name), "r") as file:
+                thread_data = json.load(file)
+                threads[file_name[:-5]] = thread_data
+    return threads, load_index(thread_dir)
+
+
+def forget(thread_dir, title, index=None):
+    """Drops a thread from the archive index; its bundle is compacted on the next maintenance run."""
+    if index is None:
+        index = load_index(thread_dir)
+    if index.pop(title, None) is not None:
+        save_index(thread_dir, index)
+
+
+def _live_threads(thread_dir):
+    """Yields (title, path, mtime, size) of the live thread files."""
+    with os.scandir(thread_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                yield entry.name[:-5], entry.path, stat.st_mtime, stat.st_size
+
+
+def _bundle_files(thread_dir):
+    if not os.path.isdir(archive_dir(thread_dir)):
+        return []
+    return [
+        name for name in os.listdir(archive_dir(thread_dir))
+        if name.startswith("bundle-") and name.endswith((".json.gz", ".json.zst"))
+    ]
+
+
+def archive_threads(thread_dir, older_than_days=DEFAULT_ARCHIVE_AFTER_DAYS, dry_run=False, now=None):
+    """Moves threads not modified for older_than_days into compressed bundles.
+
+    The bundles and the index are written before the live files are removed,
+    so an interrupted run leaves at worst a thread both live and archived, in
+    which case the live copy wins.
+    """
+    cutoff = (now or time.time()) - older_than_days * 86400
+    candidates = sorted(
+        (mtime, title, path, size)
+        for title, path, mtime, size in _live_threads(thread_dir)
+        if mtime < cutoff
+    )
+    stats = {"archived": len(candidates), "bytes": sum(c[3] for c in candidates), "bundles": 0}
+    if dry_run or not candidates:
+        return stats
+
+    index = load_index(thread_dir)
+    bundle, bundle_bytes, entries = {}, 0, {}
+
+    def flush():
+        name = write_bundle(thread_dir, bundle)
+        for title, entry in entries.items():
+            entry["bundle"] = name
+            index[title] = entry
+        stats["bundles"] += 1
+
+    for mtime, title, path, size in candidates:
+        with open(path, "r") as f:
+            messages = json.load(f)
+        raw_bytes = len(json.dumps(messages, separators=(",", ":")))
+        if bundle and bundle_bytes + raw_bytes > BUNDLE_MAX_BYTES:
+            flush()
+            bundle, bundle_bytes, entries = {}, 0, {}
+        bundle[title] = messages
+        bundle_bytes += raw_bytes
+        entries[title] = {
+            "first_message": first_message(messages),
+            "messages": len(messages),
+            "bytes": raw_bytes,
+            "modified": mtime,
+        }
+    if bundle:
+        flush()
+    save_index(thread_dir, index)
+    for _, _, path, _ in candidates:
+        os.remove(path)
+    compact_bundles(thread_dir, index)
+    return stats
+
+
+def compact_bundles(thread_dir, index=None):
+    """Deletes bundles no thread refers to and rewrites bundles holding dropped threads."""
+    if index is None:
+        index = load_index(thread_dir)
+    referenced = {}
+    for title, entry in index.items():
+        referenced.setdefault(entry["bundle"], set()).add(title)
+    removed = 0
+    for name in _bundle_files(thread_dir):
+        keep = referenced.get(name)
+        path = os.path.join(archive_dir(thread_dir), name)
+        if not keep:
+            os.remove(path)
+            removed += 1
+            continue
+        threads = read_bundle(thread_dir, name)
+        if set(threads) != keep:
+            new_name = write_bundle(thread_dir, {title: threads[title] for title in keep})
+            for title in keep:
+                index[title]["bundle"] = new_name
+            save_index(thread_dir, index)
+            os.remove(path)
+    return removed
+
+
+def _archived_sizes(thread_dir, index):
+    """Estimates the disk size of every archived thread: its share of the bundle and of the index."""
+    index_path = os.path.join(archive_dir(thread_dir), INDEX_FILE_NAME)
+    index_share = os.path.getsize(index_path) / len(index) if index else 0
+    raw_per_bundle = {}
+    for entry in index.values():
+        raw_per_bundle[entry["bundle"]] = raw_per_bundle.get(entry["bundle"], 0) + entry["bytes"]
+    sizes = {}
+    for title, entry in index.items():
+        path = os.path.join(archive_dir(thread_dir), entry["bundle"])
+        bundle_size = os.path.getsize(path) if os.path.exists(path) else 0
+        sizes[title] = bundle_size * entry["bytes"] / max(1, raw_per_bundle[entry["bundle"]]) + index_share
+    return sizes
+
+
+def apply_retention(thread_dir, retention_days=None, max_bytes=None, dry_run=False, now=None):
+    """Evicts threads older than retention_days, then the oldest until under max_bytes."""
+    index = load_index(thread_dir)
+    archived_sizes = _archived_sizes(thread_dir, index)
+    threads = [(mtime, title, path, size) for title, path, mtime, size in _live_threads(thread_dir)]
+    live = {thread[1] for thread in threads}
+    # A thread left both live and archived by an interrupted archive run is live (as in ThreadStore.load)
+    threads += [
+        (entry["modified"], title, None, archived_sizes[title])
+        for title, entry in index.items() if title not in live
+    ]
+    threads.sort(key=lambda t: (t[0], t[1]))
+
+    evicted = []
+    total = sum(t[3] for t in threads)
+    cutoff = (now or time.time()) - retention_days * 86400 if retention_days is not None else None
+    for thread in threads:
+        too_old = cutoff is not None and thread[0] < cutoff
+        too_big = max_bytes is not None and total > max_bytes
+        if not (too_old or too_big):
+            break
+        evicted.append(thread)
+        total -= thread[3]
+
+    stats = {"evicted": len(evicted), "bytes": sum(t[3] for t in evicted)}
+    if dry_run or not evicted:
+        return stats
+    for _, title, path, _ in evicted:
+        # Also drops the archived copy of an evicted live thread, so it does not reappear
+        index.pop(title, None)
+        if path is not None:
+            os.remove(path)
+    save_index(thread_dir, index)
+    compact_bundles(thread_dir, index)
+    return stats
+
+
+def search(thread_dir, text):
+    """Yields (title, archived, message) for messages containing text, newest threads first."""
+    text = text.lower()
+    threads, index = load_threads(thread_dir)
+    for title in sorted(threads, reverse=True):
+        for message in threads[title]:
+            if text in message["message"].lower():
+                yield title, False, message
+    titles_per_bundle = {}
+    for title, entry in index.items():
+        if title not in threads:
+            titles_per_bundle.setdefault(entry["bundle"], []).append(title)
+    for name, titles in sorted(titles_per_bundle.items(), reverse=True):
+        bundle = read_bundle(thread_dir, name)
+        for title in sorted(titles, reverse=True):
+            for message in bundle[title]:
+                if text in message["message"].lower():
+                    yield title, True, message
+
+
+def disk_usage(thread_dir):
+    total = 0
+    for dirpath, _, filenames in os.walk(thread_dir):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return total
+
+
+def measure_startup(thread_dir, repeat=3):
+    """Best time of load_threads over repeat runs, in seconds."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load_threads(thread_dir)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive, evict and search the chat thread history.")
+    parser.add_argument("--thread-dir", default=THREAD_DIR)
+    parser.add_argument("--archive-after-days", type=float, default=DEFAULT_ARCHIVE_AFTER_DAYS,
+                        help="Archive threads not modified for this many days")
+    parser.add_argument("--retention-days", type=float, help="Delete threads not modified for this many days")
+    parser.add_argument("--max-mb", type=float, help="Delete the oldest threads until the history fits")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be done")
+    parser.add_argument("--search", help="List the messages containing this text instead")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.thread_dir):
+        print(f"No thread history at {args.thread_dir}")
+        return
+
+    if args.search:
+        for title, archived, message in search(args.thread_dir, args.search):
+            print(f"{title}{' (archived)' if archived else ''} [{message['author']}]: {message['message'][:100]}")
+        return
+
+    size_before = disk_usage(args.thread_dir)
+    startup_before = measure_startup(args.thread_dir)
+
+    archived = archive_threads(args.thread_dir, args.archive_after_days, dry_run=args.dry_run)
+    max_bytes = args.max_mb * 1024 * 1024 if args.max_mb is not None else None
+    evicted = {"evicted": 0, "bytes": 0}
+    if args.retention_days is not None or max_bytes is not None:
+        evicted = apply_retention(args.thread_dir, args.retention_days, max_bytes, dry_run=args.dry_run)
+
+    verb = "Would archive" if args.dry_run else "Archived"
+    print(f"{verb} {archived['archived']} thread(s) ({_mb(archived['bytes'])}) into {archived['bundles']} bundle(s)")
+    verb = "Would evict" if args.dry_run else "Evicted"
+    print(f"{verb} {evicted['evicted']} thread(s) (~{_mb(evicted['bytes'])})")
+    if args.dry_run:
+        return
+
+    size_after = disk_usage(args.thread_dir)
+    startup_after = measure_startup(args.thread_dir)
+    print(f"Disk usage: {_mb(size_before)} -> {_mb(size_after)} ({_mb(size_before - size_after)} reclaimed)")
+    print(f"Startup load: {startup_before * 1000:.1f} ms -> {startup_after * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
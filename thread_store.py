@@ -0,0 +1,48 @@
+"""Persistence of the chat threads shown by ChatApp.
+
+ThreadStore keeps every thread as a JSON file in the thread directory, with
+the compressed archive tier of thread_archive.py behind it. The chat server
+(deployment/server.py) serves the same store over HTTP and
+deployment/client.py provides RemoteThreadStore with the same methods, so
+ChatApp works unchanged against a local directory or a server.
+"""
+import json
+import os
+import re
+
+import thread_archive
+
+
+def sanitize_filename(title):
+    return re.sub(r'[\\/:*?"<>|]', '_', title)
+
+
+class ThreadStore:
+    def __init__(self, thread_dir=thread_archive.THREAD_DIR):
+        self.thread_dir = thread_dir
+        os.makedirs(self.thread_dir, exist_ok=True)
+
+    def load(self):
+        """Returns the live threads and the archive index entries of the archived ones."""
+        threads, archived = thread_archive.load_threads(self.thread_dir)
+        # A thread left both live and archived by an interrupted archive run is live
+        return threads, {title: entry for title, entry in archived.items() if title not in threads}
+
+    def read(self, title, archived=None):
+        """Returns the messages of an archived thread."""
+        return thread_archive.read_thread(self.thread_dir, title, archived)
+
+    def save(self, title, messages):
+        with open(os.path.join(self.thread_dir, f"{sanitize_filename(title)}.json"), "w") as file:
+            json.dump(messages, file, indent=4)
+
+    def unarchive(self, title):
+        """Drops an archived thread from the archive once it is saved as a live thread again."""
+        thread_archive.forget(self.thread_dir, title)
+
+    def delete(self, title, archived=False):
+        if archived:
+            thread_archive.forget(self.thread_dir, title)
+        thread_path = os.path.join(self.thread_dir, f"{sanitize_filename(title)}.json")
+        if os.path.exists(thread_path):
+            os.remove(thread_path)